@@ -4,13 +4,21 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import base64
+import io
 import os.path
-import sys
+import shutil
+import tarfile
+import time
 import traceback
+import weakref
+import zlib
 from abc import abstractmethod
+from functools import partial
+from hashlib import sha1
 from random import getrandbits
 
-from ansible.errors import AnsibleActionFail
+from ansible import constants as C
+from ansible.errors import AnsibleActionFail, AnsibleError, AnsibleFileNotFound
 from ansible.module_utils.common.dict_transformations import dict_merge
 from ansible.module_utils.common.text.converters import to_native
 from ansible.parsing.dataloader import DataLoader
@@ -20,15 +28,21 @@ from ansible.plugins.action import ActionBase as AnsibleActionBase
 from ansible.plugins.connection import ConnectionBase
 from ansible.template import Templar
 from ansible.utils.display import Display
+from ansible.utils.hashing import secure_hash
 
 from ..plugin_utils.execute_plugins import execute_action, execute_lookup
-from ..plugin_utils.path import get_collection_path
-from ..plugin_utils.args_validation import check_plugin_argspec
+from ..plugin_utils.path import get_collection_path, COLLECTION_FILE_INDEX
+from ..plugin_utils.variables import VariablesOverlay
+from ..plugin_utils.remote_commands import RemoteCommandBatch
+from ..plugin_utils.local_tmp import LocalTempFileManager, LOCAL_TMP_CLEANUP_RUN
+from ..plugin_utils.file_cache import LocalFileCache, DEFAULT_MAX_SIZE as FILE_CACHE_DEFAULT_MAX_SIZE
+from ..plugin_utils.concurrency import run_in_threads, ConnectionLock, LockedConnection, DEFAULT_MAX_WORKERS
+from ..plugin_utils.args_validation import check_plugin_argspec, VALIDATION_ENGINE_DEFAULT
 
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Text, Optional, Dict, Any, List
+    from typing import Text, Optional, Dict, Any, List, Hashable, Mapping, Sequence, Iterable, Tuple, Union
     from ..plugin_utils.args_validation_typing import (
         ArgSpecSchema,
         ArgSpecOptionalSchema,
@@ -36,6 +50,10 @@ if MYPY:
     )
 
 
+# Action owning the remote tmpdir shared by its sub-actions, by connection (see ActionBase._get_remote_tmp_owner())
+_REMOTE_TMP_OWNERS = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
+
+
 class ActionBase(AnsibleActionBase):
     _task = None  # type: Task
     _connection = None  # type: ConnectionBase
@@ -44,12 +62,69 @@ class ActionBase(AnsibleActionBase):
     _templar = None  # type: Templar
     _shared_loader_obj = None  # type: Any
     _display = None  # type: Display
+    _local_tmp_manager = None  # type: Optional[LocalTempFileManager]
 
     _validated_args = dict()  # type: Dict
 
     DOCUMENTATION = None  # type: Optional[Text]
     ARGUMENTS_SPEC = None  # type: Optional[Dict]
     CONDITIONAL_ARGUMENTS_SPEC = None  # type: Optional[Dict]
+    # Use VALIDATION_ENGINE_FAST to validate arguments with a validator specialised for the spec
+    VALIDATION_ENGINE = VALIDATION_ENGINE_DEFAULT  # type: Text
+    # Cache validation results for identical arguments, enable it only if spec is deterministic (no env fallback, etc)
+    VALIDATION_RESULTS_CACHE = False  # type: bool
+    # Reuse sub-lookup instances (same loader and templar), enable it only if sub-lookups are stateless
+    REUSE_LOOKUP_INSTANCES = False  # type: bool
+    # Maximum number of sub-lookups executed at the same time by _execute_lookups()
+    LOOKUPS_MAX_WORKERS = DEFAULT_MAX_WORKERS  # type: int
+    # Give sub-lookups a read-only view of variables over task args instead of a merged copy, enable it only if
+    # sub-lookups don't modify their variables in place
+    LOOKUP_VARIABLES_OVERLAY = False  # type: bool
+    # Maximum number of sub-actions executed at the same time by _execute_actions()
+    ACTIONS_MAX_WORKERS = DEFAULT_MAX_WORKERS  # type: int
+    # Sub-action tasks share the parent chain (blocks, includes) of the task instead of copying it. Task attributes
+    # are still copied, disable it if a sub-action modifies its parent blocks
+    LIGHTWEIGHT_SUB_TASKS = False  # type: bool
+    # Look for files of collections with a per-process index of their files/templates/vars directories
+    # (see _find_needle_in_collection())
+    INDEX_COLLECTION_FILES = False  # type: bool
+    # Fetch remote files through connection file transfer rather than slurp module
+    FETCH_STREAMING = True  # type: bool
+    # Cache fetched remote files on local tmp directory, based on remote file checksum
+    FETCH_CACHE = False  # type: bool
+    # Maximum size (in bytes) of fetched remote files cache, least recently used files are removed first
+    FETCH_CACHE_MAX_SIZE = FILE_CACHE_DEFAULT_MAX_SIZE  # type: int
+    # Transfer only changed blocks of remote files fetched previously (previous version is taken from fetch cache).
+    # Remote host must provide dd and sha1sum, shasum or openssl
+    FETCH_DELTA = False  # type: bool
+    # Size (in bytes) of blocks compared by delta transfers
+    DELTA_BLOCK_SIZE = 1024 * 1024  # type: int
+    # Compress remote files with gzip before fetching them (remote host must provide gzip)
+    FETCH_COMPRESSION = False  # type: bool
+    # Remote files smaller than this size (in bytes) are fetched uncompressed
+    FETCH_COMPRESSION_THRESHOLD = 64 * 1024  # type: int
+    # When local temporary files are removed: LOCAL_TMP_CLEANUP_TASK, LOCAL_TMP_CLEANUP_RUN or LOCAL_TMP_CLEANUP_NEVER
+    LOCAL_TMP_CLEANUP = LOCAL_TMP_CLEANUP_RUN  # type: Text
+    # Disk quota (in bytes) of local temporary files created by the action, least recently modified are removed first
+    LOCAL_TMP_QUOTA = None  # type: Optional[int]
+    # Local temporary files smaller than this size (in bytes) are kept in memory if possible (memfd, Linux only).
+    # Returned paths are then only valid until the end of the task !
+    LOCAL_TMP_MEMORY_THRESHOLD = None  # type: Optional[int]
+
+    _ARCHIVE_CHUNK_SIZE = 1024 * 1024
+    _BASE64_CHUNK_SIZE = 4 * 1024 * 1024
+    # POSIX shell snippet setting $sha1 to a command printing the sha1 checksum of stdin (first 40 chars of output)
+    _SHA1_COMMAND = (
+        'if command -v sha1sum >/dev/null 2>&1; then sha1=sha1sum; '
+        'elif command -v shasum >/dev/null 2>&1; then sha1=shasum; '
+        'else sha1="openssl dgst -sha1 -r"; fi'
+    )
+    # POSIX shell tests used by _mirror_remote_file() to compare $src and $dest
+    _MIRROR_COMPARE_TESTS = dict(
+        size_mtime='[ ! "$src" -nt "$dest" ] && [ ! "$dest" -nt "$src" ]'
+                   ' && [ "$(wc -c < "$src")" = "$(wc -c < "$dest")" ]',
+        content='cmp -s "$src" "$dest"',
+    )
 
     # def __init__(self, task: Task, connection: ConnectionBase, play_context: PlayContext, loader: DataLoader,
     #              templar: Templar, shared_loader_obj: Any):
@@ -60,6 +135,10 @@ class ActionBase(AnsibleActionBase):
         if task_vars is None:
             task_vars = dict()
 
+        if self._get_remote_tmp_owner() is None:
+            # Top-level action
+            _REMOTE_TMP_OWNERS[self._connection] = weakref.ref(self)
+
         result = super(ActionBase, self).run(tmp, task_vars)  # type: Dict
         result.update(dict(changed=False, skipped=False, failed=False))
 
@@ -88,13 +167,56 @@ class ActionBase(AnsibleActionBase):
         Method will be safely executed by C(ActionBase::run)
         """
 
+    def cleanup(self, force=False):
+        # type: (ActionBase, bool) -> None
+        super(ActionBase, self).cleanup(force)
+        if self._local_tmp_manager is not None:
+            self._local_tmp_manager.cleanup()
+        if self._get_remote_tmp_owner() is self:
+            del _REMOTE_TMP_OWNERS[self._connection]
+
+    def _make_tmp_path(self, remote_user=None):
+        # type: (ActionBase, Optional[Text]) -> Text
+        """
+        Remote tmpdir is shared with the top-level action and its sub-actions, and removed once by the top-level
+        action at the end of the task
+        """
+        tmpdir = super(ActionBase, self)._make_tmp_path(remote_user)  # type: Text
+        self._adopt_remote_tmp_dir()
+
+        return tmpdir
+
+    def _get_remote_tmp_owner(self):
+        # type: (ActionBase) -> Optional[ActionBase]
+        """
+        :return: Top-level action using the connection (None if not yet registered)
+        """
+        owner_ref = _REMOTE_TMP_OWNERS.get(self._connection)
+
+        return None if owner_ref is None else owner_ref()
+
+    def _adopt_remote_tmp_dir(self):
+        # type: (ActionBase) -> None
+        """
+        Make the top-level action responsible for removing current remote tmpdir (created by a sub-action, etc)
+        """
+        owner = self._get_remote_tmp_owner()
+        if owner is None or self._connection._shell.tmpdir is None:
+            return
+        if owner is not self:
+            self._cleanup_remote_tmp = False
+        owner._cleanup_remote_tmp = True
+
     def check_argspec(
         self,  # type: ActionBase
         args,  # type: Dict
         schema,  # type: ArgSpecSchema
         schema_format='doc',  # type: Text
         schema_conditionals=None,  # type: ArgSpecOptionalSchema
-        other_args=None  # type: ArgSpecOptionalSchema
+        other_args=None,  # type: ArgSpecOptionalSchema
+        cache_key=None,  # type: Optional[Hashable]
+        engine=VALIDATION_ENGINE_DEFAULT,  # type: Text
+        cache_results=False  # type: bool
     ):  # type: (...) -> PluginArgSpecReturn
         return check_plugin_argspec(
             self._task.action,
@@ -103,6 +225,9 @@ class ActionBase(AnsibleActionBase):
             schema_format,
             schema_conditionals,
             other_args,
+            cache_key,
+            engine,
+            cache_results,
         )
 
     def _execute_module(self,  # type: ActionBase
@@ -130,47 +255,148 @@ class ActionBase(AnsibleActionBase):
         if result is not None:
             is_action_module = module_name is None or module_name == self._task.get_name()
             real_module_name = self._task.get_name() if is_action_module else module_name
-            result.update({real_module_name: module_res})
-            # Pop values to avoid having them two times
-            for var in ['diff', 'changed', 'failed', 'ansible_facts', 'error', 'errors', 'exception', 'invocation']:
-                if module_res.get(var, None) is not None:
-                    new_value = module_res.pop(var)
-                    if isinstance(result.get(var, None), dict):
-                        result[var] = dict_merge(result[var], new_value)
-                    elif var in ['exception', 'error', 'errors'] and var in result:
-                        result[var] = result[var] + new_value
-                    else:
-                        result[var] = new_value
+            self._merge_sub_result(result, real_module_name, module_res)
 
         return module_res
 
-    def _execute_action(self, name, args, task_vars):
-        # type: (ActionBase, Text, Dict, Dict) -> Dict
+    @staticmethod
+    def _merge_sub_result(result, name, sub_result):
+        # type: (Dict, Text, Dict) -> None
+        """
+        Merge C(sub_result) into C(result) under C(name) key, common keys (changed, failed, etc) are merged too
+        """
+        result.update({name: sub_result})
+        # Pop values to avoid having them two times
+        for var in ['diff', 'changed', 'failed', 'ansible_facts', 'error', 'errors', 'exception', 'invocation']:
+            if sub_result.get(var, None) is not None:
+                new_value = sub_result.pop(var)
+                if isinstance(result.get(var, None), dict):
+                    result[var] = dict_merge(result[var], new_value)
+                elif var in ['exception', 'error', 'errors'] and var in result:
+                    result[var] = result[var] + new_value
+                else:
+                    result[var] = new_value
+
+    def _execute_action(self, name, args, task_vars, connection=None, templar=None):
+        # type: (ActionBase, Text, Dict, Dict, Optional[ConnectionBase], Optional[Templar]) -> Dict
         """
+        :param connection: Default to current action connection
+        :param templar: Default to current action templar
         :return: dict
         """
-        task_copy = self._task.copy()
+        if self.LIGHTWEIGHT_SUB_TASKS:
+            task_copy = self._task.copy(exclude_parent=True)
+            task_copy._parent = self._task._parent
+        else:
+            task_copy = self._task.copy()
         task_copy.args = args
 
         loader_kwargs = dict(
             task=task_copy,
-            connection=self._connection,
+            connection=self._connection if connection is None else connection,
             play_context=self._play_context,
             loader=self._loader,
-            templar=self._templar,
+            templar=self._templar if templar is None else templar,
             shared_loader_obj=self._shared_loader_obj
         )
 
-        return execute_action(name, task_vars=task_vars, loader_kwargs=loader_kwargs)
+        res = execute_action(name, task_vars=task_vars, loader_kwargs=loader_kwargs)
+        if connection is None:
+            # Sub-action may have created the remote tmpdir, keep it for next sub-actions and remove it at the end
+            self._adopt_remote_tmp_dir()
+
+        return res
+
+    def _execute_actions(self, actions, result=None, max_workers=None):
+        # type: (ActionBase, List[Sequence], Optional[Dict], Optional[int]) -> List[Dict]
+        """
+        Execute several C(_execute_action()) concurrently
+
+        Sub-actions share the connection but have exclusive access to it from their first connection usage until
+        they end, controller-side only sub-actions are fully concurrent. Unlike C(_execute_action()) sub-actions
+        (which share the action remote tmpdir, see C(_make_tmp_path())), each sub-action has its own remote temporary
+        directory, removed once sub-action ends.
+
+        Each sub-action gets its own templar (same variables). Loader and play context are shared and not
+        thread-safe: sub-actions must not modify them (e.g. loader basedir or play context attributes).
+
+        :param actions: List of C((name, args, task_vars))
+        :param result: If provided, sub-action results are merged into it (same as C(_execute_module()), in
+         C(actions) order)
+        :param max_workers: Default to C(ACTIONS_MAX_WORKERS)
+        :return: Sub-action results, in C(actions) order. If some sub-actions fail, error of the first one is raised
+        """
+        lock = ConnectionLock()
+
+        def execute(action):
+            connection = LockedConnection(self._connection, lock)
+            templar = Templar(loader=self._loader, variables=self._templar.available_variables)
+            try:
+                return self._execute_action(*action, connection=connection, templar=templar)
+            finally:
+                try:
+                    self._remove_sub_action_tmp_path(connection._shell.tmpdir, lock)
+                finally:
+                    lock.release()
+
+        results = run_in_threads(execute, actions,
+                                 max_workers=self.ACTIONS_MAX_WORKERS if max_workers is None else max_workers)
+
+        if result is not None:
+            for action, action_res in zip(actions, results):
+                self._merge_sub_result(result, action[0], action_res)
+
+        return results
+
+    def _remove_sub_action_tmp_path(self, tmp_path, lock):
+        # type: (ActionBase, Optional[Text], ConnectionLock) -> None
+        if not tmp_path or C.DEFAULT_KEEP_REMOTE_FILES or '-tmp-' not in tmp_path:
+            return
+
+        lock.acquire()
+        cmd = self._connection._shell.remove(tmp_path, recurse=True)
+        res = self._low_level_execute_command(cmd, sudoable=False)
+        if res['rc'] != 0:
+            self._display.warning('Error deleting remote temporary files (rc: %s, stderr: %s)'
+                                  % (res.get('rc'), res.get('stderr', '').strip()))
 
     def _execute_lookup(self, name, terms, variables, **kwargs):
         # type: (ActionBase, Text, List, Dict, **Dict) -> Any
-        loader_kwargs = dict(loader=self._loader, templar=self._templar)
-        lookup_vars = self._task.args.copy()
-        lookup_vars.update(variables)
+        return self._execute_lookup_with(self._templar, self.REUSE_LOOKUP_INSTANCES, name, terms, variables, kwargs)
+
+    def _execute_lookup_with(self, templar, reuse_instance, name, terms, variables, kwargs):
+        # type: (ActionBase, Templar, bool, Text, List, Dict, Dict) -> Any
+        loader_kwargs = dict(loader=self._loader, templar=templar)
+        if self.LOOKUP_VARIABLES_OVERLAY:
+            lookup_vars = VariablesOverlay(variables, self._task.args)  # type: Mapping
+        else:
+            merged_vars = self._task.args.copy()
+            merged_vars.update(variables)
+            lookup_vars = merged_vars
 
         return execute_lookup(name, terms=terms, lookup_vars=lookup_vars, lookup_kwargs=kwargs,
-                              loader_kwargs=loader_kwargs)
+                              loader_kwargs=loader_kwargs, reuse_instance=reuse_instance)
+
+    def _execute_lookups(self, lookups, max_workers=None):
+        # type: (ActionBase, List[Sequence], Optional[int]) -> List
+        """
+        Execute several C(_execute_lookup()) concurrently, lookups must be thread-safe !
+
+        Each sub-lookup gets its own templar (same variables) and its own instance (C(REUSE_LOOKUP_INSTANCES) is
+        ignored), as lookups keep per-call state (options, templar variables). Loader is shared and not thread-safe.
+
+        :param lookups: List of C((name, terms, variables)) or C((name, terms, variables, kwargs))
+        :param max_workers: Default to C(LOOKUPS_MAX_WORKERS)
+        :return: Lookup results, in C(lookups) order. If some lookups fail, error of the first one is raised
+        """
+
+        def execute(lookup):
+            templar = Templar(loader=self._loader, variables=self._templar.available_variables)
+            return self._execute_lookup_with(templar, False, lookup[0], lookup[1], lookup[2],
+                                             lookup[3] if len(lookup) > 3 else dict())
+
+        return run_in_threads(execute, lookups,
+                              max_workers=self.LOOKUPS_MAX_WORKERS if max_workers is None else max_workers)
 
     def _find_needle_in_collection(self, c_full_name, dirname, needle, collection_first=False):
         # type: (ActionBase, Text, Text, Text, bool) -> Text
@@ -178,12 +404,31 @@ class ActionBase(AnsibleActionBase):
             find a needle inside "{c_full_name}" ansible collection directory
         """
 
+        collection_paths = get_collection_path(c_full_name)
         if collection_first:
-            path_stack = get_collection_path(c_full_name) + self._task.get_search_path()
+            path_stack = collection_paths + self._task.get_search_path()
         else:
-            path_stack = self._task.get_search_path() + get_collection_path(c_full_name)
+            path_stack = self._task.get_search_path() + collection_paths
 
         self._display.vvv('Try to find %s or %s under %s ' % (os.path.join(dirname, needle), needle, path_stack))
+        if self.INDEX_COLLECTION_FILES and needle and not needle.startswith(('~', os.path.sep)):
+            # Collection paths not containing the needle can be skipped without changing the result
+            found = dict()  # type: Dict[Text, Text]
+            for collection_path in collection_paths:
+                path = COLLECTION_FILE_INDEX.find(collection_path, dirname, needle)
+                if path is not None:
+                    if collection_first:
+                        return path
+                    found[collection_path] = path
+            try:
+                return self._loader.path_dwim_relative_stack(  # type: ignore
+                    [path for path in path_stack if path not in collection_paths or path in found],
+                    dirname,
+                    needle,
+                )
+            except AnsibleFileNotFound:
+                pass  # Raised again below, with all searched paths
+
         # If nothing found, it will throw an exception
         return self._loader.path_dwim_relative_stack(path_stack, dirname, needle)  # type: ignore
 
@@ -196,6 +441,9 @@ class ActionBase(AnsibleActionBase):
                 args=self._task.args,
                 schema=doc,
                 schema_conditionals=cond_args_spec,
+                cache_key=self.__class__,
+                engine=self.VALIDATION_ENGINE,
+                cache_results=self.VALIDATION_RESULTS_CACHE,
             )
             if check_res['failed']:
                 result.update(check_res)
@@ -207,30 +455,566 @@ class ActionBase(AnsibleActionBase):
                     schema=dict(argument_spec=args_spec),
                     schema_format='argspec',
                     schema_conditionals=cond_args_spec,
+                    cache_key=self.__class__,
+                    engine=self.VALIDATION_ENGINE,
+                    cache_results=self.VALIDATION_RESULTS_CACHE,
                 )
                 if check_res['failed']:
                     result.update(check_res)
 
-    def _mirror_remote_file(self, source, dest):
-        # type: (ActionBase, Text, Text) -> None
+    def _execute_remote_commands(self, commands, sudoable=True, stop_on_error=False, chdir=None):
+        # type: (ActionBase, Sequence[Text], bool, bool, Optional[Text]) -> List[Dict]
+        """
+        Execute several shell commands with a single remote invocation (see C(RemoteCommandBatch))
+
+        :param stop_on_error: Don't execute remaining commands once a command fails
+        :return: One C(dict(rc, stdout, stderr)) per command, in C(commands) order. C(rc) is None if command has not
+         been executed
+        """
+        batch = RemoteCommandBatch(commands)
+        res = self._low_level_execute_command(batch.build(stop_on_error=stop_on_error), sudoable=sudoable, chdir=chdir)
+        results = batch.parse(res.get('stdout', u''))
+        if res.get('rc', None) != 0 or (results and results[0]['rc'] is None):
+            raise AnsibleActionFail('Error during remote commands execution: %s' % res)
+
+        return results
+
+    def _mirror_remote_file(self, source, dest, compare=None, read_only=False):
+        # type: (ActionBase, Text, Text, Optional[Text], bool) -> Text
         """
         Warning: Method doesn't manage check mode, file will always be created, you are responsible for removing it !
+
+        Everything is done with a single remote command. Copy is done with C(cp -a) (to preserve permissions,
+        ownership, SELinux stuff, etc), using C(--reflink=auto) if available (copy-on-write if filesystem supports it).
+
+        :param compare: C(size_mtime) or C(content) to skip the copy if C(dest) is identical to C(source)
+        :param read_only: Caller will not modify C(dest), a hardlink is created if possible. Beware, C(source)
+         modifications will then be visible through C(dest) !
+        :return: Strategy used (C(skipped), C(hardlink), C(copy_reflink_auto) or C(copy))
         """
         self._display.v('Mirror remote file %s to %s' % (source, dest))
-        # Use '-a' to preserve permissions, ownership, SELinux stuff, etc
-        cmd = ' '.join(['cp', '-a', self._connection._shell.quote(source), self._connection._shell.quote(dest)])
+        quote = self._connection._shell.quote
+        if compare is not None and compare not in self._MIRROR_COMPARE_TESTS:
+            raise AnsibleActionFail('Unknown mirror compare mode: %s' % compare)
+
+        steps = []
+        if compare is not None:
+            steps.append(('[ -f "$dest" ] && %s' % self._MIRROR_COMPARE_TESTS[compare], 'skipped'))
+        if read_only:
+            steps.append(('ln -f "$src" "$dest" 2>/dev/null', 'hardlink'))
+        steps.append(('cp --reflink=auto -a "$src" "$dest" 2>/dev/null', 'copy_reflink_auto'))
+        steps.append(('cp -a "$src" "$dest"', 'copy'))
+        cmd = 'src=%s; dest=%s; ' % (quote(source), quote(dest))
+        cmd += ' '.join('%s %s; then echo %s;' % ('if' if idx == 0 else 'elif', test, strategy)
+                        for idx, (test, strategy) in enumerate(steps))
+        cmd += ' else exit 1; fi'
+
         result = self._low_level_execute_command(cmd)
-        if result.get('rc', None) != 0:
+        stdout_lines = result.get('stdout', '').strip().splitlines()
+        if result.get('rc', None) != 0 or not stdout_lines:
             raise AnsibleActionFail('Error during remote file mirroring: %s' % result)
 
-    def _fetch_remote_file_to_local_tmp(self, remote_source, task_vars):
-        # type: (ActionBase, Text, Dict) -> Text
+        strategy = stdout_lines[-1].strip()
+        self._display.vvv('Remote file %s mirrored to %s using "%s" strategy' % (source, dest, strategy))
+
+        return strategy
+
+    def _fetch_remote_file_to_local_tmp(self, remote_source, task_vars, result=None, use_cache=None, use_delta=None,
+                                        use_compression=None):
+        # type: (ActionBase, Text, Dict, Optional[Dict], Optional[bool], Optional[bool], Optional[bool]) -> Text
         """
+        File is transferred by the connection plugin (bounded memory usage) if C(FETCH_STREAMING) is enabled,
+        else (or if become is used, or if transfer fails) by C(ansible.legacy.slurp) module
+
         :param task_vars:
         :param remote_source: Remote source file path
+        :param result: If provided, fetch stats (strategy, bytes and duration) are appended to C(result['fetch_stats'])
+         and cache hits/misses are counted in C(result['fetch_cache'])
+        :param use_cache: Default to C(FETCH_CACHE). If enabled, remote checksum is retrieved first and file is not
+         transferred if a local copy with the same checksum exists
+        :param use_delta: Default to C(FETCH_DELTA). Imply C(use_cache). If an older version of the file is cached,
+         only blocks which differ are transferred (see C(_fetch_remote_file_delta()))
+        :param use_compression: Default to C(FETCH_COMPRESSION). If enabled, a file bigger than
+         C(FETCH_COMPRESSION_THRESHOLD) is transferred compressed (see C(_fetch_remote_file_compressed()))
         :return: Local file path
         """
         self._display.v('Fetch remote file %s to local tmp directory' % remote_source)
+        start = time.time()
+        use_delta = self.FETCH_DELTA if use_delta is None else use_delta
+        use_cache = (self.FETCH_CACHE if use_cache is None else use_cache) or use_delta
+        use_compression = self.FETCH_COMPRESSION if use_compression is None else use_compression
+        strategy = None  # type: Optional[Text]
+        tmp_file_path = None  # type: Optional[Text]
+        transferred_bytes = None  # type: Optional[int]
+        cache = cache_key = checksum = None
+        if use_cache:
+            cache = self._get_fetch_cache()
+            cache_key = '%s\0%s' % (self._play_context.remote_addr, remote_source)
+            checksum = self._get_remote_file_checksum(remote_source, task_vars)
+            if checksum is not None:
+                tmp_file_path = self._generate_local_tmp_file_path()
+                previous = cache.get_latest(cache_key) if use_delta else None
+                if cache.copy_to(cache_key, checksum, tmp_file_path):
+                    strategy = 'cache'
+                elif previous is not None:
+                    strategy = 'delta'
+                    transferred_bytes = self._fetch_remote_file_delta(
+                        remote_source, previous[0], checksum, tmp_file_path, task_vars
+                    )
+                if strategy is None or (strategy == 'delta' and transferred_bytes is None):
+                    self._get_local_tmp_manager().remove(tmp_file_path)
+                    strategy = tmp_file_path = None
+        if tmp_file_path is None and use_compression:
+            compressed = self._fetch_remote_file_compressed(remote_source, task_vars)
+            if compressed is not None:
+                tmp_file_path, strategy, transferred_bytes = compressed
+        # As fetch action, use slurp if privilege escalation is needed
+        if tmp_file_path is None and self.FETCH_STREAMING and not self._connection.become:
+            strategy = 'stream'
+            tmp_file_path = self._stream_remote_file_to_local_tmp(remote_source)
+        if tmp_file_path is None:
+            strategy = 'slurp'
+            tmp_file_path = self._slurp_remote_file_to_local_tmp(remote_source, task_vars)
+
+        if cache is not None:
+            # Ensure file has not been modified meanwhile before caching it
+            if strategy != 'cache' and checksum is not None and secure_hash(tmp_file_path) == checksum:
+                cache.put(cache_key, checksum, tmp_file_path)
+            if result is not None:
+                cache_stats = result.setdefault('fetch_cache', dict(hits=0, misses=0))
+                cache_stats['hits' if strategy == 'cache' else 'misses'] += 1
+
+        if result is not None:
+            fetch_stats = dict(
+                path=remote_source,
+                strategy=strategy,
+                bytes=os.path.getsize(tmp_file_path),
+                duration=round(time.time() - start, 3),
+            )
+            if transferred_bytes is not None:
+                fetch_stats['transferred_bytes'] = transferred_bytes
+            result.setdefault('fetch_stats', []).append(fetch_stats)
+
+        return tmp_file_path
+
+    def _fetch_remote_file_delta(self, remote_source, base_path, checksum, dest, task_vars):
+        # type: (ActionBase, Text, Text, Text, Text, Dict) -> Optional[int]
+        """
+        Rebuild remote file into C(dest) from C(base_path), an older version of the file: only blocks which differ
+        (see C(DELTA_BLOCK_SIZE)) are transferred
+
+        :param checksum: Remote file sha1 checksum, rebuilt file is verified against it
+        :return: Transferred bytes, or None if rebuilt file doesn't match C(checksum) (modified meanwhile)
+        """
+        block_size = self.DELTA_BLOCK_SIZE
+        remote_delta = self._generate_remote_tmp_file_path()
+        size, blocks = self._get_remote_block_checksums(
+            remote_source, known_checksums=self._get_local_block_checksums(base_path), delta_path=remote_delta
+        )
+        delta_path = self._fetch_remote_file_to_local_tmp(remote_delta, task_vars, use_cache=False, use_delta=False,
+                                                          use_compression=False)
+        transferred_bytes = os.path.getsize(delta_path)
+        try:
+            shutil.copyfile(base_path, dest)
+            with open(dest, 'r+b') as dest_handler, open(delta_path, 'rb') as delta_handler:
+                for idx, dummy in blocks:
+                    dest_handler.seek(idx * block_size)
+                    dest_handler.write(delta_handler.read(block_size))
+                dest_handler.truncate(size)
+        finally:
+            self._get_local_tmp_manager().remove(delta_path)
+
+        if secure_hash(dest) != checksum:
+            self._display.vvv('Remote file %s modified during delta transfer, fallback on full transfer'
+                              % remote_source)
+            return None
+
+        return transferred_bytes
+
+    def _fetch_remote_file_compressed(self, remote_source, task_vars):
+        # type: (ActionBase, Text, Dict) -> Optional[Tuple[Text, Text, int]]
+        """
+        Compress remote file with gzip into remote tmpdir, fetch the compressed file and decompress it locally
+
+        :return: Local file path, strategy (C(stream_gzip) or C(slurp_gzip)) and transferred (compressed) bytes, or
+         None if file is smaller than C(FETCH_COMPRESSION_THRESHOLD) or can't be compressed
+        """
+        quote = self._connection._shell.quote
+        remote_compressed = self._generate_remote_tmp_file_path()
+        res = self._low_level_execute_command(
+            'f=%s; size=$(wc -c < "$f" | tr -d " ") && [ "$size" -ge %s ] && gzip -c "$f" > %s && echo compressed'
+            % (quote(remote_source), self.FETCH_COMPRESSION_THRESHOLD, quote(remote_compressed))
+        )
+        if res.get('stdout', u'').strip() != 'compressed':
+            self._display.vvv('Remote file %s not compressed: %s' % (remote_source, res))
+            return None
+
+        fetch_result = dict()  # type: Dict
+        compressed_path = self._fetch_remote_file_to_local_tmp(remote_compressed, task_vars, result=fetch_result,
+                                                               use_cache=False, use_delta=False, use_compression=False)
+        fetch_stats = fetch_result['fetch_stats'][0]
+        try:
+            with open(compressed_path, 'rb') as file_handler:
+                # 16 + MAX_WBITS => gzip header and trailer
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+                def decompress():
+                    for chunk in iter(partial(file_handler.read, self._ARCHIVE_CHUNK_SIZE), b''):
+                        yield decompressor.decompress(chunk)
+                    yield decompressor.flush()
+
+                tmp_file_path = self._create_local_tempfile_from_chunks(decompress())
+        finally:
+            self._get_local_tmp_manager().remove(compressed_path)
+
+        return tmp_file_path, '%s_gzip' % fetch_stats['strategy'], fetch_stats['bytes']
+
+    def _push_file_delta(self, local_source, remote_dest, result=None):
+        # type: (ActionBase, Text, Text, Optional[Dict]) -> bool
+        """
+        Warning: Method doesn't manage check mode, C(remote_dest) is always updated !
+
+        Update C(remote_dest) to C(local_source) content by transferring only blocks which differ (see
+        C(DELTA_BLOCK_SIZE)). Blocks are patched into a copy of C(remote_dest) which replaces it once its checksum has
+        been verified. If every block differs (e.g. missing C(remote_dest), which is created), the whole file is
+        transferred instead.
+
+        :param result: If provided, push stats (strategy, C(delta) or C(full), bytes, transferred bytes and duration)
+         are appended to C(result['push_stats'])
+        :return: Whether C(remote_dest) has been modified
+        """
+        self._display.v('Push local file %s to %s (delta)' % (local_source, remote_dest))
+        start = time.time()
+        block_size = self.DELTA_BLOCK_SIZE
+        quote = self._connection._shell.quote
+        size = os.path.getsize(local_source)
+        remote_size, remote_blocks = self._get_remote_block_checksums(remote_dest)
+        remote_checksums = [block_checksum for dummy, block_checksum in remote_blocks]
+        local_checksums = self._get_local_block_checksums(local_source)
+        blocks = [idx for idx, block_checksum in enumerate(local_checksums)
+                  if idx >= len(remote_checksums) or remote_checksums[idx] != block_checksum]
+
+        transferred_bytes = 0
+        strategy = 'delta'
+        if blocks or size != remote_size:
+            remote_delta = self._generate_remote_tmp_file_path()
+            remote_paths = [remote_delta]
+            if blocks and len(blocks) == len(local_checksums):
+                # A delta which contains every block gains nothing
+                strategy = 'full'
+                transferred_bytes = size
+                self._transfer_file(local_source, remote_delta)
+                patch_script = ['cat "$delta" > "$tmp" || { rm -f "$tmp"; exit 1; }']
+            else:
+                def read_blocks():
+                    with open(local_source, 'rb') as file_handler:
+                        for idx in blocks:
+                            file_handler.seek(idx * block_size)
+                            yield file_handler.read(block_size)
+
+                # Block indexes are transferred as a file (command line length is limited)
+                remote_indexes = self._generate_remote_tmp_file_path()
+                remote_paths.append(remote_indexes)
+                delta_path = self._create_local_tempfile_from_chunks(read_blocks())
+                try:
+                    indexes_path = self._create_local_tempfile_from_chunks(('%s\n' % idx).encode() for idx in blocks)
+                    try:
+                        transferred_bytes = os.path.getsize(delta_path)
+                        self._transfer_file(delta_path, remote_delta)
+                        self._transfer_file(indexes_path, remote_indexes)
+                    finally:
+                        self._get_local_tmp_manager().remove(indexes_path)
+                finally:
+                    self._get_local_tmp_manager().remove(delta_path)
+                patch_script = [
+                    'exec 3< %s || { rm -f "$tmp"; exit 1; }' % quote(remote_indexes),
+                    'k=0',
+                    'while read -r i <&3; do',
+                    '  dd if="$delta" of="$tmp" bs="$bs" skip=$k seek=$i count=1 conv=notrunc 2>/dev/null'
+                    ' || { rm -f "$tmp"; exit 1; }',
+                    '  k=$((k + 1))',
+                    'done',
+                    'exec 3<&-',
+                ]
+            self._fixup_perms2(remote_paths, execute=False)
+
+            script = [
+                self._SHA1_COMMAND,
+                'f=%s; delta=%s; bs=%s' % (quote(remote_dest), quote(remote_delta), block_size),
+                'tmp="$(dirname "$f")/.$(basename "$f").delta-$$"',
+                'if [ -e "$f" ]; then cp -p "$f" "$tmp"; else : > "$tmp"; fi || exit 1',
+            ] + patch_script + [
+                # Without conv=notrunc, output file is truncated at seek position
+                'dd if=/dev/null of="$tmp" bs=1 seek=%s 2>/dev/null || { rm -f "$tmp"; exit 1; }' % size,
+                'rm -f %s' % ' '.join(quote(remote_path) for remote_path in remote_paths),
+                'if [ "$($sha1 < "$tmp" | cut -c1-40)" = %s ]; then mv -f "$tmp" "$f"; '
+                'else rm -f "$tmp"; echo "Checksum mismatch" >&2; exit 1; fi' % secure_hash(local_source),
+            ]
+            res = self._low_level_execute_command('\n'.join(script))
+            if res.get('rc', None) != 0:
+                raise AnsibleActionFail('Error during remote file delta update: %s' % res)
+
+        if result is not None:
+            result.setdefault('push_stats', []).append(dict(
+                path=remote_dest,
+                strategy=strategy,
+                bytes=size,
+                transferred_bytes=transferred_bytes,
+                duration=round(time.time() - start, 3),
+            ))
+
+        return transferred_bytes > 0 or size != remote_size
+
+    def _get_remote_block_checksums(self, remote_path, known_checksums=None, delta_path=None):
+        # type: (ActionBase, Text, Optional[List[Text]], Optional[Text]) -> Tuple[int, List[Tuple[int, Text]]]
+        """
+        Compute sha1 checksum of each block (see C(DELTA_BLOCK_SIZE)) of a remote file with a single remote command.
+        A missing file is considered as empty.
+
+        :param known_checksums: Block checksums of another version of the file, only blocks which differ are returned.
+         They are transferred as a file on remote tmpdir (command line length is limited)
+        :param delta_path: Remote path where returned blocks are concatenated
+        :return: Remote file size, and index and checksum of returned blocks
+        """
+        quote = self._connection._shell.quote
+        known_path = None  # type: Optional[Text]
+        if known_checksums:
+            checksums_path = self._create_local_tempfile_from_chunks(
+                (checksum + '\n').encode() for checksum in known_checksums
+            )
+            known_path = self._generate_remote_tmp_file_path()
+            try:
+                self._transfer_file(checksums_path, known_path)
+            finally:
+                self._get_local_tmp_manager().remove(checksums_path)
+            self._fixup_perms2([known_path], execute=False)
+        script = [
+            self._SHA1_COMMAND,
+            'f=%s; bs=%s' % (quote(remote_path), self.DELTA_BLOCK_SIZE),
+            'if [ -e "$f" ]; then size=$(wc -c < "$f" | tr -d " ") && [ -n "$size" ] || exit 1; else size=0; fi',
+            'echo "size $size"',
+            'exec 3< %s || exit 1' % (quote(known_path) if known_path is not None else '/dev/null'),
+            ': > %s || exit 1' % quote(delta_path) if delta_path is not None else ':',
+            'i=0',
+            'while [ $((i * bs)) -lt "$size" ]; do',
+            '  known=; read -r known <&3 || known=',
+            '  sum=$(dd if="$f" bs="$bs" skip=$i count=1 2>/dev/null | $sha1 | cut -c1-40)',
+            '  if [ "$sum" != "$known" ]; then',
+            '    echo "$i $sum"',
+            '    dd if="$f" bs="$bs" skip=$i count=1 2>/dev/null >> %s || exit 1' % quote(delta_path)
+            if delta_path is not None else '    :',
+            '  fi',
+            '  i=$((i + 1))',
+            'done',
+        ]
+        res = self._low_level_execute_command('\n'.join(script))
+        lines = res.get('stdout', u'').splitlines()
+        if res.get('rc', None) != 0 or not lines or not lines[0].startswith('size '):
+            raise AnsibleActionFail('Error during remote file block checksums computation: %s' % res)
+
+        blocks = []
+        for line in lines[1:]:
+            idx, block_checksum = line.split(' ', 1)
+            blocks.append((int(idx), block_checksum))
+
+        return int(lines[0][len('size '):]), blocks
+
+    def _get_local_block_checksums(self, path):
+        # type: (ActionBase, Text) -> List[Text]
+        """
+        :return: sha1 checksum of each block (see C(DELTA_BLOCK_SIZE)) of a local file
+        """
+        with open(path, 'rb') as file_handler:
+            return [sha1(block).hexdigest() for block in iter(partial(file_handler.read, self.DELTA_BLOCK_SIZE), b'')]
+
+    def _fetch_remote_files_to_local_tmp(self, remote_sources, task_vars, result=None):
+        # type: (ActionBase, Sequence[Text], Dict, Optional[Dict]) -> Tuple[Dict[Text, Text], Dict[Text, Text]]
+        """
+        Fetch several remote files with a single transfer: files are packed by C(tar) into a compressed archive
+        located on remote tmpdir, archive is fetched (see C(_fetch_remote_file_to_local_tmp())) and unpacked locally
+
+        :param task_vars:
+        :param remote_sources: Remote source file paths
+        :param result: If provided, fetch stats (archive strategy, bytes and files, plus total duration) are appended
+         to C(result['fetch_stats'])
+        :return: Local file path by remote source, and error by remote source which can't be fetched (missing file,
+         directory, etc)
+        """
+        self._display.v('Fetch %s remote files to local tmp directory' % len(remote_sources))
+        start = time.time()
+        quote = self._connection._shell.quote
+        paths = dict()  # type: Dict[Text, Text]
+        errors = dict()  # type: Dict[Text, Text]
+        # Remote sources by archive member name (tar removes leading "/")
+        members = dict()  # type: Dict[Text, List[Text]]
+        expanded_paths = []  # type: List[Text]
+        for remote_source in remote_sources:
+            expanded_path = os.path.normpath(self._remote_expand_user(remote_source))
+            if expanded_path.lstrip('/') not in members:
+                expanded_paths.append(expanded_path)
+            members.setdefault(expanded_path.lstrip('/'), []).append(remote_source)
+        member_names = [expanded_path.lstrip('/') for expanded_path in expanded_paths]
+
+        remote_archive = self._generate_remote_tmp_file_path()
+        script = ['set --']
+        for idx, expanded_path in enumerate(expanded_paths):
+            path = quote(expanded_path)
+            script.append(
+                'if [ ! -e %(path)s ]; then echo "%(idx)s not found"; '
+                'elif [ ! -f %(path)s ]; then echo "%(idx)s not a regular file"; '
+                'elif [ ! -r %(path)s ]; then echo "%(idx)s permission denied"; '
+                'else set -- "$@" %(path)s; fi' % dict(idx=idx, path=path)
+            )
+        script.append('[ $# -eq 0 ] || tar -czhf %s -- "$@"' % quote(remote_archive))
+        res = self._execute_remote_commands(['\n'.join(script)])[0]
+        if res['rc'] != 0:
+            raise AnsibleActionFail('Error during remote files archiving: %s' % res)
+        for line in res['stdout'].splitlines():
+            if line.strip():
+                idx, error = line.strip().split(' ', 1)
+                for remote_source in members.pop(member_names[int(idx)]):
+                    errors[remote_source] = error
+
+        fetch_stats = dict(path=remote_archive, strategy=None, bytes=0)  # type: Dict[Text, Any]
+        if members:
+            archive_result = dict()  # type: Dict
+            # Archive is already compressed and never fetched again
+            archive_path = self._fetch_remote_file_to_local_tmp(remote_archive, task_vars, result=archive_result,
+                                                                use_cache=False, use_delta=False,
+                                                                use_compression=False)
+            fetch_stats.update(archive_result['fetch_stats'][0])
+            try:
+                extracted = dict()  # type: Dict[Text, Text]
+                with tarfile.open(archive_path, 'r:gz') as archive:
+                    for member in archive:
+                        if member.name not in members:
+                            continue
+                        if member.isreg():
+                            file_handler = archive.extractfile(member)
+                            extracted[member.name] = self._create_local_tempfile_from_chunks(
+                                iter(partial(file_handler.read, self._ARCHIVE_CHUNK_SIZE), b'')
+                            )
+                        elif member.islnk() and member.linkname in extracted:
+                            # Same file archived several times (e.g. a symlink and its target)
+                            extracted[member.name] = extracted[member.linkname]
+                        else:
+                            continue
+                        for remote_source in members.pop(member.name):
+                            paths[remote_source] = extracted[member.name]
+            except tarfile.TarError as err:
+                raise AnsibleActionFail('Error during fetched archive extraction: %s' % to_native(err), orig_exc=err)
+            finally:
+                self._get_local_tmp_manager().remove(archive_path)
+            for remote_sources_left in members.values():
+                for remote_source in remote_sources_left:
+                    errors[remote_source] = 'missing from archive'
+
+        if result is not None:
+            fetch_stats.update(files=len(paths), duration=round(time.time() - start, 3))
+            result.setdefault('fetch_stats', []).append(fetch_stats)
+
+        return paths, errors
+
+    def _push_files_to_remote_tmp(self, sources):
+        # type: (ActionBase, Sequence[Union[Text, bytes]]) -> List[Text]
+        """
+        Push several local files with a single transfer: files are packed into a compressed tar archive, archive is
+        transferred to remote tmpdir (see C(_generate_remote_tmp_file_path())) and unpacked by a single remote command
+
+        :param sources: Local file paths (text) or file contents (bytes)
+        :return: Remote file path of each source, in C(sources) order
+        """
+        self._display.v('Push %s files to remote tmp directory' % len(sources))
+        remote_archive = self._generate_remote_tmp_file_path()
+        remote_tmp_dir = os.path.dirname(remote_archive)
+        filenames = []  # type: List[Text]
+        archive_path = self._generate_local_tmp_file_path()
+        try:
+            with tarfile.open(archive_path, 'w:gz', dereference=True) as archive:
+                for source in sources:
+                    filename = self._generate_tmp_filename()
+                    while filename in filenames:
+                        filename = self._generate_tmp_filename()
+                    filenames.append(filename)
+                    if isinstance(source, bytes):
+                        file_info = tarfile.TarInfo(filename)
+                        file_info.size = len(source)
+                        file_info.mtime = int(time.time())
+                        archive.addfile(self._normalize_pushed_file_info(file_info), io.BytesIO(source))
+                    elif os.path.isfile(source):
+                        archive.add(source, arcname=filename, recursive=False, filter=self._normalize_pushed_file_info)
+                    else:
+                        raise AnsibleActionFail('Local file %s not found or not a regular file' % source)
+            self._transfer_file(archive_path, remote_archive)
+        except (IOError, OSError, tarfile.TarError) as err:
+            raise AnsibleActionFail('Error during local files archiving: %s' % to_native(err), orig_exc=err)
+        finally:
+            self._get_local_tmp_manager().remove(archive_path)
+
+        quote = self._connection._shell.quote
+        res = self._low_level_execute_command(
+            'tar -xzf %s -C %s && rm -f %s' % (quote(remote_archive), quote(remote_tmp_dir), quote(remote_archive)),
+            sudoable=False
+        )
+        if res.get('rc', None) != 0:
+            raise AnsibleActionFail('Error during pushed archive extraction: %s' % res)
+        remote_paths = [os.path.join(remote_tmp_dir, filename) for filename in filenames]
+        # Files must be readable by become user
+        self._fixup_perms2(remote_paths, execute=False)
+
+        return remote_paths
+
+    @staticmethod
+    def _normalize_pushed_file_info(file_info):
+        # type: (tarfile.TarInfo) -> tarfile.TarInfo
+        """
+        Local owner and mode are meaningless on remote host: as root, tar would restore them. Files are owned by the
+        remote user (uid 0 only matters if remote user is root) and only readable by it
+        """
+        file_info.uid = file_info.gid = 0
+        file_info.uname = file_info.gname = ''
+        file_info.mode = 0o600
+
+        return file_info
+
+    def _get_fetch_cache(self):
+        # type: (ActionBase) -> LocalFileCache
+        cache_dir = os.path.join(self._get_local_tmp_dir(), 'yoanm-utils-fetch-cache-%s' % os.getuid())
+
+        return LocalFileCache(cache_dir, max_size=self.FETCH_CACHE_MAX_SIZE)
+
+    def _get_remote_file_checksum(self, remote_source, task_vars):
+        # type: (ActionBase, Text, Dict) -> Optional[Text]
+        """
+        :return: Remote file sha1 checksum, or None if not available (missing file, directory, etc)
+        """
+        try:
+            checksum = self._execute_remote_stat(remote_source, all_vars=task_vars, follow=True)['checksum']
+        except AnsibleError as err:
+            self._display.vvv('Unable to get checksum of remote file %s: %s' % (remote_source, to_native(err)))
+            return None
+
+        return checksum if len(checksum) == 40 else None
+
+    def _stream_remote_file_to_local_tmp(self, remote_source):
+        # type: (ActionBase, Text) -> Optional[Text]
+        """
+        :return: Local file path, or None if connection plugin failed to transfer the file
+        """
+        tmp_file_path = self._generate_local_tmp_file_path()
+        try:
+            self._connection.fetch_file(self._remote_expand_user(remote_source), tmp_file_path)
+        except Exception as err:
+            self._display.vvv('Unable to stream remote file %s, fallback on slurp: %s'
+                              % (remote_source, to_native(err)))
+            self._get_local_tmp_manager().remove(tmp_file_path)
+
+            return None
+
+        return tmp_file_path
+
+    def _slurp_remote_file_to_local_tmp(self, remote_source, task_vars):
+        # type: (ActionBase, Text, Dict) -> Text
         res = self._execute_module(
             module_name='ansible.legacy.slurp',
             module_args=dict(path=remote_source),
@@ -239,15 +1023,18 @@ class ActionBase(AnsibleActionBase):
         if res.get('failed', False):
             raise AnsibleActionFail('Error during remote file mirroring: %s' % to_native(res))
 
-        content = b''
+        chunks = []  # type: Any
         if 'content' in res:
             if res['encoding'] == u'base64':
-                content = base64.b64decode(res['content'])
+                content = res.pop('content')
+                # Decode by chunks (multiple of 4 chars) to avoid having the whole decoded content in memory
+                chunks = (base64.b64decode(content[idx:idx + self._BASE64_CHUNK_SIZE])
+                          for idx in range(0, len(content), self._BASE64_CHUNK_SIZE))
             else:
                 raise AnsibleActionFail(
                     'Error during remote file mirroring, unknown encoding: %s' % to_native(res['encoding']))
 
-        return self._create_local_tempfile(content)
+        return self._create_local_tempfile_from_chunks(chunks)
 
     def _create_local_tempfile(self, content):
         # type: (ActionBase, bytes) -> Text
@@ -257,22 +1044,32 @@ class ActionBase(AnsibleActionBase):
         :param content: File content
         :return: local tmp file path
         """
-        tmp_file_path = self._generate_local_tmp_file_path()
+        return self._create_local_tempfile_from_chunks([content])
+
+    def _create_local_tempfile_from_chunks(self, chunks):
+        # type: (ActionBase, Iterable[bytes]) -> Text
+        """
+        Same as C(_create_local_tempfile()) but content is provided by chunks
+        """
         try:
-            # 'x' doesn't seem managed with python 2.7
-            mode = 'ab' if sys.version_info < (2, 8) else 'xb'
-            with open(tmp_file_path, mode) as file_handler:
-                file_handler.write(content)
+            return self._get_local_tmp_manager().create(chunks, prefix=self._get_tmp_filename_prefix())
         except Exception as err:
-            try:
-                os.remove(tmp_file_path)
-            finally:
-                raise AnsibleActionFail(
-                    'Error during local tmpfile creation: %s' % to_native(err),
-                    orig_exc=err
-                )
+            raise AnsibleActionFail(
+                'Error during local tmpfile creation: %s' % to_native(err),
+                orig_exc=err
+            )
 
-        return tmp_file_path
+    def _get_local_tmp_manager(self):
+        # type: (ActionBase) -> LocalTempFileManager
+        if self._local_tmp_manager is None:
+            self._local_tmp_manager = LocalTempFileManager(
+                self._get_local_tmp_dir(),
+                cleanup=self.LOCAL_TMP_CLEANUP,
+                quota=self.LOCAL_TMP_QUOTA,
+                memory_threshold=self.LOCAL_TMP_MEMORY_THRESHOLD
+            )
+
+        return self._local_tmp_manager
 
     def _generate_tmp_filename(self):
         # type: (ActionBase) -> Text
@@ -281,10 +1078,17 @@ class ActionBase(AnsibleActionBase):
 
         :return: filename
         """
-        return str(self._task.action) + '-' + str(getrandbits(32)) + '.tmp'
+        return self._get_tmp_filename_prefix() + str(getrandbits(32)) + '.tmp'
+
+    def _get_tmp_filename_prefix(self):
+        # type: (ActionBase) -> Text
+        return str(self._task.action) + '-'
 
     def _generate_remote_tmp_file_path(self):
         # type: (ActionBase) -> Text
+        """
+        :return: Path located on remote tmpdir (shared with sub-actions, see C(_make_tmp_path()))
+        """
         if self._connection._shell.tmpdir is None:
             tmp_dir = self._make_tmp_path()  # Initialize tmp directory
         else:
@@ -294,4 +1098,11 @@ class ActionBase(AnsibleActionBase):
 
     def _generate_local_tmp_file_path(self):
         # type: (ActionBase) -> Text
-        return os.path.join(self.get_shell_option('system_tmpdirs')[0], self._generate_tmp_filename())
+        """
+        :return: Path of a new empty local file, managed as others local temporary files (see C(LOCAL_TMP_CLEANUP))
+        """
+        return self._get_local_tmp_manager().reserve(prefix=self._get_tmp_filename_prefix())
+
+    def _get_local_tmp_dir(self):
+        # type: (ActionBase) -> Text
+        return self.get_shell_option('system_tmpdirs')[0]
@@ -12,12 +12,13 @@ from ansible.plugins.lookup import LookupBase as AnsibleLookupBase
 from ansible.template import Templar
 
 from ..plugin_utils.execute_plugins import execute_lookup
-from ..plugin_utils.args_validation import check_plugin_argspec
+from ..plugin_utils.concurrency import run_in_threads, DEFAULT_MAX_WORKERS
+from ..plugin_utils.args_validation import check_plugin_argspec, VALIDATION_ENGINE_DEFAULT
 
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Text, Optional, Dict, Any, List, Tuple, Type
+    from typing import Text, Optional, Dict, Any, List, Tuple, Type, Hashable, Sequence
     from ..plugin_utils.args_validation_typing import (
         ArgSpecSchema,
         ArgSpecOptionalSchema,
@@ -31,6 +32,14 @@ class LookupBase(AnsibleLookupBase):
     _templar = None  # type: Templar
 
     VARIABLES_SPEC = None  # type: Optional[Dict]
+    # Use VALIDATION_ENGINE_FAST to validate variables with a validator specialised for the spec
+    VALIDATION_ENGINE = VALIDATION_ENGINE_DEFAULT  # type: Text
+    # Cache validation results for identical variables, enable it only if spec is deterministic (no env fallback, etc)
+    VALIDATION_RESULTS_CACHE = False  # type: bool
+    # Reuse sub-lookup instances (same loader and templar), enable it only if sub-lookups are stateless
+    REUSE_LOOKUP_INSTANCES = False  # type: bool
+    # Maximum number of sub-lookups executed at the same time by _execute_lookups()
+    LOOKUPS_MAX_WORKERS = DEFAULT_MAX_WORKERS  # type: int
 
     def run(self, terms, variables=None, **kwargs):
         # type: (LookupBase, List, Optional[Dict], **Dict) -> List
@@ -66,7 +75,10 @@ class LookupBase(AnsibleLookupBase):
         schema,  # type: ArgSpecSchema
         schema_format='doc',  # type: Text
         schema_conditionals=None,  # type: ArgSpecOptionalSchema
-        other_args=None  # type: ArgSpecOptionalSchema
+        other_args=None,  # type: ArgSpecOptionalSchema
+        cache_key=None,  # type: Optional[Hashable]
+        engine=VALIDATION_ENGINE_DEFAULT,  # type: Text
+        cache_results=False  # type: bool
     ):
         # type: (...) -> PluginArgSpecReturn
         return check_plugin_argspec(
@@ -75,7 +87,10 @@ class LookupBase(AnsibleLookupBase):
             schema,
             schema_format,
             schema_conditionals,
-            other_args
+            other_args,
+            cache_key,
+            engine,
+            cache_results,
         )
 
     @classmethod
@@ -87,9 +102,15 @@ class LookupBase(AnsibleLookupBase):
         # type: (LookupBase, Dict) -> Tuple[bool, Optional[List[Text]], Dict]
         vars_spec = self.VARIABLES_SPEC
         if vars_spec is not None:
+            if not isinstance(variables, dict):
+                # Read-only mapping (e.g. VariablesOverlay), validation needs a dict
+                variables = dict(variables)
             check_res, valid_vars = self.check_argspec(args=variables,
                                                        schema=dict(argument_spec=vars_spec),
-                                                       schema_format='argspec')
+                                                       schema_format='argspec',
+                                                       cache_key=self.__class__,
+                                                       engine=self.VALIDATION_ENGINE,
+                                                       cache_results=self.VALIDATION_RESULTS_CACHE)
             valid = not check_res['failed']
 
             return valid, None if valid else check_res['errors'], valid_vars
@@ -98,7 +119,32 @@ class LookupBase(AnsibleLookupBase):
 
     def _execute_lookup(self, name, terms, variables, **kwargs):
         # type: (LookupBase, Text, List, Dict, **Dict) -> Any
-        loader_kwargs = dict(loader=self._loader, templar=self._templar)
+        return self._execute_lookup_with(self._templar, self.REUSE_LOOKUP_INSTANCES, name, terms, variables, kwargs)
+
+    def _execute_lookup_with(self, templar, reuse_instance, name, terms, variables, kwargs):
+        # type: (LookupBase, Templar, bool, Text, List, Dict, Dict) -> Any
+        loader_kwargs = dict(loader=self._loader, templar=templar)
 
         return execute_lookup(name, terms=terms, lookup_vars=variables, lookup_kwargs=kwargs,
-                              loader_kwargs=loader_kwargs)
+                              loader_kwargs=loader_kwargs, reuse_instance=reuse_instance)
+
+    def _execute_lookups(self, lookups, max_workers=None):
+        # type: (LookupBase, List[Sequence], Optional[int]) -> List
+        """
+        Execute several C(_execute_lookup()) concurrently, lookups must be thread-safe !
+
+        Each sub-lookup gets its own templar (same variables) and its own instance (C(REUSE_LOOKUP_INSTANCES) is
+        ignored), as lookups keep per-call state (options, templar variables). Loader is shared and not thread-safe.
+
+        :param lookups: List of C((name, terms, variables)) or C((name, terms, variables, kwargs))
+        :param max_workers: Default to C(LOOKUPS_MAX_WORKERS)
+        :return: Lookup results, in C(lookups) order. If some lookups fail, error of the first one is raised
+        """
+
+        def execute(lookup):
+            templar = Templar(loader=self._loader, variables=self._templar.available_variables)
+            return self._execute_lookup_with(templar, False, lookup[0], lookup[1], lookup[2],
+                                             lookup[3] if len(lookup) > 3 else dict())
+
+        return run_in_threads(execute, lookups,
+                              max_workers=self.LOOKUPS_MAX_WORKERS if max_workers is None else max_workers)
@@ -4,13 +4,45 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import re
+from copy import deepcopy
 
-from ansible_collections.ansible.utils.plugins.module_utils.common.argspec_validate import AnsibleArgSpecValidator
+import yaml
+from ansible.module_utils.common.text.converters import to_native
+from ansible.module_utils.common.validation import (
+    check_mutually_exclusive,
+    check_required_arguments,
+    check_required_by,
+    check_required_if,
+    check_required_one_of,
+    check_required_together,
+)
+from ansible.module_utils.parsing.convert_bool import BOOLEANS_FALSE, BOOLEANS_TRUE
+from ansible.module_utils.six import binary_type, integer_types, iteritems, string_types
+from ansible_collections.ansible.utils.plugins.module_utils.common.argspec_validate import (
+    AnsibleArgSpecValidator,
+    HAS_ANSIBLE_ARG_SPEC_VALIDATOR,
+    OPTION_CONDITIONALS,
+    OPTION_METADATA,
+)
+from ansible_collections.ansible.utils.plugins.module_utils.common.utils import dict_merge
+
+from .cache import MemoryCache
+
+# use C version if possible for speedup
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore
+
+try:
+    from ansible.module_utils.common.parameters import DEFAULT_TYPE_VALIDATORS
+except ImportError:  # ansible < 2.11 => fast validation engine is not available
+    DEFAULT_TYPE_VALIDATORS = None
 
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Dict, Text
+    from typing import Any, Callable, Dict, Hashable, List, Optional, Text, Tuple
     from .args_validation_typing import (
         ArgSpecSchema,
         ArgSpecOptionalSchema,
@@ -23,6 +55,79 @@ if MYPY:
 __UNEXPECTED_ARG_ERROR_MATCH_PATTERN = r'^\w+(?:, \w+)?. Supported parameters include: .+\.$'
 __UNEXPECTED_ARG_ERROR_TEMPLATE = "Unsupported parameters: %s"
 
+VALIDATION_ENGINE_DEFAULT = "default"
+# Specialised validation function built from the argspec, see C(build_fast_argspec_validator)
+VALIDATION_ENGINE_FAST = "fast"
+
+# Compiled schemas (argspec format, conditionals included), usually keyed by plugin class
+ARGSPEC_SCHEMA_CACHE = MemoryCache()
+# Fast validators, usually keyed by plugin class
+FAST_ARGSPEC_VALIDATOR_CACHE = MemoryCache()
+# Validation results, keyed by plugin class, plugin name, engine and canonical form of the arguments
+VALIDATION_RESULT_CACHE = MemoryCache(max_size=512)
+
+# Option and schema properties managed by fast validators, schemas using anything else are validated by the default
+# engine (aliases, suboptions, fallback, no_log, etc)
+__FAST_VALIDATOR_OPTION_KEYS = frozenset(["type", "default", "required", "choices"])
+__FAST_VALIDATOR_SCHEMA_KEYS = frozenset(["argument_spec"] + list(OPTION_CONDITIONALS))
+
+
+def _extract_argspec_from_doc(doc_options, argument_spec):
+    # type: (Dict, Dict) -> None
+    """
+    Same as C(AnsibleArgSpecValidator._extract_schema_from_doc)
+    """
+    for okey, ovalue in iteritems(doc_options):
+        argument_spec[okey] = {}
+        for metakey in list(ovalue):
+            if metakey == "suboptions":
+                argument_spec[okey].update({"options": {}})
+                _extract_argspec_from_doc(ovalue["suboptions"], argument_spec[okey]["options"])
+            elif metakey in OPTION_METADATA + OPTION_CONDITIONALS:
+                argument_spec[okey].update({metakey: ovalue[metakey]})
+
+
+def compile_argspec_schema(schema, schema_format="doc", schema_conditionals=None):
+    # type: (ArgSpecSchema, Text, ArgSpecOptionalSchema) -> Dict
+    """
+    Convert a schema to the 'argspec' format (parse the doc string if needed) and merge conditionals into it,
+    as C(AnsibleArgSpecValidator) does on every validation
+
+    Result can be given to C(check_argspec) with C(schema_format='argspec') and without C(schema_conditionals)
+    """
+    if schema_format == "doc":
+        argument_spec = dict()  # type: Dict
+        _extract_argspec_from_doc(yaml.load(schema, SafeLoader).get("options"), argument_spec)
+        compiled_schema = dict(argument_spec=argument_spec)
+    else:
+        compiled_schema = schema  # type: ignore
+
+    if schema_conditionals is not None:
+        compiled_schema = dict_merge(compiled_schema, schema_conditionals)
+
+    return compiled_schema
+
+
+def get_compiled_argspec_schema(cache_key, schema, schema_format="doc", schema_conditionals=None):
+    # type: (Hashable, ArgSpecSchema, Text, ArgSpecOptionalSchema) -> Dict
+    """
+    Same as C(compile_argspec_schema) but result is compiled only once per C(cache_key) (plugin class usually)
+
+    Cached schema is compiled again if given schema or conditionals are not the ones used for the cached one
+    """
+    key = (cache_key, schema_format)
+    # Equality check is cheap as schemas are usually the very same objects (class attributes)
+    entry = ARGSPEC_SCHEMA_CACHE.get(
+        key, is_valid=lambda cached: cached[0] == schema and cached[1] == schema_conditionals
+    )
+    if entry is not None:
+        return entry[2]  # type: ignore
+
+    compiled_schema = compile_argspec_schema(schema, schema_format, schema_conditionals)
+    ARGSPEC_SCHEMA_CACHE.set(key, (schema, schema_conditionals, compiled_schema))
+
+    return compiled_schema
+
 
 def check_argspec(name, args, schema, schema_format="doc", schema_conditionals=None, other_args=None):
     # type: (Text, Dict, ArgSpecSchema, Text, ArgSpecOptionalSchema, ArgSpecOptionalSchema) -> ArgSpecReturn
@@ -49,36 +154,265 @@ def check_argspec(name, args, schema, schema_format="doc", schema_conditionals=N
     for error_val in errors:
         # Error message for unexpected param is buggy (missing header)
         # Loop over errors and re-format unexpected param error
-        matches = re.match(__UNEXPECTED_ARG_ERROR_MATCH_PATTERN, error_val)
-        if matches is not None:
-            errors[errors.index(error_val)] = __UNEXPECTED_ARG_ERROR_TEMPLATE % error_val
+        errors[errors.index(error_val)] = _format_unexpected_arg_error(error_val)
 
     return valid, errors, updated_params
 
 
+def _format_unexpected_arg_error(error):
+    # type: (Text) -> Text
+    matches = re.match(__UNEXPECTED_ARG_ERROR_MATCH_PATTERN, error)
+    if matches is not None:
+        return __UNEXPECTED_ARG_ERROR_TEMPLATE % error
+
+    return error
+
+
+def build_fast_argspec_validator(compiled_schema):
+    # type: (Dict) -> Optional[Callable[[Dict], ArgSpecReturn]]
+    """
+    Build a validation function specialised for the given schema (see C(compile_argspec_schema)).
+
+    Function behaves like C(check_argspec) (same checks, same order, same error messages) but option checks are
+    resolved once, at build time, instead of on every validation.
+
+    Only flat argument specs (type, default, required and choices properties) plus conditionals are managed,
+    C(None) is returned for any other schema (or if ansible doesn't provide C(ArgumentSpecValidator)).
+    """
+    if not HAS_ANSIBLE_ARG_SPEC_VALIDATOR or DEFAULT_TYPE_VALIDATORS is None:
+        return None
+    if not isinstance(compiled_schema, dict) or not __FAST_VALIDATOR_SCHEMA_KEYS.issuperset(compiled_schema.keys()):
+        return None
+
+    argument_spec = compiled_schema.get("argument_spec")
+    if not isinstance(argument_spec, dict):
+        return None
+
+    type_checks = []  # type: List[Tuple[Text, Callable, Text, bool, bool, Any]]
+    choices_checks = []  # type: List[Tuple[Text, Any]]
+    defaults = []  # type: List[Tuple[Text, Any]]
+    for name, option in iteritems(argument_spec):
+        if not isinstance(option, dict) or not __FAST_VALIDATOR_OPTION_KEYS.issuperset(option.keys()):
+            return None
+        wanted_type = option.get("type")
+        wanted_name = "str" if wanted_type is None else wanted_type
+        type_checker = DEFAULT_TYPE_VALIDATORS.get(wanted_name) if isinstance(wanted_name, string_types) else None
+        required = option.get("required", False)
+        default = option.get("default", None)
+        choices = option.get("choices")
+        if type_checker is None or (required and default is not None):
+            return None  # Let the default engine manage (and report) weird cases
+        if choices is not None and not isinstance(choices, (list, tuple)):
+            return None
+
+        type_checks.append((name, type_checker, wanted_name, wanted_type == "str", required, default))
+        if choices is not None:
+            choices_checks.append((name, choices))
+        defaults.append((name, default))
+
+    # Same order as ArgumentSpecValidator
+    additional_checks = [
+        (check_func, compiled_schema.get(schema_key))
+        for check_func, schema_key in [
+            (check_required_together, "required_together"),
+            (check_required_one_of, "required_one_of"),
+            (check_required_if, "required_if"),
+            (check_required_by, "required_by"),
+        ]
+        if compiled_schema.get(schema_key) is not None
+    ]
+    mutually_exclusive = compiled_schema.get("mutually_exclusive")
+    # Defaults set before "required" check are only non-None ones
+    early_defaults = [(name, default) for name, default in defaults if default is not None]
+    supported_params = ", ".join(sorted(argument_spec.keys()))
+
+    def validate(args):
+        # type: (Dict) -> ArgSpecReturn
+        params = deepcopy(args)
+        errors = []  # type: List[Text]
+
+        unsupported = [name for name in params if name not in argument_spec]
+
+        if mutually_exclusive is not None:
+            try:
+                check_mutually_exclusive(mutually_exclusive, params)
+            except TypeError as exc:
+                errors.append(to_native(exc))
+
+        for name, default in early_defaults:
+            if name not in params:
+                params[name] = default
+
+        try:
+            check_required_arguments(argument_spec, params)
+        except TypeError as exc:
+            errors.append(to_native(exc))
+
+        for name, type_checker, wanted_name, with_param, required, default in type_checks:
+            if name not in params:
+                continue
+            value = params[name]
+            if value is None and not required and default is None:
+                continue
+            try:
+                if with_param:
+                    # Same (weird) behavior as ansible, first param name is used
+                    params[name] = type_checker(value, param=list(params.keys())[0])
+                else:
+                    params[name] = type_checker(value)
+            except (TypeError, ValueError) as exc:
+                errors.append("argument '%s' is of type %s and we were unable to convert to %s: %s"
+                              % (name, type(value), wanted_name, to_native(exc)))
+
+        for name, choices in choices_checks:
+            if name in params:
+                errors.extend(_check_choices(name, choices, params))
+
+        for check_func, check_terms in additional_checks:
+            try:
+                check_func(check_terms, params)
+            except TypeError as exc:
+                errors.append(to_native(exc))
+
+        for name, default in defaults:
+            if name not in params:
+                params[name] = default
+
+        if unsupported:
+            errors.append(_format_unexpected_arg_error(
+                "%s. Supported parameters include: %s." % (", ".join(sorted(unsupported)), supported_params)
+            ))
+
+        return not errors, errors, params
+
+    return validate
+
+
+def _check_choices(name, choices, params):
+    # type: (Text, Any, Dict) -> List[Text]
+    """
+    Same as choices validation from C(ArgumentSpecValidator)
+    """
+    if isinstance(params[name], list):
+        diff_list = [item for item in params[name] if item not in choices]
+        if diff_list:
+            return ["value of %s must be one or more of: %s. Got no match for: %s"
+                    % (name, ", ".join([to_native(c) for c in choices]), ", ".join(diff_list))]
+    elif params[name] not in choices:
+        # PyYaml converts certain strings to bools. If we can unambiguously convert back, do so before checking
+        if params[name] == "False":
+            overlap = BOOLEANS_FALSE.intersection(choices)
+            if len(overlap) == 1:
+                (params[name],) = overlap
+        if params[name] == "True":
+            overlap = BOOLEANS_TRUE.intersection(choices)
+            if len(overlap) == 1:
+                (params[name],) = overlap
+        if params[name] not in choices:
+            return ["value of %s must be one of: %s, got: %s"
+                    % (name, ", ".join([to_native(c) for c in choices]), params[name])]
+
+    return []
+
+
+def get_fast_argspec_validator(cache_key, compiled_schema):
+    # type: (Hashable, Dict) -> Optional[Callable[[Dict], ArgSpecReturn]]
+    """
+    Same as C(build_fast_argspec_validator) but validator is built only once per C(cache_key) and compiled schema
+    """
+    entry = FAST_ARGSPEC_VALIDATOR_CACHE.get(cache_key)
+    if entry is not None and entry[0] is compiled_schema:
+        return entry[1]  # type: ignore
+
+    validator = build_fast_argspec_validator(compiled_schema)
+    FAST_ARGSPEC_VALIDATOR_CACHE.set(cache_key, (compiled_schema, validator))
+
+    return validator
+
+
+def _canonical_args(value):
+    # type: (Any) -> Hashable
+    """
+    Convert C(value) to an hashable value, equal only to canonical forms of an equal value with the same types
+    (types matter: "1" is not 1, and an unsafe string is not a regular string)
+
+    Raise a C(TypeError) for unmanaged types
+    """
+    value_type = type(value)
+    if isinstance(value, dict):
+        return value_type, frozenset([(_canonical_args(key), _canonical_args(val)) for key, val in iteritems(value)])
+    if isinstance(value, (list, tuple)):
+        return value_type, tuple([_canonical_args(val) for val in value])
+    if isinstance(value, (set, frozenset)):
+        return value_type, frozenset([_canonical_args(val) for val in value])
+    if value is None or isinstance(value, (bool, float, binary_type) + integer_types + string_types):
+        return value_type, value
+
+    raise TypeError('Unmanaged type %s' % value_type)
+
+
+def _get_validation_result_key(cache_key, plugin_name, plugin_args, other_args, engine):
+    # type: (Hashable, Text, Dict, ArgSpecOptionalSchema, Text) -> Optional[Hashable]
+    try:
+        return cache_key, plugin_name, engine, _canonical_args(plugin_args), _canonical_args(other_args)
+    except TypeError:
+        return None  # Result can't be cached
+
+
 def check_plugin_argspec(
     plugin_name,  # type: Text
     plugin_args,  # type: Dict
     schema,  # type: ArgSpecSchema
     schema_format="doc",  # type:  Text
     schema_conditionals=None,  # type: ArgSpecOptionalSchema
-    other_args=None  # type: ArgSpecOptionalSchema
+    other_args=None,  # type: ArgSpecOptionalSchema
+    cache_key=None,  # type: Optional[Hashable]
+    engine=VALIDATION_ENGINE_DEFAULT,  # type: Text
+    cache_results=False  # type: bool
 ):
     # type: (...) -> PluginArgSpecReturn
     """
     Same as the original C(check_argspec) but with typehint (and removal of useless 'valid' property)
     +add 'other_args' param
+    +add 'cache_key' param, schema will be compiled only once for a given key (see C(get_compiled_argspec_schema))
+    +add 'engine' param, C(VALIDATION_ENGINE_FAST) uses a validator specialised for the schema if schema allows it
+    +add 'cache_results' param, results for identical arguments are cached if C(cache_key) is provided
+     (see C(VALIDATION_RESULT_CACHE)). Don't use it with non-deterministic specs (env fallback for instance)
     +always returns a list of errors (from original function it may be a list of string or a string)
     +always returns a dict for updated_params (enclear from original implementation)
     """
-    valid, errors, updated_params = check_argspec(
-        name=plugin_name,
-        schema=schema,
-        schema_format=schema_format,
-        schema_conditionals=schema_conditionals,
-        args=plugin_args,
-        other_args=other_args
-    )
+    fast_validator = None
+    result_key = None
+    if cache_key is not None:
+        schema = get_compiled_argspec_schema(cache_key, schema, schema_format, schema_conditionals)
+        schema_format = "argspec"
+        schema_conditionals = None
+        if cache_results:
+            result_key = _get_validation_result_key(cache_key, plugin_name, plugin_args, other_args, engine)
+            # Cached result is usable only if schema has not been re-compiled in the meantime
+            cached_result = VALIDATION_RESULT_CACHE.get(
+                result_key, is_valid=lambda cached: cached[0] is schema
+            ) if result_key is not None else None
+            if cached_result is not None:
+                return deepcopy(cached_result[1]), deepcopy(cached_result[2])
+        if engine == VALIDATION_ENGINE_FAST:
+            fast_validator = get_fast_argspec_validator(cache_key, schema)  # type: ignore
+    elif engine == VALIDATION_ENGINE_FAST:
+        fast_validator = build_fast_argspec_validator(
+            compile_argspec_schema(schema, schema_format, schema_conditionals)
+        )
+
+    if fast_validator is not None:
+        valid, errors, updated_params = fast_validator(plugin_args)
+    else:
+        valid, errors, updated_params = check_argspec(
+            name=plugin_name,
+            schema=schema,
+            schema_format=schema_format,
+            schema_conditionals=schema_conditionals,
+            args=plugin_args,
+            other_args=other_args
+        )
     # Ensure default values
     check_res = dict(errors=[], failed=(not valid), msg=None)  # type: PluginArgSpecReturnRes
 
@@ -87,4 +421,7 @@ def check_plugin_argspec(
         check_res["errors"] = errors
         check_res["msg"] = "Errors during argspec validation for %s plugin" % plugin_name
 
+    if result_key is not None:
+        VALIDATION_RESULT_CACHE.set(result_key, (schema, deepcopy(check_res), deepcopy(updated_params)))
+
     return check_res, updated_params
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import threading
+from collections import OrderedDict
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class MemoryCache:
+    """
+    Process-wide, thread-safe, in-memory cache with hit/miss counters
+
+    As ansible forks a worker per task/host, cached values are scoped to the worker process (and inherited from the
+    controller process if populated before the fork)
+
+    If C(max_size) is provided, least recently used values are evicted once cache contains more than C(max_size) values
+    """
+
+    def __init__(self, max_size=None):
+        # type: (MemoryCache, Optional[int]) -> None
+        self._lock = threading.RLock()
+        self._data = OrderedDict()  # type: Dict[Hashable, Any]
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        # type: (MemoryCache) -> int
+        return len(self._data)
+
+    def __contains__(self, key):
+        # type: (MemoryCache, Hashable) -> bool
+        return key in self._data
+
+    def get(self, key, default=None, is_valid=None):
+        # type: (MemoryCache, Hashable, Optional[Any], Optional[Callable[[Any], bool]]) -> Any
+        """
+        Return cached value for C(key) (or C(default) if key is not cached) and update counters
+
+        :param is_valid: If provided, a cached value for which it returns False is stale: C(default) is returned and
+         it's counted as a miss
+        """
+        with self._lock:
+            if key in self._data and (is_valid is None or is_valid(self._data[key])):
+                self.hits += 1
+                return self._touch(key)
+            self.misses += 1
+
+            return default
+
+    def set(self, key, value):
+        # type: (MemoryCache, Hashable, Any) -> None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._evict()
+
+    def get_or_create(self, key, factory):
+        # type: (MemoryCache, Hashable, Callable[[], Any]) -> Any
+        """
+        Return cached value for C(key), or create it with C(factory) and cache it
+        """
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._touch(key)
+            self.misses += 1
+            value = factory()
+            self._data[key] = value
+            self._evict()
+
+            return value
+
+    def invalidate(self, key):
+        # type: (MemoryCache, Hashable) -> None
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate):
+        # type: (MemoryCache, Callable[[Hashable], bool]) -> int
+        """
+        Remove cached values whose key matches C(predicate)
+
+        :return: Number of removed values
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+
+            return len(keys)
+
+    def clear(self):
+        # type: (MemoryCache) -> None
+        """
+        Remove all cached values and reset counters
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        # type: (MemoryCache) -> Dict[str, int]
+        with self._lock:
+            res = dict(hits=self.hits, misses=self.misses, size=len(self._data))
+            if self.max_size is not None:
+                res['evictions'] = self.evictions
+
+            return res
+
+    def _touch(self, key):
+        # type: (MemoryCache, Hashable) -> Any
+        """
+        Mark C(key) as most recently used (only needed if size is bounded) and return its value
+        """
+        if self.max_size is None:
+            return self._data[key]
+        # Avoid move_to_end() which doesn't exist on python 2.7
+        value = self._data.pop(key)
+        self._data[key] = value
+
+        return value
+
+    def _evict(self):
+        # type: (MemoryCache) -> None
+        while self.max_size is not None and len(self._data) > self.max_size:
+            self._data.pop(next(iter(self._data)))
+            self.evictions += 1
@@ -3,22 +3,518 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
-from ansible.module_utils.common.text.converters import to_text
-from ansible_collections.ansible.netcommon.plugins.sub_plugins.cli_parser.native_parser import CliParser
+import ast
+import mmap
+import multiprocessing
+import os
+import re
+from copy import deepcopy
+from itertools import chain
+
+import yaml
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.text.converters import to_native, to_text
+from ansible.module_utils.common._collections_compat import Mapping
+from ansible.module_utils.six import iteritems, string_types
+from ansible.utils.multiprocessing import context as mp_context
+from ansible_collections.ansible.netcommon.plugins.module_utils.cli_parser.cli_parsertemplate import (
+    CliParserTemplate,
+)
+from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import (
+    Template,
+    dict_merge,
+    sort_list,
+)
+
+from .cache import MemoryCache
+
+# use C version if possible for speedup
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore
 
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Text, Optional, Dict, Any
+    from typing import Text, Optional, Dict, Any, Iterable, Iterator, List, Tuple, Union
+
+CLI_PARSE_ENGINE_DEFAULT = "default"
+# Template patterns combined into a single regex evaluated once per line, see C(SinglePassParser)
+CLI_PARSE_ENGINE_SINGLE_PASS = "single_pass"
+
+# Loaded templates (C(_NativeTemplate)) by (path, mtime, size) of the file they have been loaded from
+TEMPLATE_CACHE = MemoryCache(max_size=64)
+
+__PARSE_ERROR_TEMPLATE = "Native parser returned an error while parsing. Error: {err}"
+
+
+def native_cli_parse(text, tmpl_path, task_vars=None, debug=False, engine=CLI_PARSE_ENGINE_DEFAULT):
+    # type: (Text, Text, Optional[Dict], bool, Text) -> Dict[Text, Any]
+    """
+    Same as C(ansible.netcommon.native) cli parser, but template is loaded once per worker process (see
+    C(load_native_template()))
+
+    :param task_vars: Unused, kept for compatibility
+    :param debug: Unused, kept for compatibility
+    :param engine: C(CLI_PARSE_ENGINE_SINGLE_PASS) uses C(SinglePassParser) if template allows it (same output)
+    :return: C(dict(parsed=...)), or C(dict(errors=[...])) if template can't be loaded or parsing fails
+    """
+    try:
+        template = _load_native_template(tmpl_path)
+    except yaml.YAMLError as exc:
+        return {"errors": [to_native(exc)]}
+
+    try:
+        return {"parsed": template.get_parser(text.splitlines(), engine).parse()}
+    except Exception as exc:
+        return {"errors": [__PARSE_ERROR_TEMPLATE.format(err=to_native(exc))]}
+
+
+def native_cli_parse_many(items, max_workers=None, engine=CLI_PARSE_ENGINE_DEFAULT):
+    # type: (Iterable[Tuple[Text, Text]], Optional[int], Text) -> Iterator[Tuple[int, Dict[Text, Any]]]
+    """
+    Parse C((text, tmpl_path)) pairs using a pool of worker processes, see C(native_cli_parse())
+
+    Templates are loaded before workers are forked, each worker reuses them (and keeps what it loads by itself, e.g.
+    single pass matcher) for the following items.
+
+    :param max_workers: Maximum number of worker processes (default to the number of CPUs), C(1) means sequential
+    :return: C((index in items, result)) pairs, yielded as soon as parsed (i.e. not in C(items) order)
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+    worker_count = min(max_workers, len(items))
+    if worker_count <= 1:
+        for index, (text, tmpl_path) in enumerate(items):
+            yield index, native_cli_parse(text, tmpl_path, engine=engine)
+        return
+
+    for tmpl_path in set(tmpl_path for dummy, tmpl_path in items):
+        try:
+            _load_native_template(tmpl_path)
+        except Exception:
+            pass  # Reported by the worker parsing it
+
+    pool = mp_context.Pool(worker_count)
+    try:
+        for res in pool.imap_unordered(
+            _parse_in_worker, [(index, text, tmpl_path, engine) for index, (text, tmpl_path) in enumerate(items)]
+        ):
+            yield res
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _parse_in_worker(args):
+    # type: (Tuple[int, Text, Text, Text]) -> Tuple[int, Dict[Text, Any]]
+    index, text, tmpl_path, engine = args
+
+    return index, native_cli_parse(text, tmpl_path, engine=engine)
+
+
+def iter_native_cli_parse(source, tmpl_path):
+    # type: (Union[Text, Iterable[Text]], Text) -> Iterator[Dict[Text, Any]]
+    """
+    Streaming variant of C(native_cli_parse()), for outputs too big to be held in memory
+
+    Records are yielded as soon as parsed: consecutive matching lines producing the same top-level keys (e.g. the
+    C({{ name }}) key of an interface) are merged into a single record. A top-level key is yielded again if its lines
+    are not contiguous, merging records (C(dict_merge())) gives C(native_cli_parse()) C(parsed) value.
+
+    :param source: Path of a file containing the output (memory-mapped), or iterable of lines
+    :raise AnsibleError: If template can't be loaded or parsing fails (records may have been yielded already)
+    """
+    try:
+        template = _load_native_template(tmpl_path)
+    except yaml.YAMLError as exc:
+        raise AnsibleError(to_native(exc))
+    if isinstance(source, string_types):
+        lines = _iter_file_lines(source)
+    else:
+        lines = (sub_line for line in source for sub_line in line.splitlines() or [line])
+
+    record = None  # type: Optional[Dict]
+    try:
+        for res in template.get_streaming_parser(lines).iter_results():
+            if not res:
+                continue
+            if record is not None and sorted(record) == sorted(res):
+                _dict_merge_in_place(record, res)
+                continue
+            if record is not None:
+                yield record
+            record = res
+    except Exception as exc:
+        raise AnsibleError(__PARSE_ERROR_TEMPLATE.format(err=to_native(exc)))
+    if record is not None:
+        yield record
+
+
+def _iter_file_lines(path):
+    # type: (Text) -> Iterator[Text]
+    """
+    :return: Lines of C(path) (same split than C(str.splitlines())), file is memory-mapped and read lazily
+    """
+    with open(path, "rb") as file_handler:
+        if not os.fstat(file_handler.fileno()).st_size:
+            return
+        content = mmap.mmap(file_handler.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for line in iter(content.readline, b""):
+                for sub_line in to_text(line, errors="surrogate_or_strict").splitlines():
+                    yield sub_line
+        finally:
+            content.close()
+
+
+def load_native_template(tmpl_path):
+    # type: (Text) -> Any
+    """
+    Load a native parser template (with regexes compiled), a cached template is reused as long as file mtime and
+    size don't change. Returned template must not be modified !
+    """
+    return _load_native_template(tmpl_path).parsers
+
+
+def _load_native_template(tmpl_path):
+    # type: (Text) -> _NativeTemplate
+    file_stat = os.stat(tmpl_path)
+
+    def load():
+        with open(tmpl_path, "rb") as file_handler:
+            template = _NativeTemplate(_compile_native_template(
+                yaml.load(to_text(file_handler.read(), errors="surrogate_or_strict"), SafeLoader)
+            ))
+        # Drop previous versions
+        invalidate_native_template_cache(tmpl_path)
+
+        return template
+
+    return TEMPLATE_CACHE.get_or_create((tmpl_path, file_stat.st_mtime, file_stat.st_size), load)
+
+
+def invalidate_native_template_cache(tmpl_path=None):
+    # type: (Optional[Text]) -> None
+    """
+    Forget cached versions of C(tmpl_path), or of every template if not provided
+    """
+    if tmpl_path is None:
+        TEMPLATE_CACHE.clear()
+    else:
+        TEMPLATE_CACHE.invalidate_matching(lambda key: key[0] == tmpl_path)
+
+
+def _compile_native_template(template):
+    # type: (Any) -> Any
+    """
+    Compile C(getval) regexes. Malformed entries are left untouched, errors are then reported while parsing (as
+    netcommon does)
+    """
+    if not isinstance(template, list):
+        return template
+    for entry in template:
+        if isinstance(entry, dict) and isinstance(entry.get("getval"), string_types):
+            try:
+                entry["getval"] = re.compile(entry["getval"])
+            except re.error:
+                pass
+
+    return template
+
+
+class _NativeTemplate:
+    """
+    Loaded template, along with what C(SinglePassParser) needs (built on first use)
+    """
+
+    def __init__(self, parsers):
+        # type: (_NativeTemplate, Any) -> None
+        self.parsers = parsers
+        self._matcher = None  # type: Optional[CombinedPatternMatcher]
+        self._matcher_built = False
+        self._renderer = None  # type: Optional[_CachingTemplate]
+
+    def get_parser(self, lines, engine=CLI_PARSE_ENGINE_DEFAULT):
+        # type: (_NativeTemplate, List[Text], Text) -> CliParserTemplate
+        if engine == CLI_PARSE_ENGINE_SINGLE_PASS:
+            self._build_matcher()
+            if self._matcher is not None:
+                return SinglePassParser(lines, self._matcher, self._renderer)
+
+        parser = CliParserTemplate(lines=lines)
+        parser.PARSERS = self.parsers
+
+        return parser
+
+    def get_streaming_parser(self, lines):
+        # type: (_NativeTemplate, Iterable[Text]) -> SinglePassParser
+        """
+        :return: Parser consuming C(lines) lazily, patterns are combined if template allows it
+        """
+        self._build_matcher()
+
+        return SinglePassParser(lines, self._matcher or SequentialPatternMatcher(self.parsers), self._renderer)
+
+    def _build_matcher(self):
+        # type: (_NativeTemplate) -> None
+        if not self._matcher_built:
+            self._matcher = CombinedPatternMatcher.build(self.parsers)
+            self._renderer = _CachingTemplate()
+            self._matcher_built = True
+
+
+class CombinedPatternMatcher:
+    """
+    Template C(getval) patterns combined into a single alternation: as alternatives are tried in order, the matching
+    alternative is the first matching pattern, as netcommon parser does. Named groups are prefixed by the pattern
+    index in order to keep them unique.
+    """
+
+    # Named group or named backreference
+    _NAMED_GROUP = re.compile(r'\(\?P([<=])(\w+)([>)])')
+
+    def __init__(self, regex, entries):
+        # type: (CombinedPatternMatcher, Any, Dict[int, Tuple[Dict, List[Tuple[Text, Text]]]]) -> None
+        self.regex = regex
+        # Template entry and its (prefixed name, name) groups, by index of the alternative group
+        self.entries = entries
+
+    @classmethod
+    def build(cls, parsers):
+        # type: (Any) -> Optional[CombinedPatternMatcher]
+        """
+        :return: Matcher, or None if template can't be combined (malformed entries, numbered backreferences, inline
+         flags, etc)
+        """
+        if not isinstance(parsers, list) or not parsers:
+            return None
+        alternatives = []
+        entries = dict()
+        group_index = 1
+        for idx, parser in enumerate(parsers):
+            pattern = parser.get("getval") if isinstance(parser, dict) else None
+            if not hasattr(pattern, "groupindex") or pattern.flags & ~re.UNICODE:
+                return None
+            prefix = "_%s_" % idx
+            renamed = cls._prefix_named_groups(pattern.pattern, prefix)
+            if renamed is None:
+                return None
+            alternatives.append("(?P<_%s>%s)" % (idx, renamed))
+            names = sorted(pattern.groupindex, key=lambda name: pattern.groupindex[name])
+            entries[group_index] = (parser, [(prefix + name, name) for name in names])
+            group_index += 1 + pattern.groups
+        try:
+            regex = re.compile("|".join(alternatives))
+        except re.error:
+            return None
+        if regex.groups != group_index - 1:
+            return None
+
+        return cls(regex, entries)
+
+    @property
+    def parsers(self):
+        # type: (CombinedPatternMatcher) -> List[Dict]
+        return [self.entries[group_index][0] for group_index in sorted(self.entries)]
+
+    def match(self, line):
+        # type: (CombinedPatternMatcher, Text) -> Optional[Tuple[Dict, Dict[Text, Text]]]
+        """
+        :return: Matching template entry and its captured values (C(None) values excluded), or None
+        """
+        match = self.regex.match(line)
+        if match is None:
+            return None
+        # Alternative group is closed after its nested groups, it is always the last matched group
+        parser, names = self.entries[match.lastindex]
+        capdict = dict()
+        for prefixed_name, name in names:
+            value = match.group(prefixed_name)
+            if value is not None:
+                capdict[name] = value
+
+        return parser, capdict
+
+    @classmethod
+    def _prefix_named_groups(cls, pattern, prefix):
+        # type: (Text, Text) -> Optional[Text]
+        """
+        :return: C(pattern) with prefixed group names, or None if pattern contains constructs which can't be safely
+         combined with other patterns
+        """
+        res = []
+        idx = 0
+        in_class = False
+        while idx < len(pattern):
+            char = pattern[idx]
+            if char == "\\":
+                if not in_class and pattern[idx + 1:idx + 2].isdigit():
+                    return None  # Numbered backreference
+                res.append(pattern[idx:idx + 2])
+                idx += 2
+                continue
+            if in_class:
+                in_class = char != "]"
+            elif char == "[":
+                in_class = True
+                # "]" is a literal at the beginning of a class
+                start = idx + 2 if pattern[idx + 1:idx + 2] == "^" else idx + 1
+                if pattern[start:start + 1] == "]":
+                    res.append(pattern[idx:start + 1])
+                    idx = start + 1
+                    continue
+            elif pattern.startswith("(?", idx):
+                match = cls._NAMED_GROUP.match(pattern, idx)
+                if match:
+                    res.append("(?P%s%s%s%s" % (match.group(1), prefix, match.group(2), match.group(3)))
+                    idx = match.end()
+                    continue
+                if pattern[idx + 2:idx + 3] not in (":", "=", "!", "<", "#"):
+                    return None  # Inline flags or conditional group
+            res.append(char)
+            idx += 1
+
+        return "".join(res)
+
+
+class SequentialPatternMatcher:
+    """
+    Template C(getval) patterns evaluated one by one, as netcommon parser does
+    """
+
+    def __init__(self, parsers):
+        # type: (SequentialPatternMatcher, Any) -> None
+        self.parsers = parsers
+
+    def match(self, line):
+        # type: (SequentialPatternMatcher, Text) -> Optional[Tuple[Dict, Dict[Text, Text]]]
+        """
+        :return: First matching template entry and its captured values (C(None) values excluded), or None
+        """
+        for parser in self.parsers:
+            cap = re.match(parser["getval"], line)
+            if cap:
+                return parser, dict((name, value) for name, value in iteritems(cap.groupdict()) if value is not None)
+
+        return None
+
+
+class SinglePassParser(CliParserTemplate):
+    """
+    Same output as netcommon parser, with a single regex evaluation per line (see C(CombinedPatternMatcher)).
+    Parsed values are also merged in place instead of copying the whole result on each matching line, and Jinja
+    expressions of the template are compiled once.
+    """
+
+    def __init__(self, lines, matcher, renderer):
+        # type: (SinglePassParser, Iterable[Text], Any, Template) -> None
+        """
+        :param matcher: C(CombinedPatternMatcher), or C(SequentialPatternMatcher) for templates which can't be combined
+        """
+        super(SinglePassParser, self).__init__(lines=lines)
+        self.PARSERS = matcher.parsers
+        self._matcher = matcher
+        self._template = renderer
+
+    def parse(self):
+        # type: (SinglePassParser) -> Dict
+        result = dict()  # type: Dict
+        for res in self.iter_results():
+            _dict_merge_in_place(result, res)
+
+        return result
+
+    def iter_results(self):
+        # type: (SinglePassParser) -> Iterator[Dict]
+        """
+        :return: Result of each matching line (lines are consumed lazily), merging them gives C(parse()) result
+        """
+        shared = dict()  # type: Dict
+        for line in self._lines:
+            match = self._matcher.match(line)
+            if match is None:
+                continue
+            parser, capdict = match
+            if parser.get("shared"):
+                shared = capdict
+            vals = dict_merge(capdict, shared)
+            yield self._deepformat(deepcopy(parser["result"]), vals)
+
+
+class _CachingTemplate(Template):
+    """
+    netcommon Jinja renderer, compiling each expression once. Expressions only made of a variable holding a string
+    (e.g. C({{ name }}) with a captured value) are rendered without Jinja.
+    """
+
+    _SIMPLE_VARIABLE = re.compile(r"^\{\{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*\}\}$")
+    # Names which are not variables for Jinja
+    _JINJA_KEYWORDS = frozenset(["true", "false", "none", "True", "False", "None", "and", "or", "not", "in", "is",
+                                 "if", "else"])
+
+    def __init__(self):
+        # type: (_CachingTemplate) -> None
+        super(_CachingTemplate, self).__init__()
+        from_string = self.env.from_string
+        compiled = dict()  # type: Dict[Text, Any]
+
+        def cached_from_string(source):
+            if source not in compiled:
+                compiled[source] = from_string(source)
+
+            return compiled[source]
+
+        self.env.from_string = cached_from_string
+
+    def __call__(self, value, variables=None, fail_on_undefined=True):
+        # type: (_CachingTemplate, Any, Optional[Dict], bool) -> Any
+        match = self._SIMPLE_VARIABLE.match(value) if isinstance(value, string_types) else None
+        if match and match.group(1) not in self._JINJA_KEYWORDS and variables \
+                and isinstance(variables.get(match.group(1)), string_types):
+            value = variables[match.group(1)]
+            # Same as Template.__call__() once value is rendered
+            if value:
+                try:
+                    return ast.literal_eval(value)
+                except Exception:
+                    return str(value)
+            else:
+                return None
+
+        return super(_CachingTemplate, self).__call__(value, variables=variables, fail_on_undefined=fail_on_undefined)
 
 
-def native_cli_parse(text, tmpl_path, task_vars=None, debug=False):
-    # type: (Text, Text, Optional[Dict], bool) -> Dict[Text, Any]
-    if task_vars is None:
-        task_vars = dict()
+def _dict_merge_in_place(base, other):
+    # type: (Dict, Dict) -> Dict
+    """
+    Same as netcommon C(dict_merge()), but C(base) is updated instead of being copied (values of C(other) must not be
+    used afterwards)
+    """
+    if not isinstance(base, dict):
+        raise AssertionError("`base` must be of type <dict>")
+    if not isinstance(other, dict):
+        raise AssertionError("`other` must be of type <dict>")
 
-    with open(tmpl_path, "rb") as file_handler:
-        tmpl_contents = to_text(file_handler.read(), errors="surrogate_or_strict")
-    parser = CliParser(task_args=dict(text=text), task_vars=task_vars, debug=debug)
+    # Only keys of other are visited (base is the whole parsing result)
+    for key, item in iteritems(other):
+        if key not in base:
+            base[key] = item
+            continue
+        value = base[key]
+        if item is None:
+            base[key] = item
+        elif isinstance(value, dict):
+            base[key] = _dict_merge_in_place(value, item) if isinstance(item, Mapping) else item
+        elif isinstance(value, list):
+            try:
+                base[key] = list(set(chain(value, item)))
+            except TypeError:
+                value.extend([i for i in item if i not in value])
+        elif sort_list(value) != sort_list(item):
+            base[key] = item
 
-    return parser.parse(template_contents=tmpl_contents)  # type: ignore
+    return base
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import copy
+import sys
+import threading
+
+from ansible.module_utils.six import reraise
+from ansible.module_utils.six.moves import queue
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Any, Callable, Dict, Iterable, List, Optional
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def run_in_threads(func, items, max_workers=None):
+    # type: (Callable[[Any], Any], Iterable, Optional[int]) -> List
+    """
+    Call C(func) for each item of C(items) using a bounded pool of threads and return results in C(items) order
+
+    Error handling is the same than a sequential execution: if some calls fail, exception raised by the call having
+    the lowest index is re-raised (other errors are dropped), and items after a known failure are not processed.
+
+    :param max_workers: Maximum number of concurrent calls (default to C(DEFAULT_MAX_WORKERS)), C(1) means sequential
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    worker_count = min(max_workers, len(items))
+    if worker_count <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)  # type: List
+    errors = dict()  # type: Dict[int, Any]
+    state = dict(first_error_index=len(items))
+    lock = threading.Lock()
+    todo = queue.Queue()
+    for index, item in enumerate(items):
+        todo.put((index, item))
+
+    def worker():
+        while True:
+            try:
+                index, item = todo.get_nowait()
+            except queue.Empty:
+                return
+            # Items are dequeued in order, an item located before a failing one is always processed
+            if index > state['first_error_index']:
+                continue
+            try:
+                results[index] = func(item)
+            except Exception:
+                with lock:
+                    errors[index] = sys.exc_info()
+                    state['first_error_index'] = min(state['first_error_index'], index)
+
+    threads = [threading.Thread(target=worker) for _ in range(worker_count)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        reraise(*errors[min(errors)])
+
+    return results
+
+
+class ConnectionLock:
+    """
+    Lock held by a thread from its first C(acquire()) until C(release()), whatever the number of C(acquire()) calls
+    """
+
+    def __init__(self):
+        # type: (ConnectionLock) -> None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def acquire(self):
+        # type: (ConnectionLock) -> None
+        if not getattr(self._local, 'owned', False):
+            self._lock.acquire()
+            self._local.owned = True
+
+    def release(self):
+        # type: (ConnectionLock) -> None
+        if getattr(self._local, 'owned', False):
+            self._local.owned = False
+            self._lock.release()
+
+
+class _LockingProxy:
+    """
+    Acquire C(lock) as soon as a method of C(target) is used or an attribute is set
+    """
+
+    def __init__(self, target, lock):
+        # type: (_LockingProxy, Any, ConnectionLock) -> None
+        object.__setattr__(self, '_proxy_target', target)
+        object.__setattr__(self, '_proxy_lock', lock)
+
+    def __getattr__(self, name):
+        # type: (_LockingProxy, str) -> Any
+        value = getattr(self._proxy_target, name)
+        if callable(value):
+            self._proxy_lock.acquire()
+
+        return value
+
+    def __setattr__(self, name, value):
+        # type: (_LockingProxy, str, Any) -> None
+        self._proxy_lock.acquire()
+        setattr(self._proxy_target, name, value)
+
+
+class LockedConnection(_LockingProxy):
+    """
+    Connection proxy allowing several sub-actions to share a connection concurrently
+
+    Once a sub-action uses the connection (or its become plugin), it keeps exclusive access until C(lock) is released
+    (commands are built and executed in several steps relying on connection and become states).
+    Shell is copied in order to give each sub-action its own remote temporary directory.
+    """
+
+    def __init__(self, connection, lock):
+        # type: (LockedConnection, Any, ConnectionLock) -> None
+        super(LockedConnection, self).__init__(connection, lock)
+        shell = copy.copy(connection._shell)
+        shell.tmpdir = None
+        object.__setattr__(self, '_shell', shell)
+        become = getattr(connection, 'become', None)
+        if become is not None:
+            object.__setattr__(self, 'become', _LockingProxy(become, lock))
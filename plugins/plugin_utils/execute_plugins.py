@@ -3,16 +3,57 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import threading
+
 from ansible.errors import AnsibleError
 from ansible.plugins.action import ActionBase
 from ansible.plugins.loader import lookup_loader, action_loader
 from ansible.plugins.lookup import LookupBase
 from ansible.utils.unsafe_proxy import wrap_var
 
+from .cache import MemoryCache
+from .concurrency import run_in_threads
+
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Optional, Text, List, Dict, Any
+    from typing import Optional, Text, List, Dict, Any, Type, Sequence
+
+# Resolved plugin classes, keyed by loader package and plugin name
+PLUGIN_CLASS_CACHE = MemoryCache()
+# Lookup instances which can be reused (see C(execute_lookup)), keyed by lookup name, loader and templar
+LOOKUP_INSTANCE_CACHE = MemoryCache(max_size=128)
+# Plugin loaders are not thread-safe (concurrent imports of the same plugin module), see C(execute_lookups)
+_LOADER_LOCK = threading.RLock()
+
+
+def _load_plugin(plugin_loader, name, loader_args, loader_kwargs):
+    # type: (Any, Text, List, Dict) -> Any
+    """
+    Same as C(plugin_loader.get()) but plugin class is resolved only once per worker process for a given name
+    """
+    if 'class_only' in loader_kwargs or 'collection_list' in loader_kwargs:
+        with _LOADER_LOCK:
+            return plugin_loader.get(name, *loader_args, **loader_kwargs)
+
+    key = (plugin_loader.package, name)
+    plugin_class = PLUGIN_CLASS_CACHE.get(key)  # type: Optional[Type]
+    if plugin_class is None:
+        with _LOADER_LOCK:
+            # Resolution (paths, redirections, module loading, etc) is done by the loader. It also updates the class
+            # with loading info (_load_name, _original_path, etc), instances will inherit them
+            plugin_class = plugin_loader.get(name, class_only=True)
+        if plugin_class is None:
+            return None
+        PLUGIN_CLASS_CACHE.set(key, plugin_class)
+
+    try:
+        return plugin_class(*loader_args, **loader_kwargs)
+    except TypeError as exc:
+        if 'abstract' in str(exc):
+            # Same as the loader, abstract or incomplete plugins are not loaded
+            return None
+        raise
 
 
 def execute_action(name, task_vars, loader_args=None, loader_kwargs=None):
@@ -22,7 +63,7 @@ def execute_action(name, task_vars, loader_args=None, loader_kwargs=None):
     if loader_args is None:
         loader_args = list()
 
-    action = action_loader.get(name, *loader_args, **loader_kwargs)  # type: Optional[ActionBase]
+    action = _load_plugin(action_loader, name, loader_args, loader_kwargs)  # type: Optional[ActionBase]
 
     if action is None:
         raise AnsibleError('Unable to load action named "%s"' % name)
@@ -30,8 +71,13 @@ def execute_action(name, task_vars, loader_args=None, loader_kwargs=None):
     return dict(action.run(task_vars=task_vars))
 
 
-def execute_lookup(name, terms, lookup_vars, lookup_kwargs=None, loader_args=None, loader_kwargs=None):
-    # type: (Text, List, Dict, Optional[Dict], Optional[List], Optional[Dict]) -> Any
+def execute_lookup(name, terms, lookup_vars, lookup_kwargs=None, loader_args=None, loader_kwargs=None,
+                   reuse_instance=False):
+    # type: (Text, List, Dict, Optional[Dict], Optional[List], Optional[Dict], bool) -> Any
+    """
+    :param reuse_instance: Reuse lookup instance previously created with the same loader and templar (only if
+     C(loader_kwargs) contains nothing else and C(loader_args) is empty). Lookup must not keep state between runs !
+    """
     if lookup_kwargs is None:
         lookup_kwargs = dict()
     if loader_kwargs is None:
@@ -39,11 +85,43 @@ def execute_lookup(name, terms, lookup_vars, lookup_kwargs=None, loader_args=Non
     if loader_args is None:
         loader_args = list()
 
-    lookup = lookup_loader.get(name, *loader_args, **loader_kwargs)  # type: Optional[LookupBase]
+    instance_key = None
+    lookup = None  # type: Optional[LookupBase]
+    if reuse_instance and not loader_args and set(loader_kwargs.keys()).issubset(['loader', 'templar']):
+        loader = loader_kwargs.get('loader')
+        templar = loader_kwargs.get('templar')
+        instance_key = (name, id(loader), id(templar))
+        lookup = LOOKUP_INSTANCE_CACHE.get(instance_key)
+        # Ensure ids have not been re-used by other objects
+        if lookup is not None and (lookup._loader is not loader or lookup._templar is not templar):
+            lookup = None
 
     if lookup is None:
-        raise AnsibleError('Unable to load lookup named "%s"' % name)
+        lookup = _load_plugin(lookup_loader, name, loader_args, loader_kwargs)
+
+        if lookup is None:
+            raise AnsibleError('Unable to load lookup named "%s"' % name)
+
+        if instance_key is not None:
+            LOOKUP_INSTANCE_CACHE.set(instance_key, lookup)
 
     res = lookup.run(terms=terms, variables=lookup_vars, **lookup_kwargs)
 
     return wrap_var(res)
+
+
+def execute_lookups(lookups, loader_args=None, loader_kwargs=None, reuse_instance=False, max_workers=None):
+    # type: (Sequence[Sequence], Optional[List], Optional[Dict], bool, Optional[int]) -> List
+    """
+    Execute several lookups concurrently (see C(run_in_threads) for ordering and error handling)
+
+    :param lookups: List of C((name, terms, lookup_vars)) or C((name, terms, lookup_vars, lookup_kwargs))
+    :param max_workers: Maximum number of lookups executed at the same time
+    :return: Lookup results, in C(lookups) order
+    """
+
+    def execute(lookup):
+        return execute_lookup(*lookup[:3], lookup_kwargs=lookup[3] if len(lookup) > 3 else None,
+                              loader_args=loader_args, loader_kwargs=loader_kwargs, reuse_instance=reuse_instance)
+
+    return run_in_threads(execute, lookups, max_workers=max_workers)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import errno
+import os
+import shutil
+import tempfile
+from hashlib import sha1
+
+from ansible.module_utils.common.text.converters import to_bytes
+from ansible.utils.hashing import secure_hash
+
+from .local_tmp import check_private_dir
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import List, Optional, Text, Tuple
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+
+class LocalFileCache:
+    """
+    Content-addressed cache of files, located on local filesystem
+
+    Files are stored under C(<cache_dir>/<sha1(key)>/<checksum>), only the latest checksum is kept for a given key.
+    Once cache is bigger than C(max_size) bytes, least recently used files are removed.
+    Cache can be shared between processes (files are atomically created and removed files are ignored).
+    C(cache_dir) must be private (owned by current user, not accessible by other users), an C(AnsibleError) is raised
+    otherwise.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        # type: (LocalFileCache, Text, int) -> None
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get(self, key, checksum):
+        # type: (LocalFileCache, Text, Text) -> Optional[Text]
+        """
+        :return: Path of the cached file (must not be modified !), or None if not cached
+        """
+        if not self._check_cache_dir():
+            return None
+        path = self._get_path(key, checksum)
+        try:
+            # Mark file as recently used
+            os.utime(path, None)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return None
+
+        return path
+
+    def get_latest(self, key):
+        # type: (LocalFileCache, Text) -> Optional[Tuple[Text, Text]]
+        """
+        :return: Path (must not be modified !) and checksum of the file cached for C(key), whatever its checksum, or
+         None if nothing is cached
+        """
+        if not self._check_cache_dir():
+            return None
+        key_dir = os.path.dirname(self._get_path(key, ''))
+        try:
+            filenames = os.listdir(key_dir)
+        except OSError:
+            return None
+        for filename in filenames:
+            # Ignore files being written
+            if not filename.startswith('.'):
+                path = self.get(key, filename)
+                if path is not None:
+                    return path, filename
+
+        return None
+
+    def copy_to(self, key, checksum, dest):
+        # type: (LocalFileCache, Text, Text, Text) -> bool
+        """
+        Copy cached file to C(dest), copy is verified against C(checksum) (sha1)
+
+        :return: False if file is not cached (or cached file is corrupted, it is then removed)
+        """
+        path = self.get(key, checksum)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest)
+        except (IOError, OSError) as err:
+            # Removed meanwhile by another process
+            if err.errno != errno.ENOENT:
+                raise
+            return False
+        if secure_hash(dest) != checksum:
+            self._remove(path)
+            return False
+
+        return True
+
+    def put(self, key, checksum, src):
+        # type: (LocalFileCache, Text, Text, Text) -> None
+        """
+        Cache a copy of C(src), previously cached files for C(key) are removed
+        """
+        self._makedirs(self.cache_dir)
+        self._check_cache_dir()
+        key_dir = os.path.dirname(self._get_path(key, checksum))
+        self._makedirs(key_dir)
+        for filename in os.listdir(key_dir):
+            if filename != checksum:
+                self._remove(os.path.join(key_dir, filename))
+
+        fd, tmp_path = tempfile.mkstemp(dir=key_dir, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as file_handler, open(src, 'rb') as src_handler:
+                shutil.copyfileobj(src_handler, file_handler)
+            os.rename(tmp_path, self._get_path(key, checksum))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        # type: (LocalFileCache) -> List[Text]
+        """
+        Remove least recently used files until cache size is lower than C(max_size)
+
+        :return: Removed file paths
+        """
+        files = []  # type: List[Tuple[float, int, Text]]
+        total_size = 0
+        for dir_path, dummy, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(dir_path, filename)
+                try:
+                    file_stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((file_stat.st_mtime, file_stat.st_size, path))
+                total_size += file_stat.st_size
+
+        removed = []
+        for dummy, size, path in sorted(files):
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            removed.append(path)
+            total_size -= size
+
+        return removed
+
+    def _check_cache_dir(self):
+        # type: (LocalFileCache) -> bool
+        """
+        :return: False if cache directory doesn't exist
+        :raise AnsibleError: If cache directory is not private
+        """
+        try:
+            check_private_dir(self.cache_dir)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return False
+
+        return True
+
+    def _get_path(self, key, checksum):
+        # type: (LocalFileCache, Text, Text) -> Text
+        return os.path.join(self.cache_dir, sha1(to_bytes(key)).hexdigest(), checksum)
+
+    @staticmethod
+    def _makedirs(path):
+        # type: (Text) -> None
+        try:
+            os.makedirs(path, 0o700)
+        except OSError as err:
+            # No exist_ok on python 2.7
+            if err.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def _remove(path):
+        # type: (Text) -> None
+        try:
+            os.remove(path)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import atexit
+import errno
+import itertools
+import multiprocessing
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+
+from ansible.errors import AnsibleError
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Dict, Iterable, List, Optional, Set, Text, Tuple
+
+LOCAL_TMP_CLEANUP_TASK = 'task'
+LOCAL_TMP_CLEANUP_RUN = 'run'
+LOCAL_TMP_CLEANUP_NEVER = 'never'
+LOCAL_TMP_CLEANUP_MODES = (LOCAL_TMP_CLEANUP_TASK, LOCAL_TMP_CLEANUP_RUN, LOCAL_TMP_CLEANUP_NEVER)
+
+RUN_DIR_PREFIX = 'yoanm-utils-run-'
+
+# memfd_create() is available with python 3.8+ on Linux
+HAS_MEMFD = hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd')
+
+__SWEPT_BASE_DIRS = set()  # type: Set[Text]
+__SWEEP_LOCK = threading.Lock()
+
+
+def get_run_pid():
+    # type: () -> int
+    """
+    :return: PID of ansible controller process (tasks are executed by worker processes forked by the controller)
+    """
+    if multiprocessing.current_process().name == 'MainProcess':
+        return os.getpid()
+
+    return os.getppid()
+
+
+def is_process_alive(pid):
+    # type: (int) -> bool
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno == errno.EPERM
+
+    return True
+
+
+def sweep_stale_run_dirs(base_dir):
+    # type: (Text) -> List[Text]
+    """
+    Remove run directories (see C(LocalTempFileManager)) whose controller process doesn't exist anymore
+
+    :return: Removed directories
+    """
+    pattern = re.compile(r'^%s%s-(\d+)$' % (re.escape(RUN_DIR_PREFIX), os.getuid()))
+    removed = []
+    try:
+        filenames = os.listdir(base_dir)
+    except OSError:
+        return removed
+    for filename in filenames:
+        match = pattern.match(filename)
+        if match and not is_process_alive(int(match.group(1))):
+            shutil.rmtree(os.path.join(base_dir, filename), ignore_errors=True)
+            removed.append(os.path.join(base_dir, filename))
+
+    return removed
+
+
+def check_private_dir(path):
+    # type: (Text) -> None
+    """
+    Ensure C(path) is a directory (not a symlink) owned by current user and not accessible by other users
+
+    :raise AnsibleError: If directory is not private (e.g. pre-created by another user of a shared directory)
+    """
+    dir_stat = os.lstat(path)
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077:
+        raise AnsibleError('Unsafe local temporary directory: %s' % path)
+
+
+def _sweep_once(base_dir):
+    # type: (Text) -> None
+    with __SWEEP_LOCK:
+        if base_dir in __SWEPT_BASE_DIRS:
+            return
+        __SWEPT_BASE_DIRS.add(base_dir)
+    sweep_stale_run_dirs(base_dir)
+
+
+class LocalTempFileManager:
+    """
+    Create local temporary files and manage their lifecycle
+
+    Unless cleanup mode is C(never), files are atomically created (no collision, only readable by current user) in
+    a private directory dedicated to the current playbook run. Run directories left by previous runs (controller
+    process doesn't exist anymore) are removed when the first manager of a process is used.
+
+    Cleanup modes:
+    - C(task): created files are removed by C(cleanup()) (i.e. at the end of the task for C(ActionBase))
+    - C(run): files are kept until the end of the run. Run directory is removed at controller process exit only if
+      the controller itself created it, otherwise (managers used by ansible worker processes, i.e. by actions) it is
+      removed by the first manager used by the next run (see C(sweep_stale_run_dirs()))
+    - C(never): files are created directly on C(base_dir) and never removed (legacy behavior)
+
+    If C(quota) (in bytes) is provided, least recently modified files created by the manager are removed once they
+    are bigger than C(quota). Files of other managers (e.g. tasks of other hosts sharing the run directory) are
+    never touched.
+
+    If C(memory_threshold) (in bytes) is provided and memfd is available, files created with C(create()) whose size
+    is lower or equal to the threshold are kept in memory and exposed through a C(/proc/<pid>/fd/<fd>) path. Such
+    path is only valid until C(cleanup()) is called or current process ends (i.e. the end of the task for
+    C(ActionBase)), whatever the cleanup mode.
+    """
+
+    def __init__(self, base_dir, cleanup=LOCAL_TMP_CLEANUP_RUN, quota=None, memory_threshold=None):
+        # type: (LocalTempFileManager, Text, Text, Optional[int], Optional[int]) -> None
+        if cleanup not in LOCAL_TMP_CLEANUP_MODES:
+            raise AnsibleError('Unknown local temporary files cleanup mode: %s' % cleanup)
+        self.base_dir = base_dir
+        self.cleanup_mode = cleanup
+        self.quota = quota
+        self.memory_threshold = memory_threshold
+        self.created = []  # type: List[Text]
+        self.in_memory = dict()  # type: Dict[Text, int]
+
+    @property
+    def run_dir(self):
+        # type: (LocalTempFileManager) -> Text
+        if self.cleanup_mode == LOCAL_TMP_CLEANUP_NEVER:
+            return self.base_dir
+
+        return os.path.join(self.base_dir, '%s%s-%s' % (RUN_DIR_PREFIX, os.getuid(), get_run_pid()))
+
+    def reserve(self, prefix='', suffix='.tmp'):
+        # type: (LocalTempFileManager, Text, Text) -> Text
+        """
+        :return: Path of a new empty file
+        """
+        fd, path = self._mkstemp(prefix, suffix)
+        os.close(fd)
+
+        return path
+
+    def create(self, chunks, prefix='', suffix='.tmp'):
+        # type: (LocalTempFileManager, Iterable[bytes], Text, Text) -> Text
+        """
+        :param chunks: File content, by chunks
+        :return: Path of the new file
+        """
+        if self.memory_threshold is not None and HAS_MEMFD:
+            chunks = iter(chunks)
+            buffered = []  # type: List[bytes]
+            size = 0
+            for chunk in chunks:
+                buffered.append(chunk)
+                size += len(chunk)
+                if size > self.memory_threshold:
+                    break
+            else:
+                path = self._create_in_memory(prefix, buffered)
+                if path is not None:
+                    return path
+            # Spool on disk
+            chunks = itertools.chain(buffered, chunks)
+
+        fd, path = self._mkstemp(prefix, suffix)
+        try:
+            with os.fdopen(fd, 'wb') as file_handler:
+                for chunk in chunks:
+                    file_handler.write(chunk)
+        except Exception:
+            self.remove(path)
+            raise
+        self.enforce_quota(keep=[path])
+
+        return path
+
+    def cleanup(self):
+        # type: (LocalTempFileManager) -> None
+        """
+        Release in-memory files, and remove created files if cleanup mode is C(task)
+        """
+        while self.in_memory:
+            os.close(self.in_memory.popitem()[1])
+        if self.cleanup_mode != LOCAL_TMP_CLEANUP_TASK:
+            return
+        while self.created:
+            self.remove(self.created.pop())
+
+    def enforce_quota(self, keep=()):
+        # type: (LocalTempFileManager, Iterable[Text]) -> List[Text]
+        """
+        :param keep: Files which must not be removed
+        :return: Removed files
+        """
+        if self.quota is None or self.cleanup_mode == LOCAL_TMP_CLEANUP_NEVER:
+            return []
+        files = []  # type: List[Tuple[float, int, Text]]
+        total_size = 0
+        for path in self.created:
+            try:
+                file_stat = os.lstat(path)
+            except OSError:
+                continue
+            files.append((file_stat.st_mtime, file_stat.st_size, path))
+            total_size += file_stat.st_size
+
+        removed = []
+        for dummy, size, path in sorted(files):
+            if total_size <= self.quota:
+                break
+            if path in keep:
+                continue
+            self.remove(path)
+            removed.append(path)
+            total_size -= size
+
+        return removed
+
+    def remove(self, path):
+        # type: (LocalTempFileManager, Text) -> None
+        """
+        Remove a file created by the manager before the end of its lifecycle (missing file is ignored)
+        """
+        if path in self.in_memory:
+            os.close(self.in_memory.pop(path))
+            return
+        try:
+            os.remove(path)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+        if path in self.created:
+            self.created.remove(path)
+
+    def _create_in_memory(self, prefix, chunks):
+        # type: (LocalTempFileManager, Text, List[bytes]) -> Optional[Text]
+        """
+        :return: C(/proc/<pid>/fd/<fd>) path, or None if memfd can't be used
+        """
+        try:
+            fd = os.memfd_create(prefix or 'tmp')  # type: ignore
+        except OSError:
+            return None
+        try:
+            for chunk in chunks:
+                os.write(fd, chunk)
+            path = '/proc/%s/fd/%s' % (os.getpid(), fd)
+            if not os.path.exists(path):
+                os.close(fd)
+                return None
+        except Exception:
+            os.close(fd)
+            raise
+        self.in_memory[path] = fd
+
+        return path
+
+    def _mkstemp(self, prefix, suffix):
+        # type: (LocalTempFileManager, Text, Text) -> Tuple[int, Text]
+        run_dir = self.run_dir
+        if self.cleanup_mode != LOCAL_TMP_CLEANUP_NEVER:
+            self._init_run_dir(run_dir)
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=run_dir)
+        self.created.append(path)
+
+        return fd, path
+
+    def _init_run_dir(self, run_dir):
+        # type: (LocalTempFileManager, Text) -> None
+        _sweep_once(self.base_dir)
+        try:
+            os.mkdir(run_dir, 0o700)
+            if get_run_pid() == os.getpid():
+                # Manager used by controller process itself
+                atexit.register(shutil.rmtree, run_dir, True)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        # Ensure directory has not been created by someone else
+        check_private_dir(run_dir)
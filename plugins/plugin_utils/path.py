@@ -3,32 +3,45 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import errno
 import os.path
 
-from ansible.plugins.loader import lookup_loader
-from ansible.plugins.lookup import LookupBase
+from ansible import constants as C
+from ansible.module_utils.common.text.converters import to_bytes, to_text
+from ansible.utils.path import unfrackpath
 from ansible_collections.ansible.utils.plugins.module_utils.common.utils import to_list
 
+from .cache import MemoryCache
+
 # Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
 MYPY = False
 if MYPY:
-    from typing import Text, Optional, Dict, List
+    from typing import Text, Optional, Dict, List, FrozenSet, Tuple
+
+# Collection paths by (collection name, COLLECTIONS_PATHS value)
+COLLECTION_PATH_CACHE = MemoryCache(max_size=256)
+# Directories of collections indexed by CollectionFileIndex
+INDEXED_COLLECTION_DIRS = ('files', 'templates', 'vars')
+_B_INDEXED_DIRS = frozenset(to_bytes(dirname) for dirname in INDEXED_COLLECTION_DIRS)
 
 
 def get_collection_path(c_full_name):
     # type: (Text) -> List[Text]
-    lookup = lookup_loader.get('config')  # type: Optional[LookupBase]
+    """
+    :return: Path of the collection under each C(COLLECTIONS_PATHS) directory, resolved once per process as long as
+     C(COLLECTIONS_PATHS) value doesn't change (see C(invalidate_collection_path_cache()))
+    """
+    paths = tuple(to_list(C.config.get_config_value('COLLECTIONS_PATHS')))
 
-    if lookup is None:
-        raise Exception('Unable to load config lookup !')
+    def resolve():
+        return tuple(os.path.join(path, *c_full_name.split('.')) for path in paths)
 
-    paths = to_list(to_list(lookup.run(terms=['COLLECTIONS_PATHS']))[0])
+    return list(COLLECTION_PATH_CACHE.get_or_create((c_full_name, paths), resolve))
 
-    res = []
-    for path in paths:
-        res.append(os.path.join(path, *c_full_name.split('.')))
 
-    return res
+def invalidate_collection_path_cache():
+    # type: () -> None
+    COLLECTION_PATH_CACHE.clear()
 
 
 def append_collection_path_to_ansible_search_path(c_full_name, variables=None):
@@ -39,11 +52,90 @@ def append_collection_path_to_ansible_search_path(c_full_name, variables=None):
     else:
         ansible_search_path = variables['ansible_search_path']
 
-    collection_path_list = get_collection_path(c_full_name)
-    for collection_path in collection_path_list:
-        if collection_path not in ansible_search_path:
+    known_paths = set(ansible_search_path)
+    for collection_path in get_collection_path(c_full_name):
+        if collection_path not in known_paths:
+            known_paths.add(collection_path)
             ansible_search_path.append(collection_path)
 
     variables['ansible_search_path'] = ansible_search_path
 
     return variables
+
+
+class CollectionFileIndex:
+    """
+    Per-process index of files located under collection C(INDEXED_COLLECTION_DIRS) directories
+
+    Directory listings are loaded on first use and reused as long as directory mtime doesn't change. Looking for a file
+    then costs a single C(stat()) of its directory, whatever the number of candidates located in that directory.
+    """
+
+    def __init__(self):
+        # type: (CollectionFileIndex) -> None
+        # (mtime, entry names) by directory path
+        self._listings = dict()  # type: Dict[bytes, Tuple[float, FrozenSet[bytes]]]
+
+    def find(self, collection_path, dirname, needle):
+        # type: (CollectionFileIndex, Text, Text, Text) -> Optional[Text]
+        """
+        Same candidates and result as C(DataLoader.path_dwim_relative_stack()) for a single collection path
+
+        :return: Path of the needle, or None if not found in C(collection_path)
+        """
+        b_upath = to_bytes(unfrackpath(collection_path, follow=False), errors='surrogate_or_strict')
+        b_needle = to_bytes(needle, errors='surrogate_or_strict')
+        candidates = []
+        # Same (odd) check than path_dwim_relative_stack(), always true on python 3
+        if b_needle.split(b'/')[0] != dirname:
+            candidates.append(os.path.join(b_upath, to_bytes(dirname, errors='surrogate_or_strict'), b_needle))
+        candidates.append(os.path.join(b_upath, b_needle))
+        for b_candidate in candidates:
+            if self.exists(b_upath, b_candidate):
+                return to_text(b_candidate)
+
+        return None
+
+    def exists(self, b_collection_path, b_path):
+        # type: (CollectionFileIndex, bytes, bytes) -> bool
+        """
+        Same as C(os.path.exists(b_path)), using the index if C(b_path) is located under an indexed directory of
+        C(b_collection_path)
+        """
+        b_dir, b_name = os.path.split(b_path)
+        b_relative_dir = os.path.relpath(b_dir, b_collection_path)
+        if not b_name or b'..' in b_path.split(b'/') or b_relative_dir.split(b'/')[0] not in _B_INDEXED_DIRS:
+            return os.path.exists(b_path)
+        listing = self._get_listing(b_dir)
+
+        return listing is not None and b_name in listing
+
+    def invalidate(self):
+        # type: (CollectionFileIndex) -> None
+        self._listings.clear()
+
+    def _get_listing(self, b_dir):
+        # type: (CollectionFileIndex, bytes) -> Optional[FrozenSet[bytes]]
+        try:
+            mtime = os.stat(b_dir).st_mtime
+        except OSError as err:
+            if err.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            self._listings.pop(b_dir, None)
+            return None
+        cached = self._listings.get(b_dir)
+        if cached is None or cached[0] != mtime:
+            # mtime is read before listing: a concurrent change is detected on next call
+            names = os.listdir(b_dir)
+            # Broken symlinks don't exist for os.path.exists()
+            cached = (mtime, frozenset(
+                name for name in names
+                if not os.path.islink(os.path.join(b_dir, name)) or os.path.exists(os.path.join(b_dir, name))
+            ))
+            self._listings[b_dir] = cached
+
+        return cached[1]
+
+
+# Index used by ActionBase._find_needle_in_collection() (see ActionBase.INDEX_COLLECTION_FILES)
+COLLECTION_FILE_INDEX = CollectionFileIndex()
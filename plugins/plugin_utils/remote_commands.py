@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+from random import getrandbits
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Dict, List, Optional, Text
+
+
+class RemoteCommandBatch:
+    """
+    Several shell commands executed by a single POSIX shell script, outputs are framed with a random token
+
+    Commands are executed in a subshell (C(cd), C(exit), variables, etc don't leak to next commands), without stdin.
+    """
+
+    def __init__(self, commands=None):
+        # type: (RemoteCommandBatch, Optional[List[Text]]) -> None
+        self.token = 'ANSIBLE-BATCH-%032x' % getrandbits(128)
+        self.commands = list(commands or [])  # type: List[Text]
+
+    def __len__(self):
+        # type: (RemoteCommandBatch) -> int
+        return len(self.commands)
+
+    def add(self, cmd):
+        # type: (RemoteCommandBatch, Text) -> int
+        """
+        :return: Command index in C(parse()) results
+        """
+        self.commands.append(cmd)
+
+        return len(self.commands) - 1
+
+    def build(self, stop_on_error=False):
+        # type: (RemoteCommandBatch, bool) -> Text
+        """
+        :param stop_on_error: Don't execute remaining commands once a command fails
+        """
+        token = self.token
+        script = [
+            '__batch_err=$(mktemp 2>/dev/null) || __batch_err="${TMPDIR:-/tmp}/.%s-$$"' % token,
+            ': > "$__batch_err"',
+        ]
+        for idx, cmd in enumerate(self.commands):
+            script.extend([
+                'echo %s-OUT-%s' % (token, idx),
+                '( %s\n) < /dev/null 2> "$__batch_err"' % cmd,
+                '__batch_rc=$?',
+                'echo',
+                'echo %s-ERR-%s' % (token, idx),
+                'cat "$__batch_err"',
+                'echo',
+                'echo "%s-RC-%s $__batch_rc"' % (token, idx),
+            ])
+            if stop_on_error:
+                script.append('[ $__batch_rc -eq 0 ] || { rm -f "$__batch_err"; exit 0; }')
+        script.append('rm -f "$__batch_err"')
+
+        return '\n'.join(script)
+
+    def parse(self, stdout):
+        # type: (RemoteCommandBatch, Text) -> List[Dict]
+        """
+        :return: One C(dict(rc, stdout, stderr)) per command. C(rc) is None if command has not been executed.
+        """
+        results = []
+        position = 0
+        for idx in range(len(self.commands)):
+            out_marker = '%s-OUT-%s\n' % (self.token, idx)
+            err_marker = '\n%s-ERR-%s\n' % (self.token, idx)
+            rc_marker = '\n%s-RC-%s ' % (self.token, idx)
+            out_start = stdout.find(out_marker, position)
+            err_start = stdout.find(err_marker, out_start)
+            rc_start = stdout.find(rc_marker, err_start)
+            if -1 in (out_start, err_start, rc_start):
+                results.extend(dict(rc=None, stdout=u'', stderr=u'') for dummy in range(idx, len(self.commands)))
+                break
+            rc_end = stdout.find('\n', rc_start + len(rc_marker))
+            if rc_end == -1:
+                rc_end = len(stdout)
+            results.append(dict(
+                rc=int(stdout[rc_start + len(rc_marker):rc_end]),
+                stdout=stdout[out_start + len(out_marker):err_start],
+                stderr=stdout[err_start + len(err_marker):rc_start],
+            ))
+            position = rc_end
+
+        return results
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+from copy import deepcopy
+
+from ansible.module_utils.common._collections_compat import Mapping
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Any, Dict, Hashable, Iterator
+
+
+class VariablesOverlay(Mapping):
+    """
+    Read-only view of several variable mappings, a variable is taken from the first mapping defining it
+
+    Same content as a copy of the last mapping updated with the previous ones, without copying them.
+    C(copy()) and C(deepcopy()) return a regular dict (as code written for a dict expects, e.g. C(template) lookup).
+    """
+
+    def __init__(self, *layers):
+        # type: (VariablesOverlay, *Mapping) -> None
+        self._layers = layers
+
+    def __getitem__(self, key):
+        # type: (VariablesOverlay, Hashable) -> Any
+        for layer in self._layers:
+            if key in layer:
+                return layer[key]
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        # type: (VariablesOverlay, Any) -> bool
+        return any(key in layer for layer in self._layers)
+
+    def __iter__(self):
+        # type: (VariablesOverlay) -> Iterator[Hashable]
+        seen = set()
+        for layer in self._layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        # type: (VariablesOverlay) -> int
+        return len(set().union(*self._layers))
+
+    def __repr__(self):
+        # type: (VariablesOverlay) -> str
+        return '%s(%r)' % (self.__class__.__name__, self.copy())
+
+    def __deepcopy__(self, memo):
+        # type: (VariablesOverlay, Dict) -> Dict
+        return deepcopy(self.copy(), memo)
+
+    def copy(self):
+        # type: (VariablesOverlay) -> Dict
+        res = dict()
+        for layer in reversed(self._layers):
+            res.update(layer)
+
+        return res
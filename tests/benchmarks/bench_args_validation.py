@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Compare argument validation engines
+
+Usage (collection must be importable, see "make install-as-python-pkg"):
+    python tests/benchmarks/bench_args_validation.py [ITERATIONS]
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import sys
+import timeit
+
+from ansible_collections.yoanm.utils.plugins.plugin_utils.args_validation import (
+    check_plugin_argspec,
+    VALIDATION_ENGINE_DEFAULT,
+    VALIDATION_ENGINE_FAST,
+)
+
+# Same as file_management integration test action
+ARGS_SPEC = dict(
+    generate_local_tmpfile=dict(type='bool', default=False),
+    local_tmpfile_content=dict(type='raw', default=None),
+    fetch_remote_file=dict(type='bool', default=False),
+    remote_file_path=dict(type='path', default=None),
+    mirror_remote_file=dict(type='bool', default=False),
+    mirror_source_path=dict(type='path', default=None),
+)
+CONDITIONAL_ARGS_SPEC = dict(
+    mutually_exclusive=(
+        ['generate_local_tmpfile', 'fetch_remote_file', 'mirror_remote_file'],
+        ['local_tmpfile_content', 'remote_file_path', 'mirror_source_path'],
+    ),
+    required_if=[
+        ['generate_local_tmpfile', True, ['local_tmpfile_content']],
+        ['fetch_remote_file', True, ['remote_file_path']],
+        ['mirror_remote_file', True, ['mirror_source_path']],
+    ],
+    required_one_of=['generate_local_tmpfile', 'fetch_remote_file', 'mirror_remote_file']
+)
+ARGS_LIST = [
+    dict(generate_local_tmpfile=True, local_tmpfile_content='My tmpfile content'),
+    dict(fetch_remote_file='yes', remote_file_path='/var/log/a_file.log'),
+    dict(mirror_remote_file=True, mirror_source_path='/etc/a_file.conf', unknown='value'),
+]
+
+
+def bench(engine, iterations):
+    def run():
+        for args in ARGS_LIST:
+            check_plugin_argspec(
+                'action_with_file_management',
+                args,
+                dict(argument_spec=ARGS_SPEC),
+                schema_format='argspec',
+                schema_conditionals=CONDITIONAL_ARGS_SPEC,
+                cache_key='action_with_file_management',
+                engine=engine,
+            )
+
+    return min(timeit.repeat(run, number=iterations, repeat=3))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    default_duration = bench(VALIDATION_ENGINE_DEFAULT, iterations)
+    fast_duration = bench(VALIDATION_ENGINE_FAST, iterations)
+
+    print('%d validations per engine' % (iterations * len(ARGS_LIST)))
+    print('%-10s %.3fs' % (VALIDATION_ENGINE_DEFAULT, default_duration))
+    print('%-10s %.3fs (x%.1f)' % (VALIDATION_ENGINE_FAST, fast_duration, default_duration / fast_duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Compare native CLI parsing engines on large synthetic device outputs
+
+Usage (collection must be importable, see "make install-as-python-pkg"):
+    python tests/benchmarks/bench_cli_parser.py [LINES]
+
+Beware, default engine duration grows quadratically with the number of parsed items
+"""
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from ansible_collections.yoanm.utils.plugins.plugin_utils.cli_parser import (
+    native_cli_parse,
+    CLI_PARSE_ENGINE_DEFAULT,
+    CLI_PARSE_ENGINE_SINGLE_PASS,
+)
+
+INTERFACES_TEMPLATE = r'''
+---
+- example: Ethernet1/1 is up
+  getval: '(?P<name>\S+) is (?P<oper_state>\S+)$'
+  result:
+    "{{ name }}":
+      name: "{{ name }}"
+      state:
+        operating: "{{ oper_state }}"
+  shared: true
+- example: admin state is up, Dedicated Interface
+  getval: '\s+admin state is (?P<admin_state>\S+),'
+  result:
+    "{{ name }}":
+      state:
+        admin: "{{ admin_state }}"
+- example: Hardware is 100/1000/10000 Ethernet, address is 000c.29d1.d56b
+  getval: '\s+Hardware is (?P<hardware>.+), address is (?P<mac>\S+)'
+  result:
+    "{{ name }}":
+      hardware: "{{ hardware }}"
+      mac_address: "{{ mac }}"
+- example: 'Description: Uplink'
+  getval: '\s+Description: (?P<description>.+)$'
+  result:
+    "{{ name }}":
+      description: "{{ description }}"
+- example: MTU 1500 bytes, BW 1000000 Kbit, DLY 10 usec
+  getval: '\s+MTU (?P<mtu>\d+) bytes, BW (?P<bandwidth>\d+) Kbit'
+  result:
+    "{{ name }}":
+      mtu: "{{ mtu }}"
+      bandwidth: "{{ bandwidth }}"
+'''
+
+ROUTES_TEMPLATE = r'''
+---
+- example: '10.0.0.0/24, ubest/mbest: 1/0'
+  getval: '(?P<prefix>\d+\.\d+\.\d+\.\d+/\d+), ubest/mbest: (?P<ubest>\d+)/(?P<mbest>\d+)'
+  result:
+    "{{ prefix }}":
+      ubest: "{{ ubest }}"
+      mbest: "{{ mbest }}"
+  shared: true
+- example: '    *via 192.168.1.1, Eth1/1, [1/0], 3w2d, static'
+  getval: '\s+\*via (?P<nexthop>\S+), (?P<interface>\S+), \[(?P<distance>\d+)/(?P<metric>\d+)\], \S+, (?P<proto>\S+)'
+  result:
+    "{{ prefix }}":
+      nexthop: "{{ nexthop }}"
+      interface: "{{ interface }}"
+      protocol: "{{ proto }}"
+'''
+
+
+def interfaces_output(lines):
+    output = []
+    idx = 0
+    while len(output) < lines:
+        output.extend([
+            'Ethernet%s/%s is %s' % (idx // 48 + 1, idx % 48 + 1, 'up' if idx % 3 else 'down'),
+            '  admin state is up, Dedicated Interface',
+            '  Hardware is 100/1000/10000 Ethernet, address is 000c.29d1.%04x' % (idx % 0xffff),
+            '  Description: Link %s' % idx,
+            '  MTU %s bytes, BW 1000000 Kbit, DLY 10 usec' % (1500 if idx % 2 else 9216),
+            '  reliability 255/255, txload 1/255, rxload 1/255',
+            '  Encapsulation ARPA, medium is broadcast',
+        ])
+        idx += 1
+
+    return '\n'.join(output)
+
+
+def routes_output(lines):
+    output = []
+    idx = 0
+    while len(output) < lines:
+        output.extend([
+            '10.%s.%s.0/24, ubest/mbest: 1/0' % (idx // 256 % 256, idx % 256),
+            '    *via 192.168.%s.1, Eth1/%s, [1/0], 3w2d, static' % (idx % 256, idx % 48 + 1),
+        ])
+        idx += 1
+
+    return '\n'.join(output)
+
+
+def bench(text, tmpl_path, engine):
+    start = time.time()
+    res = native_cli_parse(text, tmpl_path, engine=engine)
+
+    return time.time() - start, res
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for name, template, text in [
+            ('show interface', INTERFACES_TEMPLATE, interfaces_output(lines)),
+            ('show ip route', ROUTES_TEMPLATE, routes_output(lines)),
+        ]:
+            tmpl_path = os.path.join(tmp_dir, 'template.yaml')
+            with open(tmpl_path, 'w') as file_handler:
+                file_handler.write(template)
+            default_duration, default_res = bench(text, tmpl_path, CLI_PARSE_ENGINE_DEFAULT)
+            single_pass_duration, single_pass_res = bench(text, tmpl_path, CLI_PARSE_ENGINE_SINGLE_PASS)
+            if 'errors' in default_res:
+                raise AssertionError('Parsing of "%s" failed: %s' % (name, default_res['errors']))
+            if default_res != single_pass_res:
+                raise AssertionError('Engines output differ for "%s"' % name)
+
+            print('%s (%d lines, %d parsed items)' % (name, len(text.splitlines()), len(default_res['parsed'])))
+            print('  %-12s %.3fs' % (CLI_PARSE_ENGINE_DEFAULT, default_duration))
+            print('  %-12s %.3fs (x%.1f)' % (
+                CLI_PARSE_ENGINE_SINGLE_PASS, single_pass_duration, default_duration / single_pass_duration
+            ))
+            os.remove(tmpl_path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
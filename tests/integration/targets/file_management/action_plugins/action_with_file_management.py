@@ -7,12 +7,15 @@ from typing import Dict
 
 from ansible.errors import AnsibleActionFail
 from ansible.module_utils.common.text.converters import to_native, to_bytes
+from ansible_collections.yoanm.utils.plugins.plugin_utils.args_validation import VALIDATION_ENGINE_FAST
 from ansible_collections.yoanm.utils.tests.mocks.action_plugins.simple_action import (
     ActionModule as BaseActionModule
 )
 
 
 class ActionModule(BaseActionModule):
+    VALIDATION_ENGINE = VALIDATION_ENGINE_FAST
+
     ARGUMENTS_SPEC = dict(
         generate_local_tmpfile=dict(type='bool', default=False),
         local_tmpfile_content=dict(type='raw', default=None),
@@ -45,7 +48,8 @@ class ActionModule(BaseActionModule):
             self._display.display('Fetch remote file')
             result['file_path'] = self._fetch_remote_file_to_local_tmp(
                 to_native(self._validated_args.get('remote_file_path')),
-                self._validated_args
+                self._validated_args,
+                result=result
             )
         elif self._validated_args.get('mirror_remote_file', None):
             self._display.display('Mirror remote file')
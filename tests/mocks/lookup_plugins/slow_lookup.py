@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import time
+
+from ansible.errors import AnsibleLookupError
+from ansible_collections.yoanm.utils.plugins.lookup import LookupBase
+
+# Hack to avoid loading "typing" module at runtime (issue with sanity tests on python 2.7) while keeping MyPy happy
+MYPY = False
+if MYPY:
+    from typing import Dict, List
+
+
+class LookupModule(LookupBase):
+    """
+    Return terms after C(delay) seconds (or once C(barrier) is passed), or fail with C(fail) message.
+    C((lookup, templar)) is appended to C(calls) list if provided.
+    """
+    def _run(self, terms, variables, **kwargs):
+        # type: (LookupBase, List, Dict, **Dict) -> List
+        if kwargs.get('calls') is not None:
+            kwargs['calls'].append((self, self._templar))
+        if kwargs.get('barrier') is not None:
+            kwargs['barrier'].wait(timeout=5)
+        time.sleep(float(kwargs.get('delay', 0)))
+        if kwargs.get('fail'):
+            raise AnsibleLookupError(kwargs['fail'])
+
+        return list(terms)
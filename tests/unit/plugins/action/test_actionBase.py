@@ -7,17 +7,37 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import base64
 import os.path
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 from random import getrandbits
 from typing import Type
 
+from ansible.errors import AnsibleActionFail, AnsibleFileNotFound
+from ansible.parsing.dataloader import DataLoader
+from ansible.playbook.block import Block
 from ansible.playbook.task import Task
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.action import ActionBase as AnsibleActionBase
+from ansible.plugins.loader import connection_loader, shell_loader
 from ansible.template import Templar
+from ansible.utils.hashing import secure_hash, secure_hash_s
 
 from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
-from ansible_collections.community.internal_test_tools.tests.unit.compat.mock import MagicMock
+from ansible_collections.community.internal_test_tools.tests.unit.compat.mock import MagicMock, patch
 from ansible_collections.community.internal_test_tools.tests.unit.mock.loader import DictDataLoader
 from ansible_collections.yoanm.utils.plugins.action import ActionBase
+from ansible_collections.yoanm.utils.plugins.lookup import LookupBase
+from ansible_collections.yoanm.utils.plugins.plugin_utils import execute_plugins
+from ansible_collections.yoanm.utils.plugins.plugin_utils.local_tmp import LOCAL_TMP_CLEANUP_TASK
+from ansible_collections.yoanm.utils.plugins.plugin_utils.args_validation import (
+    ARGSPEC_SCHEMA_CACHE,
+    VALIDATION_RESULT_CACHE,
+)
 
 
 class ConcreteActionModule(ActionBase):
@@ -50,6 +70,59 @@ class ConcreteActionModuleWithArgSpec(ConcreteActionModule):
     )
 
 
+class SubActionModule(ActionBase):
+    def _run(self, task_vars, result):
+        if self._task.args.get('barrier') is not None:
+            # Wait for other sub-actions: fails if sub-actions are not executed concurrently
+            self._task.args['barrier'].wait(timeout=5)
+        for dummy in range(self._task.args.get('commands', 0)):
+            self._connection.exec_command(self._task.args['name'])
+            time.sleep(0.01)
+        if self._task.args.get('tmpdir'):
+            self._connection._shell.tmpdir = self._task.args['tmpdir']
+        result['changed'] = self._task.args.get('changed', False)
+        result['name'] = self._task.args['name']
+        result['templar'] = self._templar
+        return result
+
+
+class SubActionUsingTmpDir(ActionBase):
+    def _run(self, task_vars, result):
+        result['tmp_file_path'] = self._generate_remote_tmp_file_path()
+        return result
+
+
+class ThirdPartySubAction(AnsibleActionBase):
+    def run(self, tmp=None, task_vars=None):
+        if self._connection._shell.tmpdir is None:
+            self._make_tmp_path()
+        return dict(tmp_file_path=os.path.join(self._connection._shell.tmpdir, 'a_file'))
+
+
+class MutatingSubAction(ActionBase):
+    def _run(self, task_vars, result):
+        result['task'] = self._task
+        self._task.args['added'] = True
+        self._task.tags.append('sub')
+        self._task.vars['sub'] = True
+        self._task.environment = dict(SUB='1')
+        return result
+
+
+class LookupWithVarsSpec(LookupBase):
+    VARIABLES_SPEC = dict(name=dict(type='str'), count=dict(type='int'))
+
+    def _run(self, terms, variables, **kwargs):
+        return [variables['name'], variables['count']]
+
+
+class ActionWithSubActions(ActionBase):
+    def _run(self, task_vars, result):
+        result['sub_results'] = [self._execute_action(name, dict(), task_vars)
+                                 for name in self._task.args['sub_actions']]
+        return result
+
+
 class SimpleActionModule(unittest.TestCase):
     def setUp(self):
         self.task = MagicMock(Task)
@@ -114,6 +187,134 @@ class SimpleActionModule(unittest.TestCase):
 
         self.assertDictEqual(actual_res_sanitized, expected_res)
 
+    def test_validation_schema_compiled_once(self):
+        ARGSPEC_SCHEMA_CACHE.clear()
+        for i in range(0, 3):
+            plugin = self._init_plugin(ConcreteActionModuleWithDoc)
+            plugin._task.args = dict(name='a_name')
+            self.assertFalse(plugin.run()['failed'])
+
+        self.assertDictEqual(ARGSPEC_SCHEMA_CACHE.stats(), dict(hits=2, misses=1, size=1))
+
+    def test_validation_results_cache(self):
+        class ActionWithResultsCache(ConcreteActionModuleWithArgSpec):
+            VALIDATION_RESULTS_CACHE = True
+
+        VALIDATION_RESULT_CACHE.clear()
+        for plugin_cls in [ActionWithResultsCache, ConcreteActionModuleWithArgSpec]:
+            for i in range(0, 2):
+                plugin = self._init_plugin(plugin_cls)
+                plugin._task.args = dict(name='a_name')
+                self.assertFalse(plugin.run()['failed'])
+                self.assertDictEqual(plugin._validated_args, dict(name='a_name', path=None))
+
+        self.assertDictEqual(VALIDATION_RESULT_CACHE.stats(), dict(hits=1, misses=1, size=1, evictions=0))
+
+    def _init_sub_actions(self):
+        def copy_task():
+            task_copy = MagicMock(Task)
+            task_copy.async_val = None
+            task_copy._role = None
+            return task_copy
+
+        self.task.copy.side_effect = copy_task
+        self.connection._shell = shell_loader.get('sh')
+        self.connection.become = None
+        execute_plugins.PLUGIN_CLASS_CACHE.clear()
+
+    @patch.object(execute_plugins.action_loader, 'get', return_value=SubActionModule)
+    def test_execute_actions(self, loader_get):
+        self._init_sub_actions()
+        plugin = self._init_plugin()
+        barrier = threading.Barrier(3)
+        actions = [
+            ('sub_%s' % idx, dict(name='sub_%s' % idx, barrier=barrier, changed=idx == 2), dict()) for idx in range(3)
+        ]
+        result = dict(changed=False)
+
+        # Controller-side sub-actions are executed concurrently (otherwise barrier is broken)
+        actual_res = plugin._execute_actions(actions, result=result)
+
+        self.assertFalse(barrier.broken)
+        # Each sub-action has its own templar
+        self.assertEqual(3, len(set(id(res['templar']) for res in actual_res)))
+        self.assertNotIn(plugin._templar, [res['templar'] for res in actual_res])
+        self.assertListEqual(['sub_0', 'sub_1', 'sub_2'], [res['name'] for res in actual_res])
+        self.assertListEqual(['sub_0', 'sub_1', 'sub_2'], [result[name]['name'] for name in ['sub_0', 'sub_1', 'sub_2']])
+        # Merged in actions order (last value wins, as with _execute_module())
+        self.assertTrue(result['changed'])
+        self.assertFalse(result['failed'])
+
+    @patch.object(execute_plugins.action_loader, 'get', return_value=MutatingSubAction)
+    def test_execute_action_lightweight_sub_task(self, loader_get):
+        execute_plugins.PLUGIN_CLASS_CACHE.clear()
+        block = Block()
+        block.vars = dict(block=True)
+        task = Task(block=block)
+        task.args = dict(name='parent')
+        task.tags = ['parent']
+        task.vars = dict(parent=True)
+        self.task = task
+        plugin = self._init_plugin()
+        plugin._task.args = dict(name='parent')
+        plugin.LIGHTWEIGHT_SUB_TASKS = True
+
+        sub_task = plugin._execute_action('sub', dict(name='sub'), dict())['task']
+
+        # Parent chain is shared, not copied
+        self.assertIs(block, sub_task._parent)
+        self.assertDictEqual(dict(name='sub', added=True), sub_task.args)
+        # Parent task is left untouched
+        self.assertDictEqual(dict(name='parent'), task.args)
+        self.assertListEqual(['parent'], task.tags)
+        self.assertDictEqual(dict(parent=True), task.vars)
+        self.assertDictEqual(dict(block=True), block.vars)
+        self.assertIsNot(task.environment, sub_task.environment)
+
+    @patch.object(execute_plugins.lookup_loader, 'get', return_value=LookupWithVarsSpec)
+    def test_execute_lookup_variables_overlay(self, loader_get):
+        execute_plugins.PLUGIN_CLASS_CACHE.clear()
+        plugin = self._init_plugin()
+        plugin._task.args = dict(name='from_args', count='1')
+        variables = dict(count='2')
+
+        for overlay in [False, True]:
+            plugin.LOOKUP_VARIABLES_OVERLAY = overlay
+            self.assertListEqual(['from_args', 2], plugin._execute_lookup('a_lookup', [], variables))
+        # Neither task args nor variables are modified
+        self.assertDictEqual(dict(name='from_args', count='1'), plugin._task.args)
+        self.assertDictEqual(dict(count='2'), variables)
+
+    @patch.object(execute_plugins.action_loader, 'get', return_value=SubActionModule)
+    def test_execute_actions_connection_lock(self, loader_get):
+        self._init_sub_actions()
+        calls = []
+        lock = threading.Lock()
+
+        def exec_command(cmd):
+            with lock:
+                calls.append(cmd)
+            return 0, b'', b''
+
+        self.connection.exec_command.side_effect = exec_command
+        plugin = self._init_plugin()
+        plugin._low_level_execute_command = MagicMock(return_value=dict(rc=0))
+        actions = [
+            ('sub_%s' % idx, dict(name='sub_%s' % idx, commands=3, tmpdir='/tmp/ansible-tmp-%s' % idx), dict())
+            for idx in range(4)
+        ]
+
+        plugin._execute_actions(actions)
+
+        # A sub-action keeps the connection until it ends, its commands are never interleaved with other ones
+        self.assertEqual(12, len(calls))
+        for idx in range(0, 12, 3):
+            self.assertEqual(1, len(set(calls[idx:idx + 3])))
+        # Each sub-action has its own temporary directory, removed once sub-action ends
+        self.assertIsNone(self.connection._shell.tmpdir)
+        removed = sorted(call[0][0] for call in plugin._low_level_execute_command.call_args_list)
+        self.assertListEqual(['rm -f -r /tmp/ansible-tmp-%s > /dev/null 2>&1' % idx for idx in range(4)], removed)
+
     # @TODO move as integration tests and check if playbook can override the file
     def test_find_needle_in_collection_method(self):
         plugin = self._init_plugin(ConcreteActionModuleWithArgSpec)
@@ -131,6 +332,42 @@ class SimpleActionModule(unittest.TestCase):
 
         self.assertEqual(actual_res, expected_res)
 
+    def test_find_needle_in_collection_with_index(self):
+        plugin = self._init_plugin()
+        plugin._loader = DataLoader()
+        plugin._loader.set_basedir(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, plugin._loader.get_basedir())
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir)
+        collection_paths = [os.path.join(root_dir, name, 'yoanm', 'utils') for name in ('c1', 'c2')]
+        search_path = os.path.join(root_dir, 'playbook')
+        for path in [os.path.join(collection_paths[0], 'vars'), os.path.join(collection_paths[1], 'templates', 'sub'),
+                     os.path.join(search_path, 'templates')]:
+            os.makedirs(path)
+        for path in [os.path.join(collection_paths[0], 'vars', 'a.yml'), os.path.join(search_path, 'templates', 'b.j2'),
+                     os.path.join(collection_paths[1], 'templates', 'b.j2'),
+                     os.path.join(collection_paths[1], 'templates', 'sub', 'c.j2')]:
+            with open(path, 'w'):
+                pass
+        plugin._task.get_search_path = lambda: [search_path]
+
+        with patch('ansible_collections.yoanm.utils.plugins.action.get_collection_path',
+                   return_value=collection_paths):
+            for dirname, needle, collection_first in [
+                ('vars', 'a.yml', False), ('templates', 'b.j2', False), ('templates', 'b.j2', True),
+                ('templates', 'sub/c.j2', False), ('templates', 'templates/sub/c.j2', True),
+            ]:
+                plugin.INDEX_COLLECTION_FILES = False
+                expected = plugin._find_needle_in_collection('yoanm.utils', dirname, needle, collection_first)
+                plugin.INDEX_COLLECTION_FILES = True
+                self.assertEqual(expected, plugin._find_needle_in_collection('yoanm.utils', dirname, needle,
+                                                                             collection_first))
+
+            with self.assertRaises(AnsibleFileNotFound) as ctx:
+                plugin._find_needle_in_collection('yoanm.utils', 'templates', 'unknown.j2')
+            # All paths are reported
+            self.assertIn(os.path.join(collection_paths[0], 'templates', 'unknown.j2'), str(ctx.exception))
+
     def test_generate_tmp_filename_method(self):
         plugin = self._init_plugin(ConcreteActionModuleWithArgSpec)
 
@@ -140,6 +377,418 @@ class SimpleActionModule(unittest.TestCase):
 
         self.assertEqual(actual_res.sort(), actual_res_sanitized.sort())
 
+    def _init_fetch_plugin(self):
+        plugin = self._init_plugin()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        plugin._get_local_tmp_dir = lambda: tmp_dir
+        plugin._execute_module = MagicMock(
+            return_value=dict(content=base64.b64encode(b'slurped content').decode(), encoding='base64')
+        )
+        self.connection.become = None
+        self.play_context.remote_addr = 'a_host'
+
+        return plugin
+
+    def test_fetch_remote_file_streaming(self):
+        def fetch_file(in_path, out_path):
+            with open(out_path, 'wb') as file_handler:
+                file_handler.write(b'streamed content')
+
+        self.connection.fetch_file.side_effect = fetch_file
+        plugin = self._init_fetch_plugin()
+        result = dict()
+
+        file_path = plugin._fetch_remote_file_to_local_tmp('/remote/file', dict(), result=result)
+
+        with open(file_path, 'rb') as file_handler:
+            self.assertEqual(b'streamed content', file_handler.read())
+        self.connection.fetch_file.assert_called_once_with('/remote/file', file_path)
+        plugin._execute_module.assert_not_called()
+        self.assertEqual(1, len(result['fetch_stats']))
+        self.assertDictEqual(dict(path='/remote/file', strategy='stream', bytes=16),
+                             dict((k, v) for k, v in result['fetch_stats'][0].items() if k != 'duration'))
+
+    def test_fetch_remote_file_slurp_fallback(self):
+        def fetch_file(in_path, out_path):
+            with open(out_path, 'wb') as file_handler:
+                file_handler.write(b'partial')
+            raise IOError('transfer failure')
+
+        self.connection.fetch_file.side_effect = fetch_file
+        plugin = self._init_fetch_plugin()
+        plugin._BASE64_CHUNK_SIZE = 8  # Force chunked decoding
+        result = dict()
+
+        file_path = plugin._fetch_remote_file_to_local_tmp('/remote/file', dict(), result=result)
+
+        with open(file_path, 'rb') as file_handler:
+            self.assertEqual(b'slurped content', file_handler.read())
+        # Partial file has been removed, and is no longer tracked
+        self.assertListEqual([os.path.basename(file_path)], os.listdir(os.path.dirname(file_path)))
+        self.assertListEqual([file_path], list(plugin._get_local_tmp_manager().created))
+        self.assertEqual('slurp', result['fetch_stats'][0]['strategy'])
+        self.assertEqual(15, result['fetch_stats'][0]['bytes'])
+
+        # Slurp is directly used in case of privilege escalation
+        self.connection.fetch_file.reset_mock()
+        self.connection.become = MagicMock()
+        plugin._fetch_remote_file_to_local_tmp('/remote/file', dict())
+        self.connection.fetch_file.assert_not_called()
+
+    def test_fetch_remote_file_cache(self):
+        remote_content = dict(value=b'remote content')
+
+        def fetch_file(in_path, out_path):
+            with open(out_path, 'wb') as file_handler:
+                file_handler.write(remote_content['value'])
+
+        self.connection.fetch_file.side_effect = fetch_file
+        plugin = self._init_fetch_plugin()
+        plugin._execute_remote_stat = MagicMock(side_effect=lambda *a, **kw: dict(
+            exists=True, checksum=secure_hash_s(remote_content['value'])
+        ))
+        result = dict()
+
+        file_paths = [plugin._fetch_remote_file_to_local_tmp('/remote/file', dict(), result=result, use_cache=True)
+                      for dummy in range(3)]
+        remote_content['value'] = b'updated remote content'
+        file_paths.append(plugin._fetch_remote_file_to_local_tmp('/remote/file', dict(), result=result, use_cache=True))
+
+        self.assertEqual(2, self.connection.fetch_file.call_count)
+        self.assertDictEqual(dict(hits=2, misses=2), result['fetch_cache'])
+        self.assertListEqual(['stream', 'cache', 'cache', 'stream'], [s['strategy'] for s in result['fetch_stats']])
+        # Each call returns its own file
+        self.assertEqual(4, len(set(file_paths)))
+        for file_path, content in zip(file_paths, [b'remote content'] * 3 + [b'updated remote content']):
+            with open(file_path, 'rb') as file_handler:
+                self.assertEqual(content, file_handler.read())
+
+        # Cache is disabled by default
+        plugin._fetch_remote_file_to_local_tmp('/remote/file', dict(), result=result)
+        self.assertEqual(3, self.connection.fetch_file.call_count)
+        self.assertDictEqual(dict(hits=2, misses=2), result['fetch_cache'])
+
+    def _init_mirror_plugin(self):
+        def low_level_execute_command(cmd, **kwargs):
+            process = subprocess.Popen(['/bin/sh', '-c', cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+            return dict(rc=process.returncode, stdout=stdout.decode(), stderr=stderr.decode())
+
+        self.connection._shell = shell_loader.get('sh')
+        plugin = self._init_plugin()
+        plugin._low_level_execute_command = MagicMock(side_effect=low_level_execute_command)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        source = os.path.join(tmp_dir, "source file's")
+        with open(source, 'w') as file_handler:
+            file_handler.write('content')
+
+        return plugin, source, os.path.join(tmp_dir, 'dest')
+
+    def test_mirror_remote_file(self):
+        plugin, source, dest = self._init_mirror_plugin()
+
+        self.assertIn(plugin._mirror_remote_file(source, dest), ['copy', 'copy_reflink_auto'])
+        with open(dest) as file_handler:
+            self.assertEqual('content', file_handler.read())
+        self.assertNotEqual(os.stat(source).st_ino, os.stat(dest).st_ino)
+
+        # Identical files
+        self.assertEqual('skipped', plugin._mirror_remote_file(source, dest, compare='size_mtime'))
+        self.assertEqual('skipped', plugin._mirror_remote_file(source, dest, compare='content'))
+        # Modified destination
+        with open(dest, 'w') as file_handler:
+            file_handler.write('CONTENT')
+        os.utime(dest, ns=(os.stat(source).st_atime_ns, os.stat(source).st_mtime_ns))
+        self.assertEqual('skipped', plugin._mirror_remote_file(source, dest, compare='size_mtime'))
+        self.assertNotEqual('skipped', plugin._mirror_remote_file(source, dest, compare='content'))
+        with open(dest) as file_handler:
+            self.assertEqual('content', file_handler.read())
+
+        # Single remote command per mirroring
+        self.assertEqual(5, plugin._low_level_execute_command.call_count)
+
+    def test_mirror_remote_file_read_only(self):
+        plugin, source, dest = self._init_mirror_plugin()
+
+        self.assertEqual('hardlink', plugin._mirror_remote_file(source, dest, read_only=True))
+        self.assertEqual(os.stat(source).st_ino, os.stat(dest).st_ino)
+
+        with self.assertRaises(AnsibleActionFail):
+            plugin._mirror_remote_file(source + '.unknown', dest + '2', read_only=True)
+        with self.assertRaises(AnsibleActionFail):
+            plugin._mirror_remote_file(source, dest, compare='unknown')
+
+    def test_execute_remote_commands(self):
+        self.connection = connection_loader.get('local', PlayContext(), os.devnull)
+        self.play_context = PlayContext()
+        plugin = self._init_plugin()
+        plugin._connection.exec_command = MagicMock(wraps=plugin._connection.exec_command)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        source = os.path.join(tmp_dir, 'source')
+
+        actual_res = plugin._execute_remote_commands([
+            'echo content > %s' % source,
+            'cp -a %s %s.copy' % (source, source),
+            'cat %s.copy; ls %s/unknown' % (source, tmp_dir),
+        ])
+
+        # Single remote invocation
+        self.assertEqual(1, plugin._connection.exec_command.call_count)
+        self.assertListEqual([0, 0], [res['rc'] for res in actual_res[:2]])
+        self.assertNotEqual(0, actual_res[2]['rc'])
+        self.assertEqual('content\n', actual_res[2]['stdout'])
+        self.assertIn('unknown', actual_res[2]['stderr'])
+
+    def _init_local_connection_plugin(self):
+        self.connection = connection_loader.get('local', PlayContext(), os.devnull)
+        self.play_context = PlayContext()
+        plugin = self._init_plugin()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        plugin._get_local_tmp_dir = lambda: tmp_dir
+        self.addCleanup(plugin.cleanup, force=True)
+
+        return plugin, tmp_dir
+
+    def test_fetch_remote_files(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        sources = []
+        for idx in range(3):
+            sources.append(os.path.join(tmp_dir, 'source %s' % idx))
+            with open(sources[-1], 'wb') as file_handler:
+                file_handler.write(('content %s' % idx).encode())
+        os.symlink(sources[0], os.path.join(tmp_dir, 'link'))
+        plugin._connection.exec_command = MagicMock(wraps=plugin._connection.exec_command)
+        plugin._connection.fetch_file = MagicMock(wraps=plugin._connection.fetch_file)
+        # Neither cached, delta-transferred nor compressed again
+        plugin.FETCH_DELTA = plugin.FETCH_COMPRESSION = True
+        plugin.FETCH_COMPRESSION_THRESHOLD = 0
+        plugin._get_fetch_cache = MagicMock()
+        result = dict()
+
+        paths, errors = plugin._fetch_remote_files_to_local_tmp(
+            sources + [os.path.join(tmp_dir, 'link'), tmp_dir, os.path.join(tmp_dir, 'unknown')], dict(),
+            result=result
+        )
+
+        # Remote tmpdir creation ("~" expansion + mkdir) and archive creation, then a single transfer
+        self.assertEqual(3, plugin._connection.exec_command.call_count)
+        self.assertEqual(1, plugin._connection.fetch_file.call_count)
+        self.assertSetEqual(set(sources + [os.path.join(tmp_dir, 'link')]), set(paths))
+        for idx, source in enumerate(sources):
+            with open(paths[source], 'rb') as file_handler:
+                self.assertEqual(('content %s' % idx).encode(), file_handler.read())
+        with open(paths[os.path.join(tmp_dir, 'link')], 'rb') as file_handler:
+            self.assertEqual(b'content 0', file_handler.read())
+        self.assertDictEqual({tmp_dir: 'not a regular file', os.path.join(tmp_dir, 'unknown'): 'not found'}, errors)
+        self.assertEqual(1, len(result['fetch_stats']))
+        self.assertEqual('stream', result['fetch_stats'][0]['strategy'])
+        self.assertEqual(4, result['fetch_stats'][0]['files'])
+        plugin._get_fetch_cache.assert_not_called()
+        # Link and its target share the same local file, local archive has been removed
+        self.assertEqual(paths[sources[0]], paths[os.path.join(tmp_dir, 'link')])
+        self.assertEqual(3, len(plugin._get_local_tmp_manager().created))
+
+    def test_push_files_to_remote_tmp(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        source = os.path.join(tmp_dir, 'source')
+        with open(source, 'wb') as file_handler:
+            file_handler.write(b'file content')
+        os.chmod(source, 0o755)
+        plugin._connection.exec_command = MagicMock(wraps=plugin._connection.exec_command)
+        plugin._connection.put_file = MagicMock(wraps=plugin._connection.put_file)
+
+        remote_paths = plugin._push_files_to_remote_tmp([source, b'in-memory content'])
+
+        # Remote tmpdir creation ("~" expansion + mkdir) and archive extraction, with a single transfer
+        self.assertEqual(3, plugin._connection.exec_command.call_count)
+        self.assertEqual(1, plugin._connection.put_file.call_count)
+        self.assertEqual(2, len(remote_paths))
+        for remote_path, expected_content in zip(remote_paths, [b'file content', b'in-memory content']):
+            self.assertEqual(plugin._connection._shell.tmpdir.rstrip('/'), os.path.dirname(remote_path))
+            with open(remote_path, 'rb') as file_handler:
+                self.assertEqual(expected_content, file_handler.read())
+            # Local mode and owner are not kept
+            self.assertEqual(0o600, os.stat(remote_path).st_mode & 0o777)
+            self.assertEqual(os.getuid(), os.stat(remote_path).st_uid)
+        # Only pushed files are left on remote tmpdir, local archive has been removed
+        self.assertEqual(2, len(os.listdir(plugin._connection._shell.tmpdir)))
+        self.assertEqual(0, len(plugin._get_local_tmp_manager().created))
+
+        with self.assertRaises(AnsibleActionFail):
+            plugin._push_files_to_remote_tmp([os.path.join(tmp_dir, 'unknown')])
+
+    def _write_blocks(self, path, blocks):
+        # 16 bytes per block
+        with open(path, 'wb') as file_handler:
+            file_handler.write(''.join('block %09d\n' % block for block in blocks).encode())
+
+    def test_fetch_remote_file_delta(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        plugin.DELTA_BLOCK_SIZE = 16
+        plugin._execute_remote_stat = MagicMock(side_effect=lambda path, **kw: dict(checksum=secure_hash(path)))
+        source = os.path.join(tmp_dir, 'source')
+        self._write_blocks(source, range(10))
+        result = dict()
+
+        # Nothing cached yet
+        plugin._fetch_remote_file_to_local_tmp(source, dict(), result=result, use_delta=True)
+        # Block modified and content appended
+        self._write_blocks(source, [0, 1, 42] + list(range(3, 11)))
+        with open(source, 'ab') as file_handler:
+            file_handler.write(b'tail')
+        file_path = plugin._fetch_remote_file_to_local_tmp(source, dict(), result=result, use_delta=True)
+        plugin._fetch_remote_file_to_local_tmp(source, dict(), result=result, use_delta=True)
+
+        with open(source, 'rb') as source_handler, open(file_path, 'rb') as file_handler:
+            self.assertEqual(source_handler.read(), file_handler.read())
+        self.assertListEqual(['stream', 'delta', 'cache'], [stats['strategy'] for stats in result['fetch_stats']])
+        self.assertEqual(16 + 16 + 4, result['fetch_stats'][1]['transferred_bytes'])
+        self.assertEqual(16 * 11 + 4, result['fetch_stats'][1]['bytes'])
+
+        # Remote file modified meanwhile => full transfer
+        self._write_blocks(source, range(5))
+        plugin._execute_remote_stat.side_effect = lambda path, **kw: dict(checksum='0' * 40)
+        plugin._fetch_remote_file_to_local_tmp(source, dict(), result=result, use_delta=True)
+        self.assertEqual('stream', result['fetch_stats'][-1]['strategy'])
+
+    def test_fetch_remote_file_compressed(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        plugin.FETCH_COMPRESSION_THRESHOLD = 1024
+        source = os.path.join(tmp_dir, 'source')
+        small_source = os.path.join(tmp_dir, 'small_source')
+        self._write_blocks(source, range(1000))
+        self._write_blocks(small_source, range(10))
+        result = dict()
+
+        file_path = plugin._fetch_remote_file_to_local_tmp(source, dict(), result=result, use_compression=True)
+        plugin._fetch_remote_file_to_local_tmp(small_source, dict(), result=result, use_compression=True)
+
+        with open(source, 'rb') as source_handler, open(file_path, 'rb') as file_handler:
+            self.assertEqual(source_handler.read(), file_handler.read())
+        self.assertListEqual(['stream_gzip', 'stream'], [stats['strategy'] for stats in result['fetch_stats']])
+        self.assertEqual(16000, result['fetch_stats'][0]['bytes'])
+        self.assertLess(result['fetch_stats'][0]['transferred_bytes'], 16000 / 5)
+        # Compressed file has been removed
+        self.assertEqual(2, len(plugin._get_local_tmp_manager().created))
+
+    def test_get_remote_block_checksums_many_known_blocks(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        plugin.DELTA_BLOCK_SIZE = 16
+        source = os.path.join(tmp_dir, 'source')
+        self._write_blocks(source, range(3))
+        plugin._connection.exec_command = MagicMock(wraps=plugin._connection.exec_command)
+        # Way more than what a single command line argument can hold (128KiB)
+        known_checksums = plugin._get_local_block_checksums(source) + ['0' * 40] * 5000
+        known_checksums[1] = '1' * 40
+
+        size, blocks = plugin._get_remote_block_checksums(source, known_checksums=known_checksums)
+
+        self.assertEqual(48, size)
+        self.assertListEqual([1], [idx for idx, dummy in blocks])
+        self.assertLess(max(len(call[0][0]) for call in plugin._connection.exec_command.call_args_list), 10000)
+
+    def test_push_file_delta(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        plugin.DELTA_BLOCK_SIZE = 16
+        source = os.path.join(tmp_dir, 'source')
+        dest = os.path.join(tmp_dir, 'dest')
+        self._write_blocks(source, range(10))
+        result = dict()
+
+        # Missing destination
+        self.assertTrue(plugin._push_file_delta(source, dest, result=result))
+        # Block modified and content truncated
+        self._write_blocks(source, [0, 1, 2, 42] + list(range(4, 9)))
+        with open(source, 'ab') as file_handler:
+            file_handler.write(b'tail')
+        self.assertTrue(plugin._push_file_delta(source, dest, result=result))
+        self.assertFalse(plugin._push_file_delta(source, dest, result=result))
+
+        with open(source, 'rb') as source_handler, open(dest, 'rb') as dest_handler:
+            self.assertEqual(source_handler.read(), dest_handler.read())
+        self.assertListEqual([160, 16 + 4, 0], [stats['transferred_bytes'] for stats in result['push_stats']])
+        self.assertListEqual(['full', 'delta', 'delta'], [stats['strategy'] for stats in result['push_stats']])
+        # Temporary copy has been moved
+        self.assertListEqual([], [filename for filename in os.listdir(tmp_dir) if filename.startswith('.dest')])
+
+    def test_push_file_delta_many_blocks(self):
+        plugin, tmp_dir = self._init_local_connection_plugin()
+        plugin.DELTA_BLOCK_SIZE = 16
+        source = os.path.join(tmp_dir, 'source')
+        dest = os.path.join(tmp_dir, 'dest')
+        self._write_blocks(dest, range(600))
+        # Every block but the first one differs
+        self._write_blocks(source, [0] + list(range(601, 1200)))
+        os.chmod(dest, 0o640)
+        plugin._connection.exec_command = MagicMock(wraps=plugin._connection.exec_command)
+        result = dict()
+
+        self.assertTrue(plugin._push_file_delta(source, dest, result=result))
+
+        with open(source, 'rb') as source_handler, open(dest, 'rb') as dest_handler:
+            self.assertEqual(source_handler.read(), dest_handler.read())
+        self.assertEqual('delta', result['push_stats'][0]['strategy'])
+        self.assertEqual(16 * 599, result['push_stats'][0]['transferred_bytes'])
+        self.assertEqual(0o640, os.stat(dest).st_mode & 0o777)
+        # Block indexes (~2KB) are not part of the command line
+        self.assertLess(max(len(call[0][0]) for call in plugin._connection.exec_command.call_args_list), 2000)
+
+        # Every block differs => whole file is transferred
+        self._write_blocks(source, range(1200, 1210))
+        self.assertTrue(plugin._push_file_delta(source, dest, result=result))
+        self.assertEqual('full', result['push_stats'][1]['strategy'])
+        self.assertEqual(160, result['push_stats'][1]['transferred_bytes'])
+        self.assertEqual(0o640, os.stat(dest).st_mode & 0o777)
+        with open(source, 'rb') as source_handler, open(dest, 'rb') as dest_handler:
+            self.assertEqual(source_handler.read(), dest_handler.read())
+
+    def test_local_tmp_files_cleanup(self):
+        class ActionWithTaskCleanup(ConcreteActionModule):
+            LOCAL_TMP_CLEANUP = LOCAL_TMP_CLEANUP_TASK
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for plugin_cls, kept in [(ConcreteActionModule, True), (ActionWithTaskCleanup, False)]:
+            plugin = self._init_plugin(plugin_cls)
+            plugin._get_local_tmp_dir = lambda: tmp_dir
+            paths = [plugin._create_local_tempfile(b'content'), plugin._generate_local_tmp_file_path()]
+            self.assertEqual(2, len(set(paths)))
+            plugin.cleanup()
+            self.assertListEqual([kept, kept], [os.path.exists(path) for path in paths])
+
+    def test_shared_remote_tmp_dir(self):
+        self._init_sub_actions()
+        commands = []
+
+        def low_level_execute_command(cmd, **kwargs):
+            commands.append(cmd)
+            return dict(rc=0, stdout='/remote/ansible-tmp-%s/\n' % len(commands), stderr='')
+
+        sub_actions = dict(ours=SubActionUsingTmpDir, third_party=ThirdPartySubAction)
+        for first_sub_action in ['ours', 'third_party']:
+            del commands[:]
+            plugin = self._init_plugin(ActionWithSubActions)
+            plugin._task.args = dict(sub_actions=[first_sub_action, 'ours', 'third_party'])
+            with patch.object(AnsibleActionBase, '_low_level_execute_command',
+                              side_effect=low_level_execute_command):
+                with patch.object(execute_plugins.action_loader, 'get', side_effect=lambda name, **kw: sub_actions[name]):
+                    execute_plugins.PLUGIN_CLASS_CACHE.clear()
+                    result = plugin.run()
+                    self.assertFalse(result['failed'], result)
+                    # Remote tmpdir has been created once and is shared by every sub-action
+                    self.assertEqual(1, len(commands))
+                    self.assertListEqual(['/remote/ansible-tmp-1'] * 3,
+                                         [os.path.dirname(res['tmp_file_path']) for res in result['sub_results']])
+                    # Removed once, by the top-level action
+                    plugin.cleanup()
+                    self.assertEqual(2, len(commands))
+                    self.assertIn('rm -f -r /remote/ansible-tmp-1/', commands[1])
+                    self.assertIsNone(self.connection._shell.tmpdir)
+
     def test_create_local_tempfile_method(self):
         self.skipTest('TODO !')
         plugin = self._init_plugin(ConcreteActionModuleWithArgSpec)
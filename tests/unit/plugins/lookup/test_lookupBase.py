@@ -7,12 +7,19 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import threading
 from typing import Type
+from ansible.errors import AnsibleLookupError
 from ansible.template import Templar
+from ansible.utils.unsafe_proxy import AnsibleUnsafe
 
 from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.community.internal_test_tools.tests.unit.compat.mock import patch
 from ansible_collections.community.internal_test_tools.tests.unit.mock.loader import DictDataLoader
 from ansible_collections.yoanm.utils.plugins.lookup import LookupBase
+from ansible_collections.yoanm.utils.plugins.plugin_utils import execute_plugins
+from ansible_collections.yoanm.utils.plugins.plugin_utils.execute_plugins import PLUGIN_CLASS_CACHE
+from ansible_collections.yoanm.utils.tests.mocks.lookup_plugins.slow_lookup import LookupModule as SlowLookup
 
 
 class ConcreteLookup(LookupBase):
@@ -41,3 +48,43 @@ class SimpleLookup(unittest.TestCase):
         actual_res = plugin.run([])
 
         self.assertListEqual(actual_res, expected_res)
+
+    @patch.object(execute_plugins.lookup_loader, 'get', return_value=SlowLookup)
+    def test_execute_lookups(self, loader_get):
+        class ReusingLookup(ConcreteLookup):
+            REUSE_LOOKUP_INSTANCES = True
+
+        PLUGIN_CLASS_CACHE.clear()
+        plugin = self._init_plugin(ReusingLookup)
+        barrier = threading.Barrier(5)
+        calls = []
+        lookups = [
+            ('slow_lookup', ['term_%s' % idx], {}, dict(barrier=barrier, calls=calls, delay=0.05 - idx * 0.01))
+            for idx in range(5)
+        ]
+
+        # Lookups are executed concurrently (otherwise barrier is broken)
+        actual_res = plugin._execute_lookups(lookups, max_workers=5)
+
+        self.assertFalse(barrier.broken)
+        self.assertListEqual([['term_%s' % idx] for idx in range(5)], actual_res)
+        # Results are wrapped as with _execute_lookup()
+        self.assertIsInstance(actual_res[0][0], AnsibleUnsafe)
+        # Each sub-lookup has its own instance and templar, even if instances are reused
+        self.assertEqual(5, len(set(id(lookup) for lookup, templar in calls)))
+        self.assertEqual(5, len(set(id(templar) for lookup, templar in calls)))
+        self.assertNotIn(plugin._templar, [templar for lookup, templar in calls])
+
+    @patch.object(execute_plugins.lookup_loader, 'get', return_value=SlowLookup)
+    def test_execute_lookups_error(self, loader_get):
+        PLUGIN_CLASS_CACHE.clear()
+        plugin = self._init_plugin()
+        lookups = [
+            ('slow_lookup', ['a'], {}),
+            ('slow_lookup', ['b'], {}, dict(delay=0.05, fail='first error')),
+            ('slow_lookup', ['c'], {}, dict(fail='second error')),
+        ]
+
+        with self.assertRaises(AnsibleLookupError) as ctx:
+            plugin._execute_lookups(lookups)
+        self.assertEqual('first error', str(ctx.exception))
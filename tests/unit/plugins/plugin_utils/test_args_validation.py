@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2021, Felix Fontein <felix@fontein.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible.utils.unsafe_proxy import AnsibleUnsafeText
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils import args_validation
+
+DOC = r'''
+---
+options:
+  name:
+    description:
+    - A name
+    type: str
+    required: yes
+  path:
+    description:
+    - A path
+    type: str
+    default: /tmp
+'''
+
+ARGS_SPEC = dict(
+    name=dict(type='str', required=True),
+    path=dict(type='str', default='/tmp'),
+)
+
+CONDITIONAL_ARGS_SPEC = dict(
+    mutually_exclusive=[['name', 'path']],
+)
+
+# Same as file_management integration test action
+FILE_MANAGEMENT_ARGS_SPEC = dict(
+    generate_local_tmpfile=dict(type='bool', default=False),
+    local_tmpfile_content=dict(type='raw', default=None),
+    fetch_remote_file=dict(type='bool', default=False),
+    remote_file_path=dict(type='path', default=None),
+    mirror_remote_file=dict(type='bool', default=False),
+    mirror_source_path=dict(type='path', default=None),
+)
+FILE_MANAGEMENT_CONDITIONAL_ARGS_SPEC = dict(
+    mutually_exclusive=(
+        ['generate_local_tmpfile', 'fetch_remote_file', 'mirror_remote_file'],
+        ['local_tmpfile_content', 'remote_file_path', 'mirror_source_path'],
+    ),
+    required_if=[
+        ['generate_local_tmpfile', True, ['local_tmpfile_content']],
+        ['fetch_remote_file', True, ['remote_file_path']],
+        ['mirror_remote_file', True, ['mirror_source_path']],
+    ],
+    required_one_of=['generate_local_tmpfile', 'fetch_remote_file', 'mirror_remote_file']
+)
+
+TYPES_ARGS_SPEC = dict(
+    a_str=dict(type='str'),
+    a_default_str=dict(),
+    an_int=dict(type='int', default=3),
+    a_float=dict(type='float'),
+    a_list=dict(type='list', choices=['a', 'b']),
+    a_dict=dict(type='dict'),
+    a_choice=dict(type='str', choices=['yes', 'no', 'maybe']),
+    a_bool_choice=dict(type='raw', choices=[True, 'maybe']),
+    a_required=dict(type='bool', required=True),
+)
+TYPES_CONDITIONAL_ARGS_SPEC = dict(
+    required_together=[['a_str', 'a_float']],
+    required_by=dict(a_dict=['a_list']),
+)
+
+CONFORMANCE_CASES = [
+    (FILE_MANAGEMENT_ARGS_SPEC, FILE_MANAGEMENT_CONDITIONAL_ARGS_SPEC, [
+        dict(),
+        dict(generate_local_tmpfile=True, local_tmpfile_content='content'),
+        dict(generate_local_tmpfile='yes', local_tmpfile_content=dict(a=1)),
+        dict(generate_local_tmpfile=True),
+        dict(fetch_remote_file=True, remote_file_path='~/a/path'),
+        dict(fetch_remote_file=True, mirror_remote_file=True, remote_file_path='a_path'),
+        dict(mirror_remote_file='not_a_bool', mirror_source_path='a_path'),
+        dict(generate_local_tmpfile=True, local_tmpfile_content='content', unknown=1),
+        dict(generate_local_tmpfile=True, local_tmpfile_content='content', unknown=1, unknown2=2),
+        dict(generate_local_tmpfile=True, local_tmpfile_content='content', unknown=1, unknown2=2, unknown3=3),
+        dict(generate_local_tmpfile=True, local_tmpfile_content='content', **{'unknown-arg': 1}),
+    ]),
+    (TYPES_ARGS_SPEC, TYPES_CONDITIONAL_ARGS_SPEC, [
+        dict(),
+        dict(a_required=True),
+        dict(a_required=None),
+        dict(a_required='true', a_str=12, a_default_str=['a'], an_int='42', a_float='1.5'),
+        dict(a_required=False, an_int='not_an_int', a_float='not_a_float', a_dict='not_a_dict'),
+        dict(a_required=False, an_int=None, a_str=None, a_list='a,b', a_dict='a=1 b=2'),
+        dict(a_required=False, a_list=['a', 'c'], a_choice='nope'),
+        dict(a_required=False, a_list='c', a_choice='False', a_bool_choice='True'),
+        dict(a_required=False, a_choice='maybe', a_bool_choice='False'),
+        dict(a_required=False, a_str='a_str'),
+        dict(a_required=False, a_dict=dict(a=1)),
+    ]),
+    (ARGS_SPEC, CONDITIONAL_ARGS_SPEC, [
+        dict(),
+        dict(name='a_name'),
+        dict(name='a_name', path='a_path'),
+        dict(path='a_path', other=None),
+    ]),
+]
+
+
+class ArgsValidation(unittest.TestCase):
+    def setUp(self):
+        args_validation.ARGSPEC_SCHEMA_CACHE.clear()
+        args_validation.FAST_ARGSPEC_VALIDATOR_CACHE.clear()
+        args_validation.VALIDATION_RESULT_CACHE.clear()
+
+    def test_compile_doc_schema(self):
+        actual_res = args_validation.compile_argspec_schema(DOC, 'doc', CONDITIONAL_ARGS_SPEC)
+
+        self.assertDictEqual(actual_res, dict(argument_spec=ARGS_SPEC, **CONDITIONAL_ARGS_SPEC))
+
+    def test_compile_argspec_schema(self):
+        actual_res = args_validation.compile_argspec_schema(dict(argument_spec=ARGS_SPEC), 'argspec')
+
+        self.assertDictEqual(actual_res, dict(argument_spec=ARGS_SPEC))
+
+    def test_compiled_schema_cache(self):
+        for i in range(0, 3):
+            check_res, updated_params = args_validation.check_plugin_argspec(
+                'my_plugin', dict(name='a_name'), DOC, cache_key='my_plugin'
+            )
+            self.assertDictEqual(check_res, dict(errors=[], failed=False, msg=None))
+            self.assertDictEqual(updated_params, dict(name='a_name', path='/tmp'))
+
+        self.assertDictEqual(args_validation.ARGSPEC_SCHEMA_CACHE.stats(), dict(hits=2, misses=1, size=1))
+
+    def test_compiled_schema_cache_with_updated_schema(self):
+        args_validation.get_compiled_argspec_schema('my_plugin', DOC)
+        actual_res = args_validation.get_compiled_argspec_schema('my_plugin', DOC, 'doc', CONDITIONAL_ARGS_SPEC)
+
+        self.assertDictEqual(actual_res, dict(argument_spec=ARGS_SPEC, **CONDITIONAL_ARGS_SPEC))
+        # Stale schema is counted as a miss
+        self.assertDictEqual(args_validation.ARGSPEC_SCHEMA_CACHE.stats(), dict(hits=0, misses=2, size=1))
+
+    def test_same_result_with_and_without_cache(self):
+        for args in [dict(), dict(name='a_name', path='a_path'), dict(name='a_name', unknown=True)]:
+            expected_res = args_validation.check_plugin_argspec(
+                'my_plugin', args, DOC, schema_conditionals=CONDITIONAL_ARGS_SPEC
+            )
+            actual_res = args_validation.check_plugin_argspec(
+                'my_plugin', args, DOC, schema_conditionals=CONDITIONAL_ARGS_SPEC, cache_key='my_plugin'
+            )
+
+            self.assertEqual(actual_res, expected_res)
+
+    def test_fast_engine_conformance(self):
+        for spec, conditionals, args_list in CONFORMANCE_CASES:
+            schema = dict(argument_spec=spec)
+            self.assertIsNotNone(
+                args_validation.build_fast_argspec_validator(args_validation.compile_argspec_schema(
+                    schema, 'argspec', conditionals
+                ))
+            )
+            for args in args_list:
+                expected_res = args_validation.check_plugin_argspec(
+                    'my_plugin', args, schema, 'argspec', conditionals,
+                )
+                actual_res = args_validation.check_plugin_argspec(
+                    'my_plugin', args, schema, 'argspec', conditionals,
+                    engine=args_validation.VALIDATION_ENGINE_FAST,
+                )
+                cached_actual_res = args_validation.check_plugin_argspec(
+                    'my_plugin', args, schema, 'argspec', conditionals,
+                    cache_key='my_plugin', engine=args_validation.VALIDATION_ENGINE_FAST,
+                )
+
+                self.assertEqual(actual_res, expected_res, 'Args: %s' % repr(args))
+                self.assertEqual(cached_actual_res, expected_res, 'Args: %s' % repr(args))
+
+    def test_fast_engine_doesnt_update_args(self):
+        args = dict(a_required='true', a_list='a')
+        args_validation.check_plugin_argspec(
+            'my_plugin', args, dict(argument_spec=TYPES_ARGS_SPEC), 'argspec',
+            engine=args_validation.VALIDATION_ENGINE_FAST,
+        )
+
+        self.assertDictEqual(args, dict(a_required='true', a_list='a'))
+
+    def test_fast_engine_unsupported_schemas(self):
+        for spec in [
+            dict(name=dict(type='str', aliases=['a_name'])),
+            dict(name=dict(type='dict', options=dict(sub=dict(type='str')))),
+            dict(name=dict(type='list', elements='str')),
+            dict(name=dict(type='str', no_log=True)),
+            dict(name=dict(type='str', required=True, default='a_name')),
+            dict(name=dict(type='a_custom_type')),
+        ]:
+            self.assertIsNone(args_validation.build_fast_argspec_validator(dict(argument_spec=spec)), repr(spec))
+            # Default engine is used instead
+            actual_res = args_validation.check_plugin_argspec(
+                'my_plugin', dict(name='a_name'), dict(argument_spec=spec), 'argspec',
+                engine=args_validation.VALIDATION_ENGINE_FAST,
+            )
+            expected_res = args_validation.check_plugin_argspec(
+                'my_plugin', dict(name='a_name'), dict(argument_spec=spec), 'argspec',
+            )
+            self.assertEqual(actual_res, expected_res, repr(spec))
+
+    def _check_with_result_cache(self, args, cache_key='my_plugin'):
+        return args_validation.check_plugin_argspec(
+            'my_plugin', args, dict(argument_spec=TYPES_ARGS_SPEC), 'argspec', TYPES_CONDITIONAL_ARGS_SPEC,
+            cache_key=cache_key, cache_results=True,
+        )
+
+    def test_result_cache(self):
+        expected_res = self._check_with_result_cache(dict(a_required='yes', a_list='a'))
+        for i in range(0, 2):
+            self.assertEqual(self._check_with_result_cache(dict(a_required='yes', a_list='a')), expected_res)
+        # Errors are cached too
+        expected_error_res = self._check_with_result_cache(dict(an_int='not_an_int'))
+        self.assertTrue(expected_error_res[0]['failed'])
+        self.assertEqual(self._check_with_result_cache(dict(an_int='not_an_int')), expected_error_res)
+
+        self.assertDictEqual(
+            args_validation.VALIDATION_RESULT_CACHE.stats(),
+            dict(hits=3, misses=2, size=2, evictions=0)
+        )
+
+    def test_result_cache_with_updated_schema(self):
+        args = dict(a_required='yes', a_list='a')
+        self._check_with_result_cache(args)
+        # Schema is re-compiled, cached result is stale
+        check_res, updated_params = args_validation.check_plugin_argspec(
+            'my_plugin', args, dict(argument_spec=TYPES_ARGS_SPEC), 'argspec', cache_key='my_plugin',
+            cache_results=True,
+        )
+
+        self.assertFalse(check_res['failed'])
+        self.assertDictEqual(
+            args_validation.VALIDATION_RESULT_CACHE.stats(),
+            dict(hits=0, misses=2, size=1, evictions=0)
+        )
+
+    def test_result_cache_returns_copies(self):
+        check_res, updated_params = self._check_with_result_cache(dict(a_required='yes', a_list='a'))
+        updated_params['a_list'].append('b')
+        check_res['errors'].append('an error')
+
+        check_res, updated_params = self._check_with_result_cache(dict(a_required='yes', a_list='a'))
+
+        self.assertEqual(updated_params['a_list'], ['a'])
+        self.assertEqual(check_res['errors'], [])
+
+    def test_result_cache_key_depends_on_types(self):
+        args_list = [
+            dict(a_required=True, a_str='1'),
+            dict(a_required=True, a_str=1),
+            dict(a_required=True, a_str=AnsibleUnsafeText(u'1')),
+            dict(a_required=1, a_str='1'),
+        ]
+        for args in args_list:
+            check_res, updated_params = self._check_with_result_cache(args)
+            self.assertIs(type(updated_params['a_str']), type(args['a_str']) if args['a_str'] != 1 else str)
+
+        self.assertEqual(args_validation.VALIDATION_RESULT_CACHE.stats()['size'], len(args_list))
+
+    def test_result_cache_with_unmanaged_types(self):
+        args = dict(a_required=True, a_str=object())
+        for i in range(0, 2):
+            self._check_with_result_cache(args)
+
+        self.assertDictEqual(
+            args_validation.VALIDATION_RESULT_CACHE.stats(),
+            dict(hits=0, misses=0, size=0, evictions=0)
+        )
+
+    def test_result_cache_eviction(self):
+        args_validation.VALIDATION_RESULT_CACHE.max_size = 2
+        try:
+            for name in ['a', 'b', 'a', 'c', 'b']:
+                self._check_with_result_cache(dict(a_required=True, a_str=name))
+        finally:
+            args_validation.VALIDATION_RESULT_CACHE.max_size = 512
+
+        # 'b' has been evicted when 'c' has been added, as 'a' has been used more recently
+        self.assertDictEqual(
+            args_validation.VALIDATION_RESULT_CACHE.stats(),
+            dict(hits=1, misses=4, size=2, evictions=2)
+        )
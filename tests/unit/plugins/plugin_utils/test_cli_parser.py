@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import re
+import shutil
+import tempfile
+
+from ansible.errors import AnsibleError
+from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import dict_merge
+from ansible_collections.ansible.netcommon.plugins.sub_plugins.cli_parser.native_parser import CliParser
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils.cli_parser import (
+    native_cli_parse,
+    native_cli_parse_many,
+    iter_native_cli_parse,
+    invalidate_native_template_cache,
+    CombinedPatternMatcher,
+    CLI_PARSE_ENGINE_SINGLE_PASS,
+    TEMPLATE_CACHE,
+)
+
+TEMPLATE = r'''
+---
+- example: Ethernet1/1 is up
+  getval: '(?P<name>\S+) is (?P<oper_state>\S+)$'
+  result:
+    "{{ name }}":
+      name: "{{ name }}"
+      state:
+        operating: "{{ oper_state }}"
+  shared: true
+- example: admin state is up
+  getval: '\s+admin state is (?P<admin_state>\S+),?'
+  result:
+    "{{ name }}":
+      name: "{{ name }}"
+      state:
+        admin: "{{ admin_state }}"
+- example: MTU 1500 bytes
+  getval: '\s+MTU (?P<mtu>\d+) bytes'
+  result:
+    "{{ name }}":
+      mtu: "{{ mtu }}"
+- example: 'tags: [a, b]'
+  getval: '\s+tags: \[(?P<tag>[^]]+)\](?P<extra>,?)'
+  result:
+    "{{ name }}":
+      tags:
+        - "{{ tag }}"
+'''
+
+TEXT = '''Ethernet1/1 is up
+  admin state is up, Dedicated Interface
+  MTU 1500 bytes, BW 1000000 Kbit
+Ethernet1/2 is down
+  admin state is down, Dedicated Interface
+  MTU 9216 bytes, BW 1000000 Kbit
+  tags: [core]
+  tags: [uplink],
+  tags: [core]
+'''
+
+
+class TestCliParser(unittest.TestCase):
+
+    def setUp(self):
+        invalidate_native_template_cache()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.tmpl_path = self._write_template(TEMPLATE)
+
+    def _write_template(self, content, name='template.yaml'):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as file_handler:
+            file_handler.write(content)
+
+        return path
+
+    def _netcommon_parse(self, text, template):
+        return CliParser(task_args=dict(text=text), task_vars=dict(), debug=False).parse(template_contents=template)
+
+    def test_same_output_as_netcommon(self):
+        expected = self._netcommon_parse(TEXT, TEMPLATE)
+
+        self.assertEqual(1500, expected['parsed']['Ethernet1/1']['mtu'])
+        self.assertDictEqual(expected, native_cli_parse(TEXT, self.tmpl_path))
+        self.assertDictEqual(expected, native_cli_parse(TEXT, self.tmpl_path))
+        self.assertDictEqual(dict(hits=1, misses=1, size=1, evictions=0), TEMPLATE_CACHE.stats())
+
+    def test_errors(self):
+        invalid_yaml = self._write_template('- getval: [', name='invalid_yaml.yaml')
+        invalid_regex = self._write_template("- getval: '(?P<name'\n  result: {}", name='invalid_regex.yaml')
+
+        for path, content in [(invalid_yaml, '- getval: ['), (invalid_regex, "- getval: '(?P<name'\n  result: {}")]:
+            actual = native_cli_parse(TEXT, path)
+            self.assertIn('errors', actual)
+            self.assertDictEqual(self._netcommon_parse(TEXT, content), actual)
+
+    def test_template_reloaded_when_modified(self):
+        native_cli_parse(TEXT, self.tmpl_path)
+        self._write_template(TEMPLATE.replace('admin state is', 'admin status is') + '# padding\n')
+        self.assertNotIn('admin', native_cli_parse(TEXT, self.tmpl_path)['parsed']['Ethernet1/1']['state'])
+        # Previous version has been dropped
+        self.assertDictEqual(dict(hits=0, misses=2, size=1, evictions=0), TEMPLATE_CACHE.stats())
+
+        invalidate_native_template_cache(self.tmpl_path)
+        self.assertEqual(0, len(TEMPLATE_CACHE))
+
+    def test_single_pass_engine(self):
+        expected = self._netcommon_parse(TEXT, TEMPLATE)
+
+        self.assertListEqual(['core', 'uplink'], sorted(expected['parsed']['Ethernet1/2']['tags']))
+        for dummy in range(2):
+            self.assertDictEqual(expected, native_cli_parse(TEXT, self.tmpl_path, engine=CLI_PARSE_ENGINE_SINGLE_PASS))
+
+    def test_single_pass_engine_fallback(self):
+        # Numbered backreference => patterns can't be combined
+        template = TEMPLATE + "- getval: '(\\w+) \\1'\n  result: {}\n"
+        tmpl_path = self._write_template(template, name='backref.yaml')
+
+        self.assertDictEqual(self._netcommon_parse(TEXT, template),
+                             native_cli_parse(TEXT, tmpl_path, engine=CLI_PARSE_ENGINE_SINGLE_PASS))
+
+    def test_combined_pattern_matcher(self):
+        def build(*patterns):
+            return CombinedPatternMatcher.build([dict(getval=re.compile(pattern)) for pattern in patterns])
+
+        matcher = build(r'(?P<a>x+)[(?P<b>]', r'(?P<a>\w)(?P=a)', r'(?P<a>x)(?P<b>y)?')
+        self.assertIsNotNone(matcher)
+        # First matching pattern wins
+        self.assertDictEqual(dict(a='xx'), matcher.match('xx(')[1])
+        self.assertDictEqual(dict(a='x'), matcher.match('xx')[1])
+        self.assertIs(matcher.entries[1][0], matcher.match('xx(')[0])
+        self.assertDictEqual(dict(a='x'), matcher.match('xz')[1])
+        self.assertIsNone(matcher.match('z'))
+
+        for pattern in [r'(\w) \1', r'(?i)x', r'(?P<a>x)?(?(a)y|z)']:
+            self.assertIsNone(build(r'(?P<a>x)', pattern), pattern)
+
+    def test_native_cli_parse_many(self):
+        other_tmpl_path = self._write_template(TEMPLATE.replace('admin state is', 'admin status is'), name='other.yaml')
+        invalid_tmpl_path = self._write_template('- getval: [', name='invalid_yaml.yaml')
+        items = [(TEXT, self.tmpl_path), (TEXT, other_tmpl_path), (TEXT, invalid_tmpl_path), (TEXT, self.tmpl_path)]
+        expected = [native_cli_parse(text, tmpl_path) for text, tmpl_path in items]
+        invalidate_native_template_cache()
+
+        for max_workers in [1, 2]:
+            res = dict(native_cli_parse_many(items, max_workers=max_workers, engine=CLI_PARSE_ENGINE_SINGLE_PASS))
+            self.assertListEqual(expected, [res[index] for index in range(len(items))])
+        self.assertIn('errors', expected[2])
+        self.assertListEqual([], list(native_cli_parse_many([])))
+
+    def test_iter_native_cli_parse(self):
+        text_path = self._write_template(TEXT, name='output.txt')
+        # Numbered backreference => patterns evaluated one by one
+        template = TEMPLATE + "- getval: '(\\w+) \\1'\n  result: {}\n"
+        backref_tmpl_path = self._write_template(template, name='backref.yaml')
+
+        for tmpl_path in [self.tmpl_path, backref_tmpl_path]:
+            expected = native_cli_parse(TEXT, tmpl_path)['parsed']
+            for source in [text_path, TEXT.splitlines(True), iter(TEXT.splitlines())]:
+                records = list(iter_native_cli_parse(source, tmpl_path))
+                self.assertListEqual(['Ethernet1/1', 'Ethernet1/2'], [list(record)[0] for record in records])
+                merged = dict()
+                for record in records:
+                    merged = dict_merge(merged, record)
+                self.assertDictEqual(expected, merged)
+
+        empty_path = self._write_template('', name='empty.txt')
+        self.assertListEqual([], list(iter_native_cli_parse(empty_path, self.tmpl_path)))
+        invalid_tmpl_path = self._write_template("- getval: '(?P<name'\n  result: {}", name='invalid_regex.yaml')
+        with self.assertRaises(AnsibleError) as ctx:
+            list(iter_native_cli_parse(TEXT.splitlines(), invalid_tmpl_path))
+        self.assertIn('Native parser returned an error', str(ctx.exception))
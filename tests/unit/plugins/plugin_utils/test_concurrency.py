@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+import time
+
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils.concurrency import run_in_threads
+
+
+class TestRunInThreads(unittest.TestCase):
+
+    def test_results_order(self):
+        # Later items are faster, results must still follow items order
+        res = run_in_threads(lambda item: time.sleep(0.01 * (5 - item)) or item * 2, range(6), max_workers=3)
+        self.assertListEqual([0, 2, 4, 6, 8, 10], res)
+        self.assertListEqual([], run_in_threads(lambda item: item, []))
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        state = dict(active=0, max_active=0)
+
+        def func(item):
+            with lock:
+                state['active'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+            time.sleep(0.02)
+            with lock:
+                state['active'] -= 1
+            return item
+
+        self.assertListEqual(list(range(8)), run_in_threads(func, range(8), max_workers=2))
+        self.assertEqual(2, state['max_active'])
+
+        state['max_active'] = 0
+        run_in_threads(func, range(3), max_workers=1)
+        self.assertEqual(1, state['max_active'])
+
+    def test_first_error_raised(self):
+        processed = []
+
+        def func(item):
+            # Item 2 fails after item 5, item 2 error is still the one expected
+            time.sleep(0.05 if item == 2 else 0)
+            processed.append(item)
+            if item in (2, 5):
+                raise ValueError('error %s' % item)
+            return item
+
+        for dummy in range(3):
+            del processed[:]
+            with self.assertRaises(ValueError) as ctx:
+                run_in_threads(func, range(20), max_workers=4)
+            self.assertEqual('error 2', str(ctx.exception))
+            # Every items before the failing one must have been processed
+            self.assertTrue(set(range(3)).issubset(processed))
+            # Items queued after a known failure are skipped
+            self.assertLess(len(processed), 20)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible.errors import AnsibleError
+from ansible.parsing.dataloader import DataLoader
+from ansible.template import Templar
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.community.internal_test_tools.tests.unit.compat.mock import patch
+from ansible_collections.yoanm.utils.plugins.plugin_utils import execute_plugins
+from ansible_collections.yoanm.utils.plugins.plugin_utils.execute_plugins import (
+    execute_lookup, execute_lookups, PLUGIN_CLASS_CACHE, LOOKUP_INSTANCE_CACHE
+)
+
+
+class TestExecutePlugins(unittest.TestCase):
+
+    def setUp(self):
+        PLUGIN_CLASS_CACHE.clear()
+        LOOKUP_INSTANCE_CACHE.clear()
+        self.loader = DataLoader()
+        self.templar = Templar(loader=self.loader)
+
+    def _execute_lookup(self, **kwargs):
+        return execute_lookup('items', terms=[1, 2], lookup_vars={},
+                              loader_kwargs=dict(loader=self.loader, templar=self.templar), **kwargs)
+
+    def test_plugin_class_resolved_once(self):
+        with patch.object(execute_plugins.lookup_loader, 'get',
+                          wraps=execute_plugins.lookup_loader.get) as loader_get:
+            self.assertEqual([1, 2], self._execute_lookup())
+            self.assertEqual([1, 2], self._execute_lookup())
+
+        self.assertEqual(1, loader_get.call_count)
+        self.assertEqual(dict(hits=1, misses=1, size=1), PLUGIN_CLASS_CACHE.stats())
+        # Lookup instances are not reused by default
+        self.assertEqual(0, len(LOOKUP_INSTANCE_CACHE))
+
+    def test_lookup_instance_reuse(self):
+        self.assertEqual([1, 2], self._execute_lookup(reuse_instance=True))
+        self.assertEqual([1, 2], self._execute_lookup(reuse_instance=True))
+        self.assertEqual(dict(hits=1, misses=1, size=1, evictions=0), LOOKUP_INSTANCE_CACHE.stats())
+
+        # Another templar => another instance
+        self.templar = Templar(loader=self.loader)
+        self._execute_lookup(reuse_instance=True)
+        self.assertEqual(2, len(LOOKUP_INSTANCE_CACHE))
+
+        # Not reused if extra loader args are provided
+        execute_lookup('items', terms=[1], lookup_vars={}, reuse_instance=True,
+                       loader_kwargs=dict(loader=self.loader, templar=self.templar, collection_list=None))
+        self.assertEqual(2, len(LOOKUP_INSTANCE_CACHE))
+
+    def test_unknown_plugin(self):
+        with patch.object(execute_plugins.lookup_loader, 'get', return_value=None):
+            with self.assertRaises(AnsibleError) as ctx:
+                execute_lookup('unknown_lookup_name', terms=[], lookup_vars={})
+        self.assertEqual('Unable to load lookup named "unknown_lookup_name"', str(ctx.exception))
+        self.assertEqual(0, len(PLUGIN_CLASS_CACHE))
+
+    def test_execute_lookups(self):
+        lookups = [('items', [idx], {}) for idx in range(5)] + [('items', [5], {}, dict())]
+        res = execute_lookups(lookups, loader_kwargs=dict(loader=self.loader, templar=self.templar), max_workers=3)
+        self.assertListEqual([[idx] for idx in range(6)], res)
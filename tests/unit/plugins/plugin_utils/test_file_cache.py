@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+
+from ansible.errors import AnsibleError
+from ansible.utils.hashing import secure_hash_s
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils.file_cache import LocalFileCache
+
+
+class TestLocalFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.cache = LocalFileCache(os.path.join(self.tmp_dir, 'cache'), max_size=12)
+
+    def _create_file(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as file_handler:
+            file_handler.write(content)
+
+        return path
+
+    def _read(self, path):
+        with open(path, 'rb') as file_handler:
+            return file_handler.read()
+
+    def test_put_and_get(self):
+        checksum_1 = secure_hash_s(b'aaa')
+        checksum_2 = secure_hash_s(b'bbb')
+        self.assertIsNone(self.cache.get('host\0/a', checksum_1))
+        self.cache.put('host\0/a', checksum_1, self._create_file('src', b'aaa'))
+
+        self.assertEqual(b'aaa', self._read(self.cache.get('host\0/a', checksum_1)))
+        self.assertIsNone(self.cache.get('host\0/a', checksum_2))
+        self.assertIsNone(self.cache.get('host\0/b', checksum_1))
+
+        dest = os.path.join(self.tmp_dir, 'dest')
+        self.assertTrue(self.cache.copy_to('host\0/a', checksum_1, dest))
+        self.assertEqual(b'aaa', self._read(dest))
+        self.assertFalse(self.cache.copy_to('host\0/a', checksum_2, dest))
+
+        # Only latest version is kept
+        self.cache.put('host\0/a', checksum_2, self._create_file('src', b'bbb'))
+        self.assertIsNone(self.cache.get('host\0/a', checksum_1))
+        self.assertEqual(b'bbb', self._read(self.cache.get('host\0/a', checksum_2)))
+
+        path, checksum = self.cache.get_latest('host\0/a')
+        self.assertEqual(checksum_2, checksum)
+        self.assertEqual(b'bbb', self._read(path))
+        self.assertIsNone(self.cache.get_latest('host\0/b'))
+
+    def test_eviction(self):
+        for idx, name in enumerate(['a', 'b', 'c']):
+            self.cache.put(name, 'checksum', self._create_file('src', b'1234'))
+            path = self.cache.get(name, 'checksum')
+            os.utime(path, (idx, idx))
+        # Mark 'a' as recently used
+        self.cache.get('a', 'checksum')
+
+        # Max size exceeded => least recently used file removed
+        self.cache.put('d', 'checksum', self._create_file('src', b'1234'))
+
+        self.assertIsNotNone(self.cache.get('a', 'checksum'))
+        self.assertIsNone(self.cache.get('b', 'checksum'))
+        self.assertIsNotNone(self.cache.get('c', 'checksum'))
+        self.assertIsNotNone(self.cache.get('d', 'checksum'))
+
+    def test_corrupted_file(self):
+        checksum = secure_hash_s(b'aaa')
+        self.cache.put('a', checksum, self._create_file('src', b'aaa'))
+        with open(self.cache.get('a', checksum), 'wb') as file_handler:
+            file_handler.write(b'planted')
+
+        self.assertFalse(self.cache.copy_to('a', checksum, os.path.join(self.tmp_dir, 'dest')))
+        # Corrupted file has been removed
+        self.assertIsNone(self.cache.get('a', checksum))
+
+    def test_unsafe_cache_dir(self):
+        os.mkdir(self.cache.cache_dir)
+        os.chmod(self.cache.cache_dir, 0o777)
+
+        with self.assertRaises(AnsibleError):
+            self.cache.get('a', 'checksum')
+        with self.assertRaises(AnsibleError):
+            self.cache.put('a', 'checksum', self._create_file('src', b'aaa'))
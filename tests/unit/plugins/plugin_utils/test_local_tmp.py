@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+
+from ansible.errors import AnsibleError
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils.local_tmp import (
+    HAS_MEMFD,
+    LocalTempFileManager,
+    sweep_stale_run_dirs,
+    LOCAL_TMP_CLEANUP_NEVER,
+    LOCAL_TMP_CLEANUP_RUN,
+    LOCAL_TMP_CLEANUP_TASK,
+    RUN_DIR_PREFIX,
+)
+
+
+class TestLocalTempFileManager(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+
+    def test_create(self):
+        manager = LocalTempFileManager(self.base_dir)
+
+        paths = [manager.create([b'a', b'b'], prefix='my_action-') for dummy in range(3)]
+
+        self.assertEqual(3, len(set(paths)))
+        self.assertListEqual(paths, manager.created)
+        for path in paths:
+            self.assertEqual(manager.run_dir, os.path.dirname(path))
+            self.assertTrue(os.path.basename(path).startswith('my_action-'))
+            self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+            with open(path, 'rb') as file_handler:
+                self.assertEqual(b'ab', file_handler.read())
+        self.assertEqual(0o700, stat.S_IMODE(os.stat(manager.run_dir).st_mode))
+        self.assertEqual(0, os.path.getsize(manager.reserve()))
+
+    def test_cleanup(self):
+        for mode, kept in [(LOCAL_TMP_CLEANUP_TASK, False), (LOCAL_TMP_CLEANUP_RUN, True),
+                           (LOCAL_TMP_CLEANUP_NEVER, True)]:
+            manager = LocalTempFileManager(self.base_dir, cleanup=mode)
+            path = manager.create([b'content'])
+            manager.cleanup()
+            self.assertEqual(kept, os.path.exists(path))
+            # Legacy behavior
+            self.assertEqual(mode == LOCAL_TMP_CLEANUP_NEVER, os.path.dirname(path) == self.base_dir)
+
+        with self.assertRaises(AnsibleError):
+            LocalTempFileManager(self.base_dir, cleanup='unknown')
+
+    def test_quota(self):
+        manager = LocalTempFileManager(self.base_dir, quota=10)
+        paths = []
+        for idx in range(3):
+            paths.append(manager.create([b'1234']))
+            os.utime(paths[-1], (idx, idx))
+
+        # Oldest file has been removed, latest one is kept even if bigger than the quota
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[1]))
+        big_path = manager.create([b'12345678901'])
+        self.assertTrue(os.path.exists(big_path))
+        self.assertListEqual([os.path.basename(big_path)], os.listdir(manager.run_dir))
+
+    def test_quota_shared_run_dir(self):
+        manager = LocalTempFileManager(self.base_dir, quota=10)
+        other_manager = LocalTempFileManager(self.base_dir, quota=10)
+        self.assertEqual(manager.run_dir, other_manager.run_dir)
+        other_paths = [other_manager.create([b'1234']) for dummy in range(2)]
+        for path in other_paths:
+            os.utime(path, (0, 0))
+
+        paths = [manager.create([b'1234']) for dummy in range(2)]
+        for idx, path in enumerate(paths):
+            os.utime(path, (idx + 1, idx + 1))
+        self.assertListEqual([], manager.enforce_quota())
+
+        # Files of other managers are neither counted nor removed
+        paths.append(manager.create([b'1234']))
+        for path in other_paths + paths[1:]:
+            self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(paths[0]))
+
+    @unittest.skipUnless(HAS_MEMFD, 'memfd is not available')
+    def test_in_memory(self):
+        manager = LocalTempFileManager(self.base_dir, memory_threshold=5)
+
+        small_path = manager.create([b'ab', b'c'], prefix='small')
+        big_path = manager.create(iter([b'abc', b'def', b'ghi']), prefix='big')
+
+        self.assertTrue(small_path.startswith('/proc/%s/fd/' % os.getpid()))
+        self.assertEqual(manager.run_dir, os.path.dirname(big_path))
+        # Path can be read by another process
+        self.assertEqual(b'abc', subprocess.check_output(['cat', small_path]))
+        with open(big_path, 'rb') as file_handler:
+            self.assertEqual(b'abcdefghi', file_handler.read())
+
+        manager.cleanup()
+        self.assertFalse(os.path.exists(small_path))
+        self.assertDictEqual(dict(), manager.in_memory)
+
+    def test_sweep_stale_run_dirs(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        stale_dir = os.path.join(self.base_dir, '%s%s-%s' % (RUN_DIR_PREFIX, os.getuid(), process.pid))
+        current_dir = os.path.join(self.base_dir, '%s%s-%s' % (RUN_DIR_PREFIX, os.getuid(), os.getpid()))
+        other_dir = os.path.join(self.base_dir, 'other-%s' % process.pid)
+        for path in [stale_dir, current_dir, other_dir]:
+            os.mkdir(path)
+
+        self.assertListEqual([stale_dir], sweep_stale_run_dirs(self.base_dir))
+        self.assertListEqual(sorted(os.path.basename(path) for path in [current_dir, other_dir]),
+                             sorted(os.listdir(self.base_dir)))
+
+    def test_unsafe_run_dir(self):
+        manager = LocalTempFileManager(self.base_dir)
+        os.mkdir(manager.run_dir)
+        os.chmod(manager.run_dir, 0o777)
+
+        with self.assertRaises(AnsibleError):
+            manager.create([b'content'])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os.path
+import shutil
+import tempfile
+
+from ansible import constants as C
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.community.internal_test_tools.tests.unit.compat.mock import patch
+from ansible_collections.yoanm.utils.plugins.plugin_utils.path import (
+    get_collection_path,
+    append_collection_path_to_ansible_search_path,
+    invalidate_collection_path_cache,
+    CollectionFileIndex,
+    COLLECTION_PATH_CACHE,
+)
+
+
+class TestPath(unittest.TestCase):
+
+    def setUp(self):
+        invalidate_collection_path_cache()
+        self.addCleanup(invalidate_collection_path_cache)
+
+    def test_get_collection_path(self):
+        expected = [os.path.join(path, 'yoanm', 'utils') for path in C.config.get_config_value('COLLECTIONS_PATHS')]
+
+        self.assertListEqual(expected, get_collection_path('yoanm.utils'))
+        # Returned list can be modified
+        get_collection_path('yoanm.utils').append('/other')
+        self.assertListEqual(expected, get_collection_path('yoanm.utils'))
+        self.assertDictEqual(dict(hits=2, misses=1, size=1, evictions=0), COLLECTION_PATH_CACHE.stats())
+
+        with patch.object(C.config, 'get_config_value', return_value=['/a', '/b']):
+            self.assertListEqual(['/a/yoanm/utils', '/b/yoanm/utils'], get_collection_path('yoanm.utils'))
+
+    def test_append_collection_path_to_ansible_search_path(self):
+        with patch.object(C.config, 'get_config_value', return_value=['/a', '/b']):
+            self.assertDictEqual(
+                dict(ansible_search_path=['/a/yoanm/utils', '/b/yoanm/utils']),
+                append_collection_path_to_ansible_search_path('yoanm.utils')
+            )
+            variables = dict(ansible_search_path=['/c', '/b/yoanm/utils'])
+            res = append_collection_path_to_ansible_search_path('yoanm.utils', variables)
+            self.assertIs(variables, res)
+            self.assertListEqual(['/c', '/b/yoanm/utils', '/a/yoanm/utils'], res['ansible_search_path'])
+
+
+class TestCollectionFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.collection_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.collection_path)
+        os.makedirs(os.path.join(self.collection_path, 'templates', 'sub'))
+        for path in ['templates/a.j2', 'templates/sub/b.j2', 'README.md']:
+            self._touch(path)
+
+    def _touch(self, path):
+        with open(os.path.join(self.collection_path, path), 'w'):
+            pass
+
+    def test_find(self):
+        index = CollectionFileIndex()
+        templates_dir = os.path.join(self.collection_path, 'templates')
+
+        self.assertEqual(os.path.join(templates_dir, 'a.j2'), index.find(self.collection_path, 'templates', 'a.j2'))
+        self.assertEqual(os.path.join(templates_dir, 'sub', 'b.j2'),
+                         index.find(self.collection_path, 'templates', 'sub/b.j2'))
+        self.assertEqual(os.path.join(templates_dir, 'sub', 'b.j2'),
+                         index.find(self.collection_path, 'templates', 'templates/sub/b.j2'))
+        # Not indexed
+        self.assertEqual(os.path.join(self.collection_path, 'README.md'),
+                         index.find(self.collection_path, 'templates', 'README.md'))
+        self.assertIsNone(index.find(self.collection_path, 'templates', 'c.j2'))
+        self.assertIsNone(index.find(self.collection_path, 'vars', 'main.yml'))
+        self.assertIsNone(index.find(os.path.join(self.collection_path, 'unknown'), 'templates', 'a.j2'))
+
+    def test_invalidated_by_directory_mtime(self):
+        index = CollectionFileIndex()
+        sub_dir = os.path.join(self.collection_path, 'templates', 'sub')
+        self.assertIsNone(index.find(self.collection_path, 'templates', 'sub/c.j2'))
+
+        self._touch('templates/sub/c.j2')
+        # Make sure mtime changes, whatever the filesystem timestamps resolution
+        os.utime(sub_dir, (0, 0))
+        self.assertEqual(os.path.join(sub_dir, 'c.j2'), index.find(self.collection_path, 'templates', 'sub/c.j2'))
+
+        os.remove(os.path.join(sub_dir, 'c.j2'))
+        os.utime(sub_dir, (1, 1))
+        self.assertIsNone(index.find(self.collection_path, 'templates', 'sub/c.j2'))
+
+        # Broken symlinks don't exist
+        os.symlink(os.path.join(sub_dir, 'unknown'), os.path.join(sub_dir, 'd.j2'))
+        self.assertIsNone(index.find(self.collection_path, 'templates', 'sub/d.j2'))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import subprocess
+
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.yoanm.utils.plugins.plugin_utils.remote_commands import RemoteCommandBatch
+
+
+class TestRemoteCommandBatch(unittest.TestCase):
+
+    def _execute(self, batch, stop_on_error=False):
+        process = subprocess.Popen(['/bin/sh', '-c', batch.build(stop_on_error=stop_on_error)],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        self.assertEqual(0, process.returncode)
+        self.assertEqual(b'', stderr)
+
+        return batch.parse(stdout.decode())
+
+    def test_batch(self):
+        batch = RemoteCommandBatch(['echo a', 'printf "b\\nc"; echo d >&2'])
+        self.assertEqual(2, batch.add('cd /; exit 3'))
+        batch.add("echo 'no new line' | tr -d '\\n'")
+        batch.add('pwd; read input; echo "input=$input"')
+
+        self.assertListEqual(
+            [
+                dict(rc=0, stdout='a\n', stderr=''),
+                dict(rc=0, stdout='b\nc', stderr='d\n'),
+                dict(rc=3, stdout='', stderr=''),
+                dict(rc=0, stdout='no new line', stderr=''),
+                # Commands are isolated (no cd leak, no stdin)
+                dict(rc=0, stdout=subprocess.check_output(['pwd']).decode() + 'input=\n', stderr=''),
+            ],
+            self._execute(batch)
+        )
+
+    def test_stop_on_error(self):
+        batch = RemoteCommandBatch(['true', 'echo error >&2; false', 'echo not executed'])
+
+        self.assertListEqual(
+            [
+                dict(rc=0, stdout='', stderr=''),
+                dict(rc=1, stdout='', stderr='error\n'),
+                dict(rc=None, stdout='', stderr=''),
+            ],
+            self._execute(batch, stop_on_error=True)
+        )
+        self.assertEqual(0, self._execute(batch)[2]['rc'])
+
+    def test_token_in_output(self):
+        batch = RemoteCommandBatch()
+        batch.add('echo %s-OUT-1' % batch.token)
+        batch.add('echo b')
+
+        results = self._execute(batch)
+        self.assertEqual('%s-OUT-1\n' % batch.token, results[0]['stdout'])
+        self.assertEqual('b\n', results[1]['stdout'])
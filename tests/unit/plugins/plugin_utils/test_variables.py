@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Make coding more python3-ish
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from copy import deepcopy
+
+from ansible.template import Templar
+from ansible_collections.community.internal_test_tools.tests.unit.compat import unittest
+from ansible_collections.community.internal_test_tools.tests.unit.mock.loader import DictDataLoader
+from ansible_collections.yoanm.utils.plugins.plugin_utils.variables import VariablesOverlay
+
+
+class TestVariablesOverlay(unittest.TestCase):
+
+    def setUp(self):
+        self.variables = dict(a=1, nested=dict(b=2))
+        self.args = dict(a='arg', c=3)
+        self.overlay = VariablesOverlay(self.variables, self.args)
+
+    def test_same_content_as_merged_copy(self):
+        expected = self.args.copy()
+        expected.update(self.variables)
+
+        self.assertDictEqual(expected, dict(self.overlay))
+        self.assertEqual(3, len(self.overlay))
+        self.assertListEqual(['a', 'nested', 'c'], list(self.overlay))
+        self.assertIn('c', self.overlay)
+        self.assertNotIn('d', self.overlay)
+        self.assertEqual(1, self.overlay['a'])
+        self.assertIsNone(self.overlay.get('d'))
+        with self.assertRaises(KeyError):
+            self.overlay['d']
+        # Layers are not copied
+        self.variables['d'] = 4
+        self.assertEqual(4, self.overlay['d'])
+
+    def test_read_only(self):
+        with self.assertRaises(TypeError):
+            self.overlay['a'] = 2
+
+        copy = self.overlay.copy()
+        copy['a'] = 2
+        deep_copy = deepcopy(self.overlay)
+        self.assertIsInstance(deep_copy, dict)
+        deep_copy['nested']['b'] = 3
+        self.assertDictEqual(dict(a=1, nested=dict(b=2)), self.variables)
+        self.assertDictEqual(dict(a='arg', c=3), self.args)
+
+    def test_templating(self):
+        templar = Templar(loader=DictDataLoader({}), variables=self.overlay)
+
+        self.assertEqual('1-3', templar.template('{{ a }}-{{ c }}'))